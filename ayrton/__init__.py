@@ -22,10 +22,8 @@ import sys
 import importlib
 import ast
 import logging
-import dis
 import traceback
 import linecache
-import pdb
 import os.path
 
 # patch logging so we have debug2 and debug3
@@ -108,6 +106,9 @@ from ayrton.execute import o, Command, Capture, CommandFailed
 from ayrton.parser.pyparser.pyparse import CompileInfo, PythonParser
 from ayrton.parser.astcompiler.astbuilder import ast_from_node
 from ayrton.ast_pprinter import pprint
+import ayrton.cache
+from ayrton.profiler import Profiler, no_phase
+from ayrton.tracer import Tracer, TracedStream
 
 __version__= '0.9.1'
 
@@ -120,18 +121,41 @@ class ExecParams:
         self.trace_all= False
         self.debug= False
         self.pdb= False
+        # use and write the compiled code cache for script files
+        self.cache= True
+        # True or a file name; see ayrton.profiler.Profiler
+        self.profile= False
 
         self.__dict__.update (kwargs)
 
 
-def parse (script, file_name=''):
-    if isinstance(script, str):
-        # make sure it's bytes
-        script = script.encode()
-
+def parse (script, file_name='', profiler=None):
+    """script can also be a file opened in binary mode, which is read while
+    it's parsed."""
     parser= PythonParser (None)
     info= CompileInfo (file_name, 'exec')
-    return ast_from_node (None, parser.parse_source (script, info), info)
+
+    if profiler is not None:
+        tokenize= parser.tokenize
+        # the tokens are produced while parsing
+        parser.tokenize= lambda lines, flags: profiler.timed ('tokenize',
+                                                               tokenize (lines, flags))
+        phase= profiler.phase
+    else:
+        phase= lambda name: no_phase
+
+    with phase ('parse'):
+        if hasattr (script, 'readline'):
+            node= parser.parse_file (script, info)
+        else:
+            if isinstance(script, str):
+                # make sure it's bytes
+                script = script.encode()
+
+            node= parser.parse_source (script, info)
+
+    with phase ('build AST'):
+        return ast_from_node (None, node, info)
 
 
 class Argv (list):
@@ -186,10 +210,11 @@ class Environment (dict):
                                   'N', 'S', 'nt', 'ot', 'z' ],
             'ayrton.expansion': [ 'bash', ],
             'ayrton.functions': [ 'cd', ('cd', 'chdir'), 'define', 'exit', 'export',
-                                  'option', 'run', 'shift', 'trap', 'unset', ],
+                                  'option', 'parallel', 'rehash', 'remote',
+                                  'remote_many', 'resource_usage', 'run', 'shift',
+                                  'trap', 'unset', ],
             'ayrton.execute': [ 'o', 'Capture', 'CommandFailed', 'CommandNotFound',
-                                'Pipe', 'Command'],
-            'ayrton.remote': [ 'remote' ]
+                                'Pipe', 'Command', 'Pipeline', ],
             }
 
         for module, functions in ayrton_builtins.items ():
@@ -279,9 +304,25 @@ class Ayrton (object):
         # by default commands not expected to fail make the whole script to fail
         self.options= dict(errexit=True)
         self.pending_children= []
+        # the innermost parallel() block being executed, if any
+        self.parallel= None
+        # see ayrton.remote.ConnectionPool
+        self.connection_pool= None
+        # executable name: path, see ayrton.execute.find_program()
+        self.command_hash= {}
+        # the PATH the hash was built with
+        self.command_hash_path= None
         self.file_name= None
         self.script= None
         self.params= ExecParams ()
+        # names the transformer looked up while parsing the last script
+        self.consulted_names= {}
+        # only while profiling
+        self.profiler= None
+        # only while tracing, see instrumented()
+        self.tracer= None
+        # the sum of the resources used by the Commands run so far
+        self.usage= ayrton.execute.ResourceUsage ()
 
         # HACK to update the singleton
         # this might break if we implement subinstances
@@ -290,16 +331,11 @@ class Ayrton (object):
 
 
     def run_file (self, file_name, argv=None, params=None):
-        # it's a pity that parse() does not accept a file as input
-        # so we could avoid reading the whole file
-        # and now we read it anyways in the case of tracing
         logger.debug ('running from file %s', file_name)
 
-        # not in text mode, the parser expects bytes, and it could be in any
-        # encoding anyways...
-        f= open (file_name, 'rb')
-        script= f.read ()
-        f.close ()
+        if params is not None:
+            # see run_script()
+            self.params= params
 
         # we need to add the file's parent dir to the PYTHONPATH
         # so we can find relative modules to it
@@ -310,20 +346,73 @@ class Ayrton (object):
         if file_name_parent_dir not in sys.path:
             sys.path.insert (0, file_name_parent_dir)
 
-        return self.run_script (script, file_name, argv, params)
+        # not in text mode, the parser expects bytes, and it could be in any
+        # encoding anyways...
+        if self.params.cache:
+            # the cached code is validated with the whole script, so we
+            # have to read it anyways
+            with self.phase ('read'), open (file_name, 'rb') as f:
+                script= f.read ()
+
+            return self.run_script (script, file_name, argv, cache=True)
+
+        # otherwise the file is parsed while it's read, so reading counts as
+        # tokenizing when profiling; for tracing, the lines are read by
+        # linecache, see source_lines()
+        self.file_name= file_name
+        self.script= None
+
+        try:
+            with open (file_name, 'rb') as f:
+                tree= self.parse (f, file_name)
+
+            code= self.compile (tree, file_name)
+            return self.run_code (code, file_name, argv)
+        except Exception as e:
+            if self.params.pdb:
+                import pdb
+                pdb.set_trace ()
+            raise
+
+
+    def phase (self, name):
+        """Measures a phase of the execution, if profiling."""
+        if self.profiler is None:
+            return no_phase
+        else:
+            return self.profiler.phase (name)
+
+
+    def instrumented (self):
+        """Whether the script is traced by calling the Tracer from its code
+        instead of with sys.settrace(); see ayrton.tracer. Tracing all the
+        lines, including the ones in other modules, still needs the latter."""
+        return self.params.trace and not self.params.trace_all
+
+
+    def source_lines (self, file_name):
+        if self.script is not None:
+            return [ line.decode (errors='replace') for line in self.script ]
+        else:
+            # see run_file()
+            return linecache.getlines (file_name)
 
 
     def parse (self, script, file_name):
-        # up to this point the script is the whole script in one string
-        # because parse() needs it that way
-        tree= parse (script, file_name)
+        # script can be the whole script in one string or an open file,
+        # see parse()
+        tree= parse (script, file_name, self.profiler)
         # TODO: self.locals?
-        tree= CrazyASTTransformer (self.globals, file_name).modify (tree)
+        with self.phase ('transform'):
+            transformer= CrazyASTTransformer (self.globals, file_name,
+                                              trace=self.instrumented ())
+            tree= transformer.modify (tree)
+        self.consulted_names= transformer.consulted_names
 
         return tree
 
 
-    def run_script (self, script, file_name, argv=None, params=None):
+    def run_script (self, script, file_name, argv=None, params=None, cache=False):
         if isinstance(script, str):
             # make sure it's bytes
             script = script.encode()
@@ -332,31 +421,66 @@ class Ayrton (object):
         self.file_name= file_name
         self.script= script.split(b'\n')
 
-        try:
-            tree= self.parse (script, file_name)
+        if params is not None:
+            # we delay this assignment down to here because run_file(),
+            # run_script() and run_tree() are entry points
+            self.params= params
 
-            return self.run_tree (tree, file_name, argv, params)
+        # only scripts coming from files are cached, see run_file()
+        cache= cache and self.params.cache
+        # the code calls the Tracer
+        if self.instrumented ():
+            flags= ('trace', )
+        else:
+            flags= ()
+
+        try:
+            code= None
+            if cache:
+                with self.phase ('load cache'):
+                    code= ayrton.cache.load (file_name, script, self.globals,
+                                             flags)
+
+            if code is None:
+                tree= self.parse (script, file_name)
+                code= self.compile (tree, file_name)
+
+                if cache:
+                    with self.phase ('save cache'):
+                        ayrton.cache.save (file_name, script,
+                                           self.consulted_names, code, flags)
+
+            return self.run_code (code, file_name, argv)
         except Exception as e:
             if self.params.pdb:
+                import pdb
                 pdb.set_trace ()
             raise
 
 
     def run_tree (self, tree, file_name, argv=None, params=None):
-        logger.debug2 ('AST: %s', ast.dump (tree, True, True))
-        logger.debug2 ('code: \n%s', pprint (tree))
-
         if params is not None:
-            # we delay this assignment down to here because run_file(),
-            # run_script() and run_tree() are entry points
+            # see run_script()
             self.params= params
 
-        code= compile (tree, file_name, 'exec')
+        code= self.compile (tree, file_name)
         return self.run_code (code, file_name, argv)
 
 
+    def compile (self, tree, file_name):
+        # don't format it if it's not going to be logged
+        if logger.isEnabledFor (logging.DEBUG2):
+            logger.debug2 ('AST: %s', ast.dump (tree, True, True))
+            logger.debug2 ('code: \n%s', pprint (tree))
+
+        with self.phase ('compile'):
+            return compile (tree, file_name, 'exec')
+
+
     def run_code (self, code, file_name, argv=None):
         if logger.parent.level<=logging.DEBUG2:  # pragma: no cover
+            import dis
+
             logger.debug2 ('------------------')
             logger.debug2 ('main (gobal) code:')
             handler= logger.parent.handlers[0]
@@ -413,17 +537,30 @@ class Ayrton (object):
         '''
         error= None
         result= None
+        # the original sys.stdout and sys.stderr, see TracedStream
+        streams= None
         try:
-            logger.debug3 ('globals for script: %s', ayrton.utils.dump_dict (self.globals))
-            if self.params.trace:  # pragma: no cover
+            if logger.isEnabledFor (logging.DEBUG3):
+                logger.debug3 ('globals for script: %s', ayrton.utils.dump_dict (self.globals))
+            if self.instrumented ():
+                self.tracer= Tracer (self.source_lines (file_name),
+                                     self.params.linenos)
+                self.globals['ayrton_trace']= self.tracer
+
+                streams= (sys.stdout, sys.stderr)
+                sys.stdout= TracedStream (sys.stdout, self.tracer)
+                sys.stderr= TracedStream (sys.stderr, self.tracer)
+            elif self.params.trace:  # pragma: no cover
                 sys.settrace (self.global_tracer)
 
-            exec (code, self.globals, self.locals)
+            with self.phase ('execute'):
+                exec (code, self.globals, self.locals)
             result= self.locals.get ('ayrton_return_value', None)
         except Exit as e:
             result= e.exit_value
         except Exception as e:  # pragma: no cover
             if self.params.pdb:
+                import pdb
                 pdb.set_trace ()
 
             logger.debug ('script finished by Exception')
@@ -432,6 +569,16 @@ class Ayrton (object):
         finally:  # pragma: no cover
             sys.settrace (None)
 
+            if self.tracer is not None:
+                self.tracer.flush ()
+
+            if streams is not None:
+                # unless the script replaced them
+                if isinstance (sys.stdout, TracedStream):
+                    sys.stdout= streams[0]
+                if isinstance (sys.stderr, TracedStream):
+                    sys.stderr= streams[1]
+
         logger.debug3 ('globals at script exit: %s', ayrton.utils.dump_dict (self.globals))
         logger.debug3 ('locals at script exit: %s', ayrton.utils.dump_dict (self.locals))
         logger.debug ('ayrton_return_value: %r', result)
@@ -443,8 +590,11 @@ class Ayrton (object):
 
 
     def wait_for_pending_children (self):
-        for i in range (len (self.pending_children)):
-            child= self.pending_children.pop (0)
+        children= self.pending_children
+        self.pending_children= []
+
+        # in the order they finish
+        for child in ayrton.execute.reaper.wait_all (children):
             try:
                 child.wait ()
             except ChildProcessError:
@@ -462,28 +612,23 @@ class Ayrton (object):
 
 
     def local_tracer (self, frame, event, arg):  # pragma: no cover
+        # only for trace_all, see instrumented()
         if event=='line':
             file_name= frame.f_code.co_filename
-            if self.params.trace_all or file_name==self.file_name:
-                l= len (file_name)
-                if l>32:
-                    short_file_name= file_name[l-32:]
-                else:
-                    short_file_name= file_name
+            l= len (file_name)
+            if l>32:
+                short_file_name= file_name[l-32:]
+            else:
+                short_file_name= file_name
 
-                lineno= frame.f_lineno
+            lineno= frame.f_lineno
 
-                line= linecache.getline (file_name, lineno).rstrip ()
-                if line=='':
-                    line= self.script[lineno-1].rstrip ()  # line numbers start at 1
+            line= linecache.getline (file_name, lineno).rstrip ()
+            if line=='' and self.script is not None:
+                line= self.script[lineno-1].rstrip ()  # line numbers start at 1
 
-                logger.debug2 ('trace e: %s, f: %s, n: %d, l: %s', event, file_name, lineno, line)
-                if self.params.trace_all:
-                    self.trace_line ("+ [%32s:%-6d] %s", short_file_name, lineno, line)
-                elif self.params.linenos:
-                    self.trace_line ("+ [%6d] %s", lineno, line)
-                else:
-                    self.trace_line ("+ %s", line)
+            logger.debug2 ('trace e: %s, f: %s, n: %d, l: %s', event, file_name, lineno, line)
+            self.trace_line ("+ [%32s:%-6d] %s", short_file_name, lineno, line)
 
 
     def trace_line (self, msg, *args):  # pragma: no cover
@@ -507,14 +652,23 @@ def run_file_or_script (script=None, file_name='script_from_command_line',
     if params is None:
         params= ExecParams ()
 
-    if script is None:
-        v= runner.run_file (file_name, argv, params)
-    else:
-        if not isinstance(script, bytes):
-            # the problem here it's that the parser expects the source as bytes
-            # so we must encode the source before passing it
-            script = script.encode()
-        v= runner.run_script (script, file_name, argv, params)
+    if params.profile:
+        runner.profiler= Profiler (params.profile)
+        runner.profiler.start ()
+
+    try:
+        if script is None:
+            v= runner.run_file (file_name, argv, params)
+        else:
+            if not isinstance(script, bytes):
+                # the problem here it's that the parser expects the source as bytes
+                # so we must encode the source before passing it
+                script = script.encode()
+            v= runner.run_script (script, file_name, argv, params)
+    finally:
+        if runner.profiler is not None:
+            runner.profiler.stop ()
+            runner.profiler.dump ()
 
     return v
 
@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+# asyncio version of Command and Pipeline, for driving lots of them from an
+# event loop without threads:
+#
+#   ls= AsyncCommand ('ls')
+#   p= await ls ('-l', _out=Capture)
+#   async for line in ls ('-l', _out=Capture):
+#       ...
+#
+# the arguments and options are processed by Command.setup(), so they mean
+# the same; _bg, _in_tty and _out_tty are not supported.
+
+import asyncio
+from asyncio.subprocess import PIPE, STDOUT, DEVNULL
+import copy
+import io
+import os
+
+import ayrton
+from ayrton.execute import Command, Capture, CommandFailed, CommandNotFound
+from ayrton.execute import encoding, file_name_mode, isiterable
+
+import logging
+logger= logging.getLogger ('ayrton.aio')
+
+
+class AsyncCommand:
+    """Like Command, but calling it returns an AsyncProcess, which runs it
+    when it's await'ed or iterated with async for. Each call returns a new
+    one, so the same AsyncCommand can be used for many concurrent ones."""
+
+    def __init__ (self, path):
+        self.command= Command (path)
+
+
+    def __call__ (self, *args, **kwargs):
+        command= copy.copy (self.command)
+
+        return AsyncProcess (command.setup (*args, **kwargs))
+
+
+class AsyncProcess:
+    def __init__ (self, command):
+        self.command= command
+        self.args= command.args
+        self.options= command.options
+
+        self.process= None
+        self.feeder= None
+        self._exit_code= None
+        self.captured_lines= None
+        # fds opened for the child that we have to close once it's launched
+        self.opened= []
+
+
+    def open (self, value, mode):
+        """Converts a file name or file object into a fd."""
+        if isinstance (value, io.IOBase):
+            return value.fileno ()
+
+        if isinstance (value, (str, bytes, tuple)):
+            fd= os.open (*file_name_mode (value, mode))
+            self.opened.append (fd)
+
+            return fd
+
+        return value
+
+
+    def stdin (self):
+        i= self.options.get ('_in', Ellipsis)
+
+        if i is Ellipsis:
+            return None
+        elif i is None:
+            return DEVNULL
+        elif isinstance (i, (int, io.IOBase, str, bytes, tuple)):
+            return self.open (i, os.O_RDONLY)
+        else:
+            # data, including other AsyncProcess'es; see feed()
+            return PIPE
+
+
+    def output (self, option):
+        o= self.options.get (option, Ellipsis)
+
+        if o is Ellipsis:
+            return None
+        elif o is None:
+            return DEVNULL
+        elif o==Capture:
+            if option=='_err' and self.options.get ('_out', None)==Capture:
+                # both are read from the same pipe, as in Command
+                return STDOUT
+            else:
+                return PIPE
+        else:
+            return self.open (o, os.O_WRONLY)
+
+
+    async def start (self):
+        try:
+            self.process= await asyncio.create_subprocess_exec (
+                self.command.exe, *self.args[1:],
+                stdin=self.stdin (), stdout=self.output ('_out'),
+                stderr=self.output ('_err'), env=self.options['_env'])
+        finally:
+            for fd in self.opened:
+                os.close (fd)
+            self.opened= []
+
+        if self.process.stdin is not None:
+            self.feeder= asyncio.ensure_future (self.feed ())
+
+        return self
+
+
+    async def feed (self):
+        i= self.options['_in']
+        end= self.options['_end']
+        stdin= self.process.stdin
+
+        try:
+            if isinstance (i, AsyncProcess):
+                # copy it as is
+                if i.captured_lines is not None:
+                    stdin.write (''.join (i.captured_lines).encode (encoding))
+                else:
+                    if i.process is None:
+                        await i.start ()
+
+                    while True:
+                        data= await i.reader ().read (io.DEFAULT_BUFFER_SIZE)
+                        if data==b'':
+                            break
+
+                        stdin.write (data)
+                        await stdin.drain ()
+
+                    await i.wait ()
+            elif hasattr (i, '__aiter__'):
+                async for e in i:
+                    stdin.write (str (e).encode (encoding)+end)
+                    await stdin.drain ()
+            else:
+                if not isiterable (i):
+                    i= [ i ]
+
+                for e in i:
+                    stdin.write (str (e).encode (encoding)+end)
+                    await stdin.drain ()
+        except (BrokenPipeError, ConnectionResetError):
+            # the child does not want more input
+            logger.debug ('%s closed its stdin', self.command.exe)
+        finally:
+            stdin.close ()
+
+
+    def reader (self):
+        if self.process.stdout is not None:
+            return self.process.stdout
+        else:
+            return self.process.stderr
+
+
+    async def wait (self):
+        """Runs the Command until it finishes, reading all its output if it's
+        captured. Returns the AsyncProcess itself."""
+        if self.process is None:
+            await self.start ()
+
+        if self._exit_code is None:
+            await self.reap ()
+            self.check ()
+
+        return self
+
+
+    async def reap (self):
+        """Like wait(), but without checking the exit code."""
+        if self.captured_lines is None and self.reader () is not None:
+            # same as Command.capture()
+            data= await self.reader ().read ()
+            self.captured_lines= data.decode (encoding).splitlines (True)
+
+        self._exit_code= await self.process.wait ()
+
+        if self.feeder is not None:
+            await self.feeder
+
+
+    def __await__ (self):
+        return self.wait ().__await__ ()
+
+
+    def check (self):
+        if self._exit_code==127:
+            raise CommandNotFound (self.command.path)
+
+        if (     ayrton.runner is not None
+             and ayrton.runner.options.get ('errexit', False)
+             and self._exit_code!=0
+             and not self.options.get ('_fails', False) ):
+            raise CommandFailed (self)
+
+
+    def __aiter__ (self):
+        return self.lines ()
+
+
+    async def lines (self):
+        if self.process is None:
+            await self.start ()
+
+        if self.captured_lines is None and self.reader () is not None:
+            while True:
+                line= await self.reader ().readline ()
+                if line==b'':
+                    break
+
+                # while iterating we always remove the trailing \n
+                yield line.decode (encoding).rstrip (os.linesep)
+        elif self.captured_lines is not None:
+            for line in self.captured_lines:
+                yield line.rstrip (os.linesep)
+
+        await self.wait ()
+
+
+    def exit_code (self):
+        return self._exit_code
+
+
+    def __bool__ (self):
+        return self._exit_code==0
+
+
+    def __str__ (self):
+        if self.captured_lines is not None:
+            return ''.join (self.captured_lines)
+        else:
+            return None
+
+
+    def readlines (self):
+        return self.captured_lines
+
+
+class AsyncPipeline:
+    """Like Pipeline: AsyncPipeline (a (...), b (...), c (...)) connects
+    each one's stdout to the next one's stdin. It's run when it's await'ed or
+    iterated with async for."""
+
+    def __init__ (self, *processes):
+        self.processes= list (processes)
+        self.options= self.processes[-1].options
+        self._exit_code= None
+        self.started= False
+
+
+    @property
+    def args (self):
+        # see CommandFailed
+        ans= []
+        for process in self.processes:
+            if len (ans)>0:
+                ans.append ('|')
+            ans.extend (process.args)
+
+        return ans
+
+
+    async def start (self):
+        # the exit codes are checked by the AsyncPipeline, see wait()
+        self.fails= [ process.options['_fails'] for process in self.processes ]
+        for process in self.processes:
+            process.options['_fails']= True
+
+        for process, next_process in zip (self.processes, self.processes[1:]):
+            r, w= os.pipe ()
+            # the fds are closed once the children have them, see open()
+            process.options['_out']= w
+            process.opened.append (w)
+            next_process.options['_in']= r
+            next_process.opened.append (r)
+
+        for process in self.processes:
+            await process.start ()
+
+        self.started= True
+
+        return self
+
+
+    async def wait (self):
+        if not self.started:
+            await self.start ()
+
+        if self._exit_code is None:
+            # the output is the last one's; reap all of them before checking
+            # any, so none is left behind if one raises
+            results= await asyncio.gather (*[ process.reap ()
+                                              for process in self.processes
+                                              if process._exit_code is None ],
+                                           return_exceptions=True)
+
+            errors= [ result for result in results
+                      if isinstance (result, BaseException) ]
+            if len (errors)>0:
+                self.set_exit_code ()
+                raise errors[0]
+
+            self.check ()
+
+        return self
+
+
+    def __await__ (self):
+        return self.wait ().__await__ ()
+
+
+    def set_exit_code (self):
+        """Returns the index of the process that decides the exit code."""
+        exit_codes= self.exit_codes ()
+
+        index= len (exit_codes)-1
+        if ayrton.runner is not None and ayrton.runner.options.get ('pipefail', False):
+            for i, exit_code in enumerate (exit_codes):
+                if exit_code is not None and exit_code!=0:
+                    index= i
+
+        self._exit_code= exit_codes[index]
+
+        return index
+
+
+    def check (self):
+        index= self.set_exit_code ()
+
+        for process in self.processes:
+            # all of them have _fails, so only CommandNotFound is raised
+            process.check ()
+
+        # _fails in the last Command is for the whole Pipeline
+        if (     ayrton.runner is not None
+             and ayrton.runner.options.get ('errexit', False)
+             and self._exit_code!=0
+             and not (self.fails[index] or self.fails[-1]) ):
+            raise CommandFailed (self)
+
+
+    def __aiter__ (self):
+        return self.lines ()
+
+
+    async def lines (self):
+        if not self.started:
+            await self.start ()
+
+        async for line in self.processes[-1]:
+            yield line
+
+        await self.wait ()
+
+
+    def exit_code (self):
+        return self._exit_code
+
+
+    def exit_codes (self):
+        return [ process._exit_code for process in self.processes ]
+
+
+    def __bool__ (self):
+        return self._exit_code==0
+
+
+    def __str__ (self):
+        return str (self.processes[-1])
+
+
+    def readlines (self):
+        return self.processes[-1].readlines ()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+# on-disk cache of compiled scripts, à la __pycache__ (PEP 3147)
+# the whole front end (tokenizer, parser, AST builder, CrazyASTTransformer and
+# compile()) is skipped when the cached code is still valid for the script
+
+import os
+import os.path
+import sys
+import marshal
+import hashlib
+from importlib.util import MAGIC_NUMBER
+
+import ayrton
+
+import logging
+logger= logging.getLogger ('ayrton.cache')
+
+cache_dir= '__pycache__'
+
+
+def cache_path (file_name):
+    """Returns the path where the code for file_name is cached.
+    foo/bar.ay -> foo/__pycache__/bar.ayrton-0.9.1.cpython-36.pyc"""
+    dir_name, base_name= os.path.split (os.path.abspath (file_name))
+    base_name= os.path.splitext (base_name)[0]
+
+    return os.path.join (dir_name, cache_dir, '%s.ayrton-%s.%s.pyc' %
+                         (base_name, ayrton.__version__,
+                          sys.implementation.cache_tag))
+
+
+def digest (source):
+    return hashlib.sha1 (source).digest ()
+
+
+def load (file_name, source, environ, flags=()):
+    """Returns the cached code object for file_name, or None if there's none
+    or it's stale. source is the script's contents (bytes), environ the globals
+    the script is going to be transformed with and flags anything else that
+    changes the generated code."""
+    path= cache_path (file_name)
+
+    try:
+        with open (path, 'rb') as f:
+            data= marshal.load (f)
+
+        (magic, version, cached_file_name, mtime, size, cached_digest, names,
+         cached_flags, code)= data
+    except FileNotFoundError:
+        logger.debug ('%s not cached', file_name)
+        return None
+    except (OSError, EOFError, ValueError, TypeError) as e:
+        # unreadable or corrupt, it will be overwritten
+        logger.debug ('could not load %s: %s', path, e)
+        return None
+
+    if (   magic!=MAGIC_NUMBER or version!=ayrton.__version__
+        or cached_file_name!=file_name or cached_flags!=tuple (flags)):
+        logger.debug ('%s was cached by another ayrton or with other params', path)
+        return None
+
+    if size!=len (source):
+        logger.debug ('%s changed size', file_name)
+        return None
+
+    try:
+        source_mtime= os.stat (file_name).st_mtime_ns
+    except OSError:
+        source_mtime= None
+
+    # the file could have been touch'ed, so in that case we check the contents
+    if mtime!=source_mtime and cached_digest!=digest (source):
+        logger.debug ('%s changed', file_name)
+        return None
+
+    # CrazyASTTransformer decides between executables and functions by looking
+    # up names in the globals, so the code is only valid if they're still
+    # defined (or not) in the same way
+    for name, defined in names.items ():
+        if (name in environ)!=defined:
+            logger.debug ('%r changed definition status', name)
+            return None
+
+    logger.debug ('using cached code for %s from %s', file_name, path)
+    return code
+
+
+def save (file_name, source, names, code, flags=()):
+    """Cache code for file_name. names is a dict of the names the transformer
+    looked up in the globals and whether they were defined or not. See load().
+    Errors are ignored; it's only a cache."""
+    if sys.dont_write_bytecode:
+        return
+
+    path= cache_path (file_name)
+    tmp_path= None
+
+    try:
+        source_mtime= os.stat (file_name).st_mtime_ns
+        data= marshal.dumps ( (MAGIC_NUMBER, ayrton.__version__, file_name,
+                               source_mtime, len (source), digest (source),
+                               dict (names), tuple (flags), code) )
+
+        os.makedirs (os.path.dirname (path), exist_ok=True)
+
+        # write and rename so concurrent runs never see a half written file
+        tmp_path= '%s.%d' % (path, os.getpid ())
+        with open (tmp_path, 'wb') as f:
+            f.write (data)
+        os.replace (tmp_path, path)
+    except (OSError, ValueError) as e:
+        # read only dir, unmarshallable constants...
+        logger.debug ('could not cache %s in %s: %s', file_name, path, e)
+
+        if tmp_path is not None:
+            try:
+                os.unlink (tmp_path)
+            except OSError:
+                pass
+    else:
+        logger.debug ('cached %s in %s', file_name, path)
@@ -22,6 +22,7 @@ from ast import Pass, Module, Bytes, copy_location, Call, Name, Load, Str, BitOr
 from ast import fix_missing_locations, Import, alias, Attribute, ImportFrom
 from ast import keyword, Gt, Lt, GtE, RShift, Tuple, FunctionDef, arguments
 from ast import Store, Assign, Subscript, Tuple, Num
+from ast import AugAssign, AsyncFunctionDef, ClassDef, ExceptHandler
 try:
     from ast import NameConstant
 except ImportError:
@@ -36,6 +37,7 @@ except ImportError:
 import pickle
 from collections import defaultdict
 import os
+import re
 
 import logging
 logger= logging.getLogger ('ayrton.castt')
@@ -60,7 +62,29 @@ def is_executable (node):
     return (type (node)==Call and
             type (node.func)==Call and
             type (node.func.func)==Name and
-            node.func.func.id=='Command')
+            node.func.func.id in ('Command', 'Pipeline'))
+
+def is_pipeline (node):
+    # Call(func=Call(func=Name(id='Pipeline', ctx=Load()),
+    #                args=[Call(func=Attribute(value=Call(func=Name(id='Command', ctx=Load()), ...),
+    #                                          attr='setup', ctx=Load()), ...), ...],
+    #                keywords=[]),
+    #      args=[], keywords=[])
+    return is_executable (node) and node.func.func.id=='Pipeline'
+
+def setup_call (node):
+    # Command ('ls') (...) -> Command ('ls').setup (...)
+    new_node= Call (func=Attribute (value=node.func, attr='setup', ctx=Load ()),
+                    args=node.args, keywords=node.keywords)
+    ast.copy_location (new_node, node)
+
+    return new_node
+
+def is_remote (node):
+    # With(items=[withitem(context_expr=Call(func=Name(id='remote', ...), ...), ...)], ...)
+    sub_node= node.items[0].context_expr
+    return (type (sub_node)==Call and hasattr (sub_node.func, 'id') and
+            sub_node.func.id in ('remote', 'remote_many'))
 
 def is_option (arg):
     return type (arg)==Call and type (arg.func)==Name and arg.func.id=='o'
@@ -82,7 +106,12 @@ def update_keyword (node, keyword):
         node.keywords.append (keyword)
 
 def func_name2dotted_exec (node):
-    logger.debug (ast.dump (node))
+    if logger.isEnabledFor (logging.DEBUG):
+        logger.debug (ast.dump (node))
+
+    if type (node)==Name:
+        # no need to pprint() it
+        return (node.id, node.id)
 
     complete_name= str (pprint (node))
 
@@ -98,8 +127,90 @@ def func_name2dotted_exec (node):
         return (None, None)
 
 
+# $foo and ${foo} in strings, see ayrton.expansion
+expansion_re= re.compile (r'\$\{?([A-Za-z_][A-Za-z0-9_]*)')
+
+def free_names (tree):
+    """The names the code reads. It might include some that are not free,
+    like the parameters of functions, but never misses any."""
+    names= set ()
+
+    for node in ast.walk (tree):
+        if type (node)==Name and type (node.ctx)!=Store:
+            # Load and Del
+            names.add (node.id)
+        elif type (node)==AugAssign and type (node.target)==Name:
+            # a+= 1 also reads a
+            names.add (node.target.id)
+        elif isinstance (node, Str):
+            # the variables are looked up at runtime
+            names.update (expansion_re.findall (node.s))
+
+    return names
+
+def assigned_names (tree):
+    """The names the code binds. It might include some that are not bound in
+    the outermost block, like the locals of functions."""
+    names= set ()
+
+    for node in ast.walk (tree):
+        if type (node)==Name and type (node.ctx)==Store:
+            names.add (node.id)
+        elif type (node) in (FunctionDef, AsyncFunctionDef, ClassDef):
+            names.add (node.name)
+        elif type (node) in (Import, ImportFrom):
+            for name in node.names:
+                if name.asname is not None:
+                    names.add (name.asname)
+                else:
+                    names.add (name.name.split ('.')[0])
+        elif type (node)==ExceptHandler and node.name is not None:
+            names.add (node.name)
+
+    return names
+
+def is_traced (node, index):
+    if index==0 and type (node)==ast.Expr and isinstance (node.value, Str):
+        # docstrings must be the first statement
+        return False
+    if type (node)==ImportFrom and node.module=='__future__':
+        # and __future__ imports must come before any other
+        return False
+    if type (node) in (ast.Global, ast.Nonlocal):
+        # they're not executed
+        return False
+
+    return True
+
+def add_trace_calls (node):
+    """Puts a call to ayrton_trace (lineno) before each statement in node,
+    except in the body of remote() blocks; see ayrton.tracer."""
+    for field, value in ast.iter_fields (node):
+        # statements are only found in lists, like bodies and handlers
+        if type (value)!=list:
+            continue
+
+        if field=='body' and type (node) in (ast.With, ast.AsyncWith) and is_remote (node):
+            # it's executed in the remote
+            continue
+
+        new_value= []
+        for index, child in enumerate (value):
+            if isinstance (child, ast.AST):
+                add_trace_calls (child)
+
+            if isinstance (child, ast.stmt) and is_traced (child, index):
+                call= Call (func=Name (id='ayrton_trace', ctx=Load ()),
+                            args=[ Num (n=child.lineno) ], keywords=[])
+                new_value.append (copy_location (ast.Expr (value=call), child))
+
+            new_value.append (child)
+
+        value[:]= new_value
+
+
 class CrazyASTTransformer (ast.NodeTransformer):
-    def __init__ (self, environ, file_name=None):
+    def __init__ (self, environ, file_name=None, trace=False):
         super ().__init__ ()
         # the whole ayrton instance globals
         self.environ= environ
@@ -114,10 +225,17 @@ class CrazyASTTransformer (ast.NodeTransformer):
         self.defined_names= defaultdict (list)
         # for testing
         self.seen_names= set ()
+        # names looked up in environ and whether they were found there
+        # the generated code depends on them, see ayrton.cache
+        self.consulted_names= {}
         self.file_name= file_name
+        # see add_trace_calls()
+        self.trace= trace
 
     def modify (self, tree):
         m= self.visit (tree)
+        if self.trace:
+            add_trace_calls (m)
         ast.fix_missing_locations (m)
 
         return m
@@ -316,7 +434,7 @@ class CrazyASTTransformer (ast.NodeTransformer):
         # BinOp( left=Call(...), op=BitOr(), right=Call(...))
         if type (node.op)==BitOr:
             # pipe
-            # BinOp (left, BitOr, right) -> right (left, ...)
+            # BinOp (left, BitOr, right) -> Pipeline (left, right) ()
 
             # check the left and right; if they're calls to Command
             # then do the magic
@@ -327,56 +445,34 @@ class CrazyASTTransformer (ast.NodeTransformer):
             both= is_executable (node.left) and is_executable (node.right)
 
             if both:
-                # left (...) | right (...)
-
-                # r, w= os.pipe ()
-                # left (..., _out=w)
-                # os.close (w)
-                # right (..., _in=r)
-                # os.close (r)
-
-                # Assign(targets=[Tuple(elts=[Name(id='r', ctx=Store()),
-                #                             Name(id='w', ctx=Store())], ctx=Store())],
-                #        value=Call(func=Attribute(value=Name(id='os', ctx=Load()),
-                #                                  attr='pipe', ctx=Load()),
-                #                   args=[], keywords=[], starargs=None, kwargs=None)),
-                # Expr(value=Call(func=Name(id='echo', ctx=Load()),
-                #                 args=[Str(s='pipe!')],
-                #                 keywords=[keyword(arg='_out', value=Name(id='w', ctx=Load()))],
-                #                 starargs=None, kwargs=None)),
-                # Expr(value=Call(func=Attribute(value=Name(id='os', ctx=Load()), attr='close', ctx=Load()),
-                #                 args=[Name(id='w', ctx=Load())],
-                #                 keywords=[], starargs=None, kwargs=None)),
-                # Expr(value=Call(func=Name(id='grep', ctx=Load()),
-                #                 args=[Str(s='pipe')],
-                #                 keywords=[keyword(arg='_in', value=Name(id='r', ctx=Load()))],
-                #                 starargs=None, kwargs=None)),
-                # Expr(value=Call(func=Attribute(value=Name(id='os', ctx=Load()), attr='close', ctx=Load()),
-                #                 args=[Name(id='r', ctx=Load())],
-                #                 keywords=[], starargs=None, kwargs=None))
-
-                # I can't believe it's this easy
+                # a (...) | b (...) | c (...)
+                # BinOp(left=BinOp(left=Call(func=Call(func=Name(id='Command', ctx=Load()),
+                #                                      args=[Str(s='a')], ...), ...),
+                #                  op=BitOr(),
+                #                  right=Call(func=Call(func=Name(id='Command', ctx=Load()),
+                #                                       args=[Str(s='b')], ...), ...)),
+                #       op=BitOr(),
+                #       right=Call(func=Call(func=Name(id='Command', ctx=Load()),
+                #                            args=[Str(s='c')], ...), ...))
+                # ->
+                # Pipeline (Command ('a').setup (...), Command ('b').setup (...),
+                #           Command ('c').setup (...)) ()
+                # the inner BinOp has already been converted, so we just add
+                # the new Command to that Pipeline
                 # TODO: check if _err is not being captured instead
-                # TODO: warn about keywords being rewritten
-                update_keyword (node.left,
-                                keyword (arg='_out', value=Name (id='Pipe', ctx=Load ())))
-                update_keyword (node.left,
-                                keyword (arg='_bg',  value=Name (id='True', ctx=Load ())))
-                ast.fix_missing_locations (node.left)
-                update_keyword (node.right, keyword (arg='_in', value=node.left))
-                node= node.right
-
-                # Call(func=Call(func=Attribute(value=Name(id='CommandWrapper', ctx=Load()),
-                #                               attr='_create', ctx=Load()),
-                #                args=[Str(s='grep')], keywords=[], starargs=None, kwargs=None),
-                #      args=[Call(func=Call(func=Attribute(value=Name(id='CommandWrapper', ctx=Load()),
-                #                                          attr='_create', ctx=Load()),
-                #                      args=[Str(s='ls')], keywords=[], starargs=None, kwargs=None),
-                #                 args=[], keywords=[keyword(arg='_out',
-                #                                            value=Name(id='Capture', ctx=Load()))],
-                #                 starargs=None, kwargs=None),
-                #            Str(s='foo')],
-                #      keywords=[], starargs=None, kwargs=None)
+                commands= []
+                for side in (node.left, node.right):
+                    if is_pipeline (side):
+                        commands.extend (side.func.args)
+                    else:
+                        commands.append (setup_call (side))
+
+                new_node= Call (func=Call (func=Name (id='Pipeline', ctx=Load ()),
+                                           args=commands, keywords=[]),
+                                args=[], keywords=[])
+                ast.copy_location (new_node, node)
+                ast.fix_missing_locations (new_node)
+                node= new_node
 
         elif type (node.op)==RShift:
             # BinOp(left=Call(func=Name(id='ls', ctx=Load()), args=[], keywords=[], starargs=None, kwargs=None),
@@ -452,6 +548,8 @@ class CrazyASTTransformer (ast.NodeTransformer):
         logger.debug2 ("%s: %s", name, unknown)
 
         if unknown:
+            self.consulted_names[name]= name in self.environ
+
             if not name in self.environ:
                 # it's not one of the builtin functions
                 # I guess I have no other option but to try to execute
@@ -476,7 +574,8 @@ class CrazyASTTransformer (ast.NodeTransformer):
                         if is_option (arg):
                             # ast_pprinter takes care of expressions
                             kw= arg.keywords[0]
-                            logger.debug2 ("->>>kw: %s", ast.dump (kw))
+                            if logger.isEnabledFor (logging.DEBUG2):
+                                logger.debug2 ("->>>kw: %s", ast.dump (kw))
                             kw.arg= str (pprint (kw.arg))
 
                 ast.copy_location (new_node, node)
@@ -552,10 +651,9 @@ class CrazyASTTransformer (ast.NodeTransformer):
 
         self.generic_visit (node)
 
-        # handle 'remote'
-        sub_node= node.items[0].context_expr
-        if (type (sub_node)==Call and hasattr (sub_node.func, 'id') and
-            sub_node.func.id=='remote'):
+        # handle 'remote' and 'remote_many'
+        if is_remote (node):
+            sub_node= node.items[0].context_expr
             # capture the body and put it as the first argument to ssh()
             # but within a module, and already pickled;
             # otherwise we need to create an AST for the call of all the
@@ -568,6 +666,11 @@ class CrazyASTTransformer (ast.NodeTransformer):
             s.col_offset= node.col_offset
             sub_node.args.insert (0, s)
 
+            # only these are sent to the remote
+            names= Tuple (elts=[ Str (s=name) for name in sorted (free_names (m)) ],
+                          ctx=Load ())
+            update_keyword (sub_node, keyword (arg='_free', value=names))
+
             p= Pass ()
             p.lineno= node.lineno+1
             p.col_offset= node.col_offset+4
@@ -21,15 +21,33 @@ import io
 from collections.abc import Iterable
 import signal
 import errno
+import select
+import selectors
+from threading import Thread
 from traceback import format_exc
+import time
 
 import ayrton
+from ayrton.utils import write_all, copy_fd
 
 import logging
 logger= logging.getLogger ('ayrton.execute')
 
 encoding= sys.getdefaultencoding ()
 
+# if available (python 3.8 and later), launch Commands with posix_spawn(), which
+# does not have to copy the whole interpreter like fork() does; see
+# Command.spawn(). the tests use a fake one, see test_execute.Launch
+use_posix_spawn= hasattr (os, 'posix_spawn')
+
+def profiling ():
+    """Returns the runner's Profiler, if any; see ayrton.profiler."""
+    if ayrton.runner is not None:
+        return ayrton.runner.profiler
+    else:
+        return None
+
+
 # special value to signal that the output should be captured
 # instead of going to stdout
 class Capture:
@@ -60,6 +78,57 @@ class CommandNotFound (NameError):
         return "CommandNotFound or NameError: command %(name)s not found or name %(name)s is not defined" % self.__dict__
 
 
+class ResourceUsage:
+    """The resources used by a Command, as reported by os.wait4(), or the
+    sum of the ones of several of them. Times are in seconds; max_rss is in
+    KiB (bytes in macOS), see getrusage(2); in Linux it's never less than
+    ayrton's own, because it counts the memory the child had before exec().
+    elapsed is the time from its launch until it was reaped, which is when it
+    finished only if it was waited for right away; _bg=True Commands are
+    reaped when they're waited for. When added, max_rss is the biggest one
+    and elapsed is the sum of them."""
+
+    fields= ('user', 'system', 'max_rss', 'minor_faults', 'major_faults',
+             'elapsed')
+
+    def __init__ (self, user=0.0, system=0.0, max_rss=0, minor_faults=0,
+                  major_faults=0, elapsed=0.0):
+        self.user= user
+        self.system= system
+        self.max_rss= max_rss
+        self.minor_faults= minor_faults
+        self.major_faults= major_faults
+        self.elapsed= elapsed
+
+
+    @classmethod
+    def from_rusage (cls, rusage, elapsed):
+        return cls (rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss,
+                    rusage.ru_minflt, rusage.ru_majflt, elapsed)
+
+
+    @property
+    def cpu (self):
+        return self.user+self.system
+
+
+    def __add__ (self, other):
+        return ResourceUsage (self.user+other.user, self.system+other.system,
+                              max (self.max_rss, other.max_rss),
+                              self.minor_faults+other.minor_faults,
+                              self.major_faults+other.major_faults,
+                              self.elapsed+other.elapsed)
+
+
+    def as_dict (self):
+        return dict ([ (field, getattr (self, field)) for field in self.fields ])
+
+
+    def __repr__ (self):
+        return 'ResourceUsage (%s)' % ', '.join ([ '%s=%r' % (field, getattr (self, field))
+                                                   for field in self.fields ])
+
+
 def which(program):
     def is_exe(fpath):
         return os.path.exists(fpath) and os.access(fpath, os.X_OK)
@@ -98,6 +167,31 @@ def resolve_program(program):
     return path
 
 
+def find_program (program):
+    """Like resolve_program(), but remembers the paths found in the runner's
+    command_hash, like bash's hash does. The hash is emptied when PATH changes;
+    see also ayrton.functions.rehash(). Programs not found and paths with a
+    directory component are not remembered."""
+    runner= ayrton.runner
+    if runner is None or os.path.dirname (program)!='':
+        return resolve_program (program)
+
+    path= os.environ.get ('PATH', None)
+    if path!=runner.command_hash_path:
+        logger.debug ('PATH changed, clearing command hash')
+        runner.command_hash.clear ()
+        runner.command_hash_path= path
+
+    try:
+        exe= runner.command_hash[program]
+    except KeyError:
+        exe= resolve_program (program)
+        if exe is not None:
+            runner.command_hash[program]= exe
+
+    return exe
+
+
 def isiterable (o):
     """Returns True if o is iterable but not str/bytes type."""
     # TODO: what about Mappings?
@@ -140,14 +234,23 @@ class Command:
         self.stderr_pipe= None
 
         self._exit_code= None
+        self._usage= None
         self.capture_file= None
         self.captured_lines= None
+        # see capture_in_background()
+        self.capturer= None
 
         self.child_pid= None
+        # time.perf_counter() when it was launched and reaped
+        self.start_time= None
+        self.end_time= None
+        # see feed()
+        self.writer= None
+        self.writer_error= None
 
         # this is at the very bottom so, if anything happens, all the other
         # attibutes are already defined when __del__() runs
-        self.exe= resolve_program (path)
+        self.exe= find_program (path)
         logger.debug ('found exe %s', self.exe)
 
 
@@ -262,7 +365,7 @@ class Command:
                     i= i.fileno ()
 
                 elif isinstance (i, str) or isinstance (i, bytes) or isinstance (i, tuple):
-                    logger.debug ("[%s]: %r" % (type(i), i))
+                    logger.debug ("[%s]: %r", type (i), i)
                     file_name, mode= file_name_mode (i, os.O_RDONLY)
                     i= os.open (file_name, mode)
                     logger.debug ("_in::(str|bytes|tuple) redirects %d (%s) -> 0 (stdin)", i, file_name)
@@ -307,7 +410,7 @@ class Command:
                     o= o.fileno ()
 
                 elif isinstance (o, str) or isinstance (o, bytes) or isinstance (o, tuple):
-                    logger.debug ("[%s]: %r" % (type(o), o))
+                    logger.debug ("[%s]: %r", type (o), o)
                     file_name, mode= file_name_mode (o, os.O_WRONLY)
                     o= os.open (file_name, mode)
                     logger.debug ("_out::(str|bytes), redirects stdout 1 -> %d (%s)", o, file_name)
@@ -388,11 +491,99 @@ class Command:
             os._exit (127)
 
 
+    def spawn (self):
+        """Launches the command with os.posix_spawn(), translating what child()
+        does into file actions. Files are opened in the parent. Returns the
+        child's pid, or None if something fails, in which case the Command
+        should be launched with fork() and child(), so errors are handled as
+        always."""
+        logger.debug ('spawn')
+
+        file_actions= []
+        # fds opened just for the child
+        opened= []
+
+        def redirect (fd, target):
+            if target!=fd:
+                logger.debug ("redirects %d -> %d", fd, target)
+                file_actions.append ((os.POSIX_SPAWN_DUP2, target, fd))
+
+        def open_file (file_name, mode):
+            fd= os.open (file_name, mode)
+            opened.append (fd)
+
+            return fd
+
+        try:
+            if '_in' in self.options:
+                i= self.options['_in']
+                if i is None:
+                    i= open_file (os.devnull, os.O_RDONLY)
+                elif isinstance (i, io.IOBase):
+                    i= i.fileno ()
+                elif isinstance (i, (str, bytes, tuple)):
+                    i= open_file (*file_name_mode (i, os.O_RDONLY))
+
+                if isinstance (i, int):
+                    redirect (0, i)
+                else:
+                    # the pipe prepared by prepare_fds()
+                    redirect (0, self.stdin_pipe[0])
+
+            if '_out' in self.options:
+                o= self.options['_out']
+                if o is None:
+                    o= open_file (os.devnull, os.O_WRONLY)
+                elif isinstance (o, io.IOBase):
+                    o= o.fileno ()
+                elif isinstance (o, (str, bytes, tuple)):
+                    o= open_file (*file_name_mode (o, os.O_WRONLY))
+
+                if isinstance (o, int):
+                    redirect (1, o)
+                elif o==Capture or o==Pipe:
+                    redirect (1, self.stdout_pipe[1])
+
+            if '_err' in self.options:
+                e= self.options['_err']
+                if e is None:
+                    e= open_file (os.devnull, os.O_WRONLY)
+                elif isinstance (e, io.IOBase):
+                    e= e.fileno ()
+                elif isinstance (e, (str, bytes, tuple)):
+                    e= open_file (*file_name_mode (e, os.O_WRONLY))
+
+                if isinstance (e, int):
+                    redirect (2, e)
+                elif e==Capture:
+                    if self.options.get ('_out', None)==Capture:
+                        redirect (2, 1)
+                    else:
+                        redirect (2, self.stderr_pipe[1])
+
+            # the rest of the fds are closed on exec(), as python creates them
+            # non inheritable
+            pid= os.posix_spawn (self.exe, self.args, self.options['_env'],
+                                 file_actions=file_actions,
+                                 setsigdef=(signal.SIGPIPE, signal.SIGINT))
+        except (OSError, TypeError, ValueError) as e:
+            logger.debug ('spawn failed, falling back to fork: %s', e)
+            pid= None
+        finally:
+            for fd in opened:
+                os.close (fd)
+
+        return pid
+
+
     def prepare_args (self, cmd, args, kwargs):
         ans= [cmd]
+        # checked once and not for each argument
+        debug= logger.isEnabledFor (logging.DEBUG)
 
         for arg in args:
-            logger.debug("%r", arg)
+            if debug:
+                logger.debug("%r", arg)
             if isinstance (arg, o):
                 self.prepare_arg (ans, arg.key, arg.value)
             else:
@@ -406,7 +597,8 @@ class Command:
                         ans.append (str (arg))
 
         for k, v in kwargs.items ():
-            logger.debug("%r: %r", k, v)
+            if debug:
+                logger.debug("%r: %r", k, v)
             if k is not None and v is not None:
                 self.prepare_arg (ans, k, v)
 
@@ -434,6 +626,28 @@ class Command:
     def parent (self):
         logger.debug ('parent')
 
+        self.feed ()
+
+        if not self.options['_bg']:
+            if ayrton.runner.parallel is not None:
+                # inside a parallel() block; it will be waited there
+                ayrton.runner.parallel.add (self)
+                return
+
+            self.capture ()
+            self.wait ()
+            # NOTE: uhm?
+            ayrton.runner.wait_for_pending_children ()
+        else:
+            ayrton.runner.pending_children.append (self)
+
+
+    def feed (self):
+        """Writes _in into the child's stdin, if needed, and closes the
+        parent's side of the pipe. Unless the data is small enough to be
+        written without blocking, it's written from a background thread, so
+        the child can't block us while we're not reading its output; see
+        wait()."""
         if self.stdin_pipe is not None:
             # str -> write into the fd
             # list -> write each
@@ -444,60 +658,173 @@ class Command:
             logger.debug ('closing %d', r)
             os.close (r)
 
-            if isinstance (i, Iterable) and (not isinstance (i, Command) or
-                                             i.options.get ('_out', None)==Capture):
-                # this includes file-like's and Capture'd Commands
-                for e in i:
-                    os.write (w, str (e).encode (encoding))
-                    os.write (w, self.options['_end'])
-            elif not isinstance (i, Command):
-                os.write (w, str (i).encode (encoding))
-                os.write (w, self.options['_end'])
+            if isinstance (i, Command) and i.options.get ('_out', None)!=Capture:
+                # the child reads directly from i's stdout_pipe
+                logger.debug ('closing %d', w)
+                os.close (w)
+            elif (    isinstance (i, Command) and i.captured_lines is None
+                  and i.capture_file is None
+                  and self.options['_end']==os.linesep.encode (encoding) ):
+                # i's output has not been read yet, so we just copy it as is
+                # instead of reading it line by line
+                logger.debug ('copying from %s', i)
+                self.start_writer (self.copy_input, i, w)
+            else:
+                if not isinstance (i, Iterable):
+                    i= [ i ]
+
+                if isinstance (i, (list, tuple)) and len (i)<=16:
+                    data= b''.join (self.input_batches (i))
+                    if len (data)<=select.PIPE_BUF:
+                        # it fits in the pipe, so it can't block
+                        self.write_input ([ data ], w)
+                        return
+
+                    batches= [ data ]
+                else:
+                    # this includes file-like's and Capture'd Commands
+                    batches= self.input_batches (i)
+
+                self.start_writer (self.write_input, batches, w)
+
 
+    def input_batches (self, i, batch_len=65536):
+        """Converts the elements of i to bytes, terminated by _end, and joins
+        them in batches of at least batch_len bytes, so they're written with
+        less syscalls."""
+        end= self.options['_end']
+        batch= bytearray ()
+
+        for e in i:
+            batch+= str (e).encode (encoding)
+            batch+= end
+
+            if len (batch)>=batch_len:
+                yield batch
+                batch= bytearray ()
+
+        if len (batch)>0:
+            yield batch
+
+
+    def write_input (self, batches, w):
+        try:
+            for batch in batches:
+                write_all (w, batch)
+        except BrokenPipeError:
+            # the child does not want more input
+            logger.debug ('%s closed its stdin', self.exe)
+        finally:
             logger.debug ('closing %d', w)
             os.close (w)
 
-        # TODO: The return status of a pipeline is the exit status of the last
-        # command, unless the pipefail option is enabled. If pipefail is enabled,
-        # the pipeline's return status is the value of the last (rightmost)
-        # command to exit with a non-zero status, or zero if all commands exit
-        # successfully.
-        if not self.options['_bg']:
-            if self.options.get ('_out', None)==Capture:
-                # if we don't do this, a program with lots of output freezes
-                # when its output buffer is full
-                # on the other hand, this might take a lot of memory
-                # but it's the same as in foo=$(long_output)
-                self.prepare_capture_file ()
-                self.captured_lines= self.capture_file.readlines ()
-                logger.debug ('closing %r', self.capture_file)
-                self.capture_file.close ()
 
-            self.wait ()
-            # NOTE: uhm?
-            ayrton.runner.wait_for_pending_children ()
-        else:
-            ayrton.runner.pending_children.append (self)
+    def copy_input (self, i, w):
+        i.prepare_capture_file (binary=True)
+
+        try:
+            copy_fd (i.capture_file.fileno (), w)
+        except BrokenPipeError:
+            logger.debug ('%s closed its stdin', self.exe)
+        finally:
+            logger.debug ('closing %r', i.capture_file)
+            i.capture_file.close ()
+            logger.debug ('closing %d', w)
+            os.close (w)
+
+        # same as if it had been iterated
+        i.wait ()
+
+
+    def start_writer (self, function, *args):
+        def writer ():
+            try:
+                function (*args)
+            except Exception as e:
+                logger.debug (format_exc ())
+                # see wait()
+                self.writer_error= e
+
+        self.writer= Thread (target=writer, daemon=True)
+        self.writer.start ()
+
+
+    def capture (self):
+        """Reads the whole output of a foreground Command, if it's captured."""
+        if self.options.get ('_out', None)==Capture:
+            # if we don't do this, a program with lots of output freezes
+            # when its output buffer is full
+            # on the other hand, this might take a lot of memory
+            # but it's the same as in foo=$(long_output)
+            # _bg=True Commands (like the ones in for loops) are read
+            # while iterating instead, see __iter__() and chunks()
+            self.prepare_capture_file ()
+            self.captured_lines= self.capture_file.readlines ()
+            logger.debug ('closing %r', self.capture_file)
+            self.capture_file.close ()
+
+
+    def capture_in_background (self):
+        """Like capture(), but in another thread, for Commands that are not
+        waited for right away, like in parallel(). Accessing the output or
+        waiting for the Command waits for the thread first, so they don't read
+        from the capture file at the same time."""
+        self.capturer= Thread (target=self.capture, daemon=True)
+        self.capturer.start ()
+
+
+    def join_capturer (self):
+        if self.capturer is not None:
+            self.capturer.join ()
+            self.capturer= None
 
 
     def wait(self):
         logger.debug(self.child_pid)
         logger.debug(self._exit_code)
 
+        self.join_capturer()
+
         if self._exit_code is None:
-            self._exit_code = os.waitpid(self.child_pid, 0)[1] >> 8
+            self.reap()
+            self.check()
+
+
+    def reap(self):
+        """Waits for the child to finish, but does not check its exit code;
+        see check()."""
+        status, rusage, self.end_time = reaper.wait4(self.child_pid)
+        self._exit_code = status >> 8
+        self._usage = ResourceUsage.from_rusage(rusage, self.end_time-self.start_time)
+        if ayrton.runner is not None:
+            ayrton.runner.usage += self._usage
+
+        if self.writer is not None:
+            # the child is finished, so the writer will not block anymore
+            self.writer.join()
+            self.writer = None
+
+            if self.writer_error is not None:
+                raise self.writer_error
+
 
-            if self._exit_code == 127:
-                # NOTE: when running bash, it returns 127 when it can't find the script to run
-                raise CommandNotFound(self.path)
+    def check(self):
+        """Raises CommandNotFound or CommandFailed, if needed."""
+        if self._exit_code == 127:
+            # NOTE: when running bash, it returns 127 when it can't find the script to run
+            # the executable might have been (re)moved, look for it again next time
+            if ayrton.runner is not None:
+                ayrton.runner.command_hash.pop(self.path, None)
 
-            logger.debug2(ayrton.runner.options)
-            logger.debug2(self.options)
-            if ( ayrton.runner.options.get('errexit', False) and
-                 self._exit_code != 0 and
-                 not self.options.get('_fails', False) ):
+            raise CommandNotFound(self.path)
 
-                raise CommandFailed(self)
+        logger.debug2(ayrton.runner.options)
+        logger.debug2(self.options)
+        if ( ayrton.runner.options.get('errexit', False) and
+             self._exit_code != 0 and
+             not self.options.get('_fails', False) ):
+
+            raise CommandFailed(self)
 
 
     def exit_code (self):
@@ -506,14 +833,26 @@ class Command:
         return self._exit_code
 
 
-    def __call__ (self, *args, **kwargs):
+    def usage (self):
+        """The ResourceUsage of the child; see reap()."""
+        if self._exit_code is None:
+            self.wait ()
+        return self._usage
+
+
+    def setup (self, *args, **kwargs):
+        """Processes the arguments and options, but does not run the Command;
+        see launch(). Returns the Command itself, so it can be used in
+        Pipelines."""
         if self.exe is None:
             raise CommandNotFound (self.path)
 
         self.options = self.default_options.copy ()
+        debug= logger.isEnabledFor (logging.DEBUG2)
         for option in self.supported_options:
             if option in kwargs:
-                logger.debug2("%s: %r", option, kwargs[option])
+                if debug:
+                    logger.debug2("%s: %r", option, kwargs[option])
                 # update with the passed value
                 self.options[option]= kwargs[option]
                 # we don't need the option anymore
@@ -522,34 +861,69 @@ class Command:
         self.options['_env'].update (os.environ)
         self.args= self.prepare_args (self.exe, args, kwargs)
 
+        if type (self.options['_end'])!=bytes:
+            self.options['_end']= str (self.options['_end']).encode (encoding)
+
+        return self
+
+
+    def launch (self):
+        """Starts the Command. What happens with its input and output in this
+        process is handled by feed() and parent()."""
+        if isinstance (self.options.get ('_in', None), Pipeline):
+            # read from the last Command in the Pipeline
+            self.options['_in']= self.options['_in'].commands[-1]
+
         self.stdin_pipe= None
         self.stdout_pipe= None
         self.stderr_pipe= None
 
         # TODO: why this again here? see __init__()
         self._exit_code= None
+        self._usage= None
         self.capture_file= None
+        self.writer= None
+        self.writer_error= None
+
+        self.start_time= time.perf_counter ()
+        self.end_time= None
+
+        if ayrton.runner is not None and ayrton.runner.tracer is not None:
+            # so the trace comes before the Command's output
+            ayrton.runner.tracer.flush ()
 
         self.prepare_fds ()
 
-        if type (self.options['_end'])!=bytes:
-            self.options['_end']= str (self.options['_end']).encode (encoding)
+        logger.debug ('about to execute %s %s', self.exe, self.args)
+        r= None
+        if use_posix_spawn:
+            r= self.spawn ()
 
-        logger.debug ('about to execute %s %s' % (self.exe, self.args))
-        logger.debug ('fork')
-        r= os.fork ()
-        if r==0:
-            try:
-                self.child ()
-            except Exception as e:
-                logger.debug ('child borked')
-                logger.debug (format_exc())
+        if r is None:
+            logger.debug ('fork')
+            r= os.fork ()
+            if r==0:
+                try:
+                    self.child ()
+                except Exception as e:
+                    logger.debug ('child borked')
+                    logger.debug (format_exc())
 
-            # catch all
-            os._exit (1)
-        else:
-            self.child_pid= r
-            self.parent ()
+                # catch all
+                os._exit (1)
+
+        self.child_pid= r
+        reaper.register (r)
+
+        profiler= profiling ()
+        if profiler is not None:
+            profiler.command_launched (self, self.start_time, time.perf_counter ())
+
+
+    def __call__ (self, *args, **kwargs):
+        self.setup (*args, **kwargs)
+        self.launch ()
+        self.parent ()
 
         return self
 
@@ -560,7 +934,7 @@ class Command:
         return self._exit_code==0
 
 
-    def prepare_capture_file (self):
+    def prepare_capture_file (self, binary=False):
         if self.capture_file is None:
             reader_pipe= None
 
@@ -574,7 +948,10 @@ class Command:
                 r, w= reader_pipe
                 logger.debug ('closing %d', w)
                 os.close (w)
-                self.capture_file= open (r, encoding=encoding)
+                if binary:
+                    self.capture_file= open (r, 'rb')
+                else:
+                    self.capture_file= open (r, encoding=encoding)
 
 
     def __str__ (self):
@@ -596,6 +973,7 @@ class Command:
 
     def __iter__ (self):
         logger.debug ('iterating!')
+        self.join_capturer ()
 
         if self.captured_lines is not None:
             for line in self.captured_lines:
@@ -606,7 +984,9 @@ class Command:
             self.prepare_capture_file ()
 
             if self.capture_file is not None:  # TODO: test
-                for line in self.capture_file.readlines ():
+                # iterating over the file gives us the lines as the child
+                # writes them, without keeping the whole output in memory
+                for line in self.capture_file:
                     # while iterating we always remove the trailing \n
                     line= line.rstrip (os.linesep)
 
@@ -623,6 +1003,42 @@ class Command:
                 yield None
 
 
+    def chunks (self, size=io.DEFAULT_BUFFER_SIZE):
+        """Like iterating over the Command, but yields the output as bytes, in
+        chunks of at most size bytes, as soon as the child writes them. Useful
+        for non text output."""
+        logger.debug ('iterating chunks!')
+        self.join_capturer ()
+
+        if self.captured_lines is not None:
+            # already read, see parent()
+            data= ''.join (self.captured_lines).encode (encoding)
+            for i in range (0, len (data), size):
+                yield data[i:i+size]
+        else:
+            self.prepare_capture_file (binary=True)
+
+            if self.capture_file is not None:
+                if ( self.capture_file.closed or
+                     isinstance (self.capture_file, io.TextIOBase) ):
+                    # the text file might have read ahead part of the output
+                    raise ValueError ('the output of %s was already read as text' %
+                                      self.path)
+
+                while True:
+                    # read1() returns whatever is available instead of
+                    # waiting for size bytes
+                    data= self.capture_file.read1 (size)
+                    if len (data)==0:
+                        break
+
+                    yield data
+
+                logger.debug ('closing %r', self.capture_file)
+                self.capture_file.close ()
+                self.wait ()
+
+
     def readlines (self):
         self.wait ()
 
@@ -667,3 +1083,355 @@ class Command:
         # finish it
         if self._exit_code is None and self.child_pid is not None:
             self.wait ()
+
+
+class Pipeline:
+    """a () | b () | c (). The Commands are already setup() but not launched.
+    Calling the Pipeline launches all of them, connecting each one's stdout to
+    the next one's stdin, and then waits for all of them, unless _bg is True.
+
+    The exit code is the last Command's or, if the pipefail option is set, the
+    one of the rightmost Command that exited with non zero, like in bash."""
+
+    def __init__ (self, *commands):
+        self.commands= list (commands)
+        self.options= None
+        self._exit_code= None
+
+
+    def __call__ (self, **kwargs):
+        first= self.commands[0]
+        last= self.commands[-1]
+
+        # options given to the whole Pipeline, like the ones added by the
+        # transformer for redirections and for loops
+        for option, value in kwargs.items ():
+            if option not in Command.supported_options:
+                raise TypeError ('unknown option for a Pipeline: %r' % option)
+
+            if option=='_in':
+                first.options[option]= value
+            else:
+                last.options[option]= value
+
+        if type (last.options['_end'])!=bytes:
+            last.options['_end']= str (last.options['_end']).encode (encoding)
+
+        # the last Command's options are the Pipeline's
+        self.options= last.options
+        # the exit codes are checked by the Pipeline, see wait()
+        self.fails= [ command.options['_fails'] for command in self.commands ]
+        for command in self.commands:
+            command.options['_fails']= True
+
+        for index, command in enumerate (self.commands):
+            if command is not first:
+                command.options['_in']= self.commands[index-1]
+
+            if command is not last:
+                command.options['_out']= Pipe
+
+            command.launch ()
+
+            if command is not first:
+                # closes the pipe from the previous Command in this process
+                command.feed ()
+
+        # now that all the Commands are running
+        first.feed ()
+
+        if not self.options['_bg']:
+            if ayrton.runner.parallel is not None:
+                ayrton.runner.parallel.add (self)
+                return self
+
+            last.capture ()
+            self.wait ()
+            ayrton.runner.wait_for_pending_children ()
+        else:
+            ayrton.runner.pending_children.append (self)
+
+        return self
+
+
+    @property
+    def args (self):
+        # see CommandFailed
+        ans= []
+        for command in self.commands:
+            if len (ans)>0:
+                ans.append ('|')
+            ans.extend (command.args)
+
+        return ans
+
+
+    def wait (self):
+        if self._exit_code is None:
+            # reap all the Commands before checking any of them, so none is
+            # left as a zombie if one raises
+            error= None
+            for command in self.commands:
+                if command._exit_code is None:
+                    try:
+                        command.reap ()
+                    except Exception as e:
+                        if error is None:
+                            error= e
+
+            exit_codes= [ command._exit_code for command in self.commands ]
+
+            index= len (exit_codes)-1
+            if ayrton.runner.options.get ('pipefail', False):
+                for i, exit_code in enumerate (exit_codes):
+                    if exit_code!=0:
+                        index= i
+
+            self._exit_code= exit_codes[index]
+
+            if error is not None:
+                raise error
+
+            for command in self.commands:
+                # all of them have _fails, so only CommandNotFound is raised
+                command.check ()
+
+            # _fails in the last Command is for the whole Pipeline
+            if ( ayrton.runner.options.get ('errexit', False) and
+                 self._exit_code!=0 and
+                 not (self.fails[index] or self.fails[-1]) ):
+
+                raise CommandFailed (self)
+
+
+    def exit_code (self):
+        self.wait ()
+        return self._exit_code
+
+
+    def exit_codes (self):
+        """The exit codes of all the Commands, in order."""
+        self.wait ()
+        return [ command._exit_code for command in self.commands ]
+
+
+    def usages (self):
+        """The ResourceUsage of all the Commands, in order."""
+        self.wait ()
+        return [ command._usage for command in self.commands ]
+
+
+    def usage (self):
+        """The sum of the Commands' ResourceUsage, but the elapsed time is
+        the Pipeline's, from the first launch to the last reap."""
+        usage= ResourceUsage ()
+        for command_usage in self.usages ():
+            usage+= command_usage
+
+        usage.elapsed= ( max ([ command.end_time for command in self.commands ]) -
+                         min ([ command.start_time for command in self.commands ]) )
+
+        return usage
+
+
+    def __bool__ (self):
+        return self.exit_code ()==0
+
+
+    # the output is the last Command's
+
+    def __str__ (self):
+        s= str (self.commands[-1])
+        self.wait ()
+
+        return s
+
+
+    def __iter__ (self):
+        for line in self.commands[-1]:
+            yield line
+
+        self.wait ()
+
+
+    def chunks (self, size=io.DEFAULT_BUFFER_SIZE):
+        for data in self.commands[-1].chunks (size):
+            yield data
+
+        self.wait ()
+
+
+    def readlines (self):
+        lines= self.commands[-1].readlines ()
+        self.wait ()
+
+        return lines
+
+
+    def readline (self):
+        return self.commands[-1].readline ()
+
+
+    def close (self):
+        self.commands[-1].close ()
+        self.wait ()
+
+
+class Reaper:
+    """Collects the exit status of the children as soon as they finish, so
+    we can wait for any of a set of Commands and Pipelines instead of for
+    each one in turn. With os.pidfd_open() (Python 3.9+ and Linux 5.3+) it
+    waits on their pidfds with a selector; otherwise with os.waitid()."""
+
+    def __init__ (self):
+        # pid: pidfd
+        self.pidfds= {}
+        # the children we launched; somebody else's (subprocess.Popen's,
+        # asyncio's, ...) are never reaped, or they would lose their status
+        self.pids= set ()
+        # pid: (status, rusage, time.perf_counter()), for the children reaped
+        # but not wait4()'ed yet
+        self.statuses= {}
+
+
+    def register (self, pid):
+        """Called as soon as a child is launched, so the pidfd can't refer to
+        another process that reused the pid."""
+        self.pids.add (pid)
+        # a status kept for a previous child with the same pid is stale
+        self.statuses.pop (pid, None)
+
+        if hasattr (os, 'pidfd_open'):
+            try:
+                self.pidfds[pid]= os.pidfd_open (pid)
+            except OSError as e:
+                # ENOSYS in older kernels
+                logger.debug ('pidfd_open (%d) failed: %s', pid, e)
+
+
+    def collect (self, pid, options=0):
+        """Reaps the child, keeping its status and resource usage for
+        wait4(). Returns False if options has os.WNOHANG and it has not
+        finished yet."""
+        if pid not in self.statuses:
+            pid_, status, rusage= os.wait4 (pid, options)
+            if pid_==0:
+                return False
+
+            self.pids.discard (pid)
+            pidfd= self.pidfds.pop (pid, None)
+            if pidfd is not None:
+                os.close (pidfd)
+
+            self.statuses[pid]= (status, rusage, time.perf_counter ())
+
+            profiler= profiling ()
+            if profiler is not None:
+                profiler.command_reaped (pid, rusage)
+
+        return True
+
+
+    def wait4 (self, pid):
+        """Like os.wait4 (pid, 0)[1:], plus the time it was reaped."""
+        self.collect (pid)
+
+        return self.statuses.pop (pid)
+
+
+    def commands (self, job):
+        if isinstance (job, Pipeline):
+            return job.commands
+        else:
+            return [ job ]
+
+
+    def finished (self, job):
+        try:
+            return all (command._exit_code is not None or
+                        self.collect (command.child_pid, os.WNOHANG)
+                        for command in self.commands (job))
+        except ChildProcessError:
+            # somebody else reaped it; job.wait() will tell
+            return True
+
+
+    def block (self, pids):
+        """Blocks until any of pids finishes."""
+        if all (pid in self.pidfds for pid in pids):
+            # pidfd's become readable when the process finishes
+            with selectors.DefaultSelector () as selector:
+                for pid in pids:
+                    selector.register (self.pidfds[pid], selectors.EVENT_READ)
+
+                selector.select ()
+        elif hasattr (os, 'waitid'):
+            while True:
+                try:
+                    # WNOWAIT leaves the child to be reaped later
+                    info= os.waitid (os.P_ALL, 0, os.WEXITED|os.WNOWAIT)
+                except ChildProcessError:
+                    # somebody else reaped them; wait_any() will tell
+                    return
+
+                if info is None or info.si_pid in pids:
+                    return
+
+                if info.si_pid not in self.pids:
+                    # somebody else's, which waitid() would return again and
+                    # again, but it's not ours to reap
+                    self.poll (pids)
+                    return
+
+                # another of ours (a _bg=True Command); keep its status for
+                # when it's wait4()'ed
+                self.collect (info.si_pid)
+        else:
+            # there's no way to know which one finishes first
+            self.collect (pids[0])
+
+
+    def poll (self, pids):
+        """Blocks until any of pids finishes by checking them every now and
+        then."""
+        delay= 0.001
+        while True:
+            try:
+                if any (self.collect (pid, os.WNOHANG) for pid in pids):
+                    return
+            except ChildProcessError:
+                # somebody else reaped it; wait_any() will tell
+                return
+
+            time.sleep (delay)
+            delay= min (delay*2, 0.05)
+
+
+    def wait_any (self, jobs):
+        """Waits until any of jobs (Commands or Pipelines) finishes. Returns
+        the ones that already did. Their exit code is not checked until their
+        wait() is called."""
+        while True:
+            done= [ job for job in jobs if self.finished (job) ]
+            if len (done)>0 or len (jobs)==0:
+                return done
+
+            self.block ([ command.child_pid
+                          for job in jobs for command in self.commands (job)
+                          if command._exit_code is None and
+                             command.child_pid not in self.statuses ])
+
+
+    def wait_all (self, jobs):
+        """Waits for all of jobs, yielding them as they finish."""
+        jobs= list (jobs)
+
+        while len (jobs)>0:
+            for job in self.wait_any (jobs):
+                jobs.remove (job)
+                yield job
+
+
+# children belong to the process, not to a runner (and there can be several
+# of those, one after the other), so there's only one of these
+reaper= Reaper ()
@@ -76,6 +76,9 @@ option_map= dict (
     e= 'errexit',
     )
 
+# options that don't have a short form
+long_options= ( 'pipefail', )
+
 
 def option (option, value=True):
     if len (option)==2:
@@ -91,12 +94,118 @@ def option (option, value=True):
         except KeyError:
             raise KeyError ("Unrecognized option %r" % option)
 
-    if option not in option_map.values ():
+    if option not in option_map.values () and option not in long_options:
         raise KeyError ("Unrecognized option %r" % option)
 
     ayrton.runner.options[option]= value
 
 
+class parallel (object):
+    """Runs the Commands and Pipelines executed in its body in the background,
+    but at most n at the same time (by default, as many as CPUs there are)::
+
+        with parallel (4) as p:
+            for host in hosts:
+                rsync ('-a', src, '%s:%s' % (host, dst))
+
+    Leaving the block waits for all of them. Their exit codes, in the order
+    they were launched, are in p.exit_codes. The first error found while
+    waiting for them, like CommandFailed if errexit is set, is raised then,
+    once all of them finished."""
+    def __init__ (self, n=None):
+        if n is None:
+            n= os.cpu_count () or 1
+
+        if n<1:
+            raise ValueError ("parallel() needs at least one slot, not %r" % n)
+
+        self.n= n
+        # all of them, in launch order
+        self.jobs= []
+        self.running= []
+        self.failed= None
+        self.outer= None
+
+    def __enter__ (self):
+        # they can be nested
+        self.outer= ayrton.runner.parallel
+        ayrton.runner.parallel= self
+
+        return self
+
+    def __exit__ (self, *args):
+        ayrton.runner.parallel= self.outer
+
+        while len (self.running)>0:
+            self.reap ()
+
+        # don't hide any other exception
+        if self.failed is not None and args[0] is None:
+            raise self.failed
+
+    @property
+    def exit_codes (self):
+        return [ job._exit_code for job in self.jobs ]
+
+    def add (self, job):
+        """Called for each Command or Pipeline launched in the body instead of
+        waiting for it. Returns when there's a slot for the next one."""
+        self.jobs.append (job)
+        self.running.append (job)
+
+        last= job
+        if isinstance (last, ayrton.execute.Pipeline):
+            last= job.commands[-1]
+
+        if last.options.get ('_out', None)==ayrton.execute.Capture:
+            # otherwise, if it has lots of output, it will never finish
+            last.capture_in_background ()
+
+        while len (self.running)>=self.n:
+            self.reap ()
+
+    def reap (self):
+        """Waits for any of the running jobs to finish."""
+        job= ayrton.execute.reaper.wait_any (self.running)[0]
+
+        logger.debug ('reaping %s', job.args)
+        self.running.remove (job)
+
+        try:
+            job.wait ()
+        except Exception as e:
+            # raised when all of them finished, see __exit__()
+            logger.debug ('%s failed: %r', job.args, e)
+            if self.failed is None:
+                self.failed= e
+
+
+def rehash ():
+    """Forgets the paths of the executables found so far, like bash's `hash -r`."""
+    ayrton.runner.command_hash.clear ()
+
+
+def remote (*args, **kwargs):
+    """See ayrton.remote.remote. paramiko takes a long time to import, so it's
+    only loaded the first time a remote() block is executed."""
+    import ayrton.remote
+
+    return ayrton.remote.remote (*args, **kwargs)
+
+
+def remote_many (*args, **kwargs):
+    """See ayrton.remote.remote_many and remote()."""
+    import ayrton.remote
+
+    return ayrton.remote.remote_many (*args, **kwargs)
+
+
+def resource_usage ():
+    """The sum of the ResourceUsage of the Commands run so far; see
+    ayrton.execute.ResourceUsage."""
+    return ayrton.runner.usage
+
+
 def run (path, *args, **kwargs):
     c= ayrton.execute.Command (path)
     return c (*args, **kwargs)
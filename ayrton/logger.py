@@ -112,5 +112,28 @@ class Logger(logging.Logger):
         self.handle(record)
 
 
+def debug2(self, msg, *args, **kwargs):  # pragma: no cover
+    if self.isEnabledFor(logging.DEBUG2):
+        self._log(logging.DEBUG2, msg, args, **kwargs)
+
+
+def debug3(self, msg, *args, **kwargs):  # pragma: no cover
+    if self.isEnabledFor(logging.DEBUG3):
+        self._log(logging.DEBUG3, msg, args, **kwargs)
+
+
+def patch_logging():
+    # based on https://mail.python.org/pipermail/tutor/2007-August/056243.html
+    logging.DEBUG2 = 9
+    logging.DEBUG3 = 8
+
+    logging.addLevelName(logging.DEBUG2, 'DEBUG2')
+    logging.addLevelName(logging.DEBUG3, 'DEBUG3')
+
+    logging.Logger.debug2 = debug2
+    logging.Logger.debug3 = debug3
+
+
 # insert this code in logging's infra
+patch_logging()
 logging.setLoggerClass(Logger)
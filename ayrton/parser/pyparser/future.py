@@ -34,15 +34,16 @@ futureFlags_3_5 = FutureFlags((3, 5, 0, 'final', 0))
 
 
 class TokenIterator:
+    """Iterates over tokens, which can be a generator. The tokens taken from it
+    are kept in seen, so they can be given to the parser afterwards."""
     def __init__(self, tokens):
-        self.tokens = tokens
-        self.index = 0
+        self.tokens = iter(tokens)
+        self.seen = []
         self.next()
 
     def next(self):
-        index = self.index
-        self.index = index + 1
-        self.tok = self.tokens[index]
+        self.tok = next(self.tokens)
+        self.seen.append(self.tok)
 
     def skip(self, n):
         if self.tok[0] == n:
@@ -76,9 +77,9 @@ class TokenIterator:
             pass
 
 
-def add_future_flags(future_flags, tokens):
+def add_future_flags(future_flags, it):
+    """it is a TokenIterator."""
     from ayrton.parser.pyparser import pygram
-    it = TokenIterator(tokens)
     result = 0
     last_position = (0, 0)
     #
@@ -0,0 +1,63 @@
+#! /usr/bin/env python3.6
+"""Module gengrammar
+
+Generates the parser tables (symbols, labels, DFAs and first sets) for the
+grammar in data/Grammar3.6, so they don't have to be built by the
+metaparser every time ayrton is imported.
+
+The tables must be regenerated every time the grammar file or the token
+numbers in pytoken.py change; otherwise they're ignored and built every time
+(see pygram.load_python_grammar()). test_pyparser checks they're up to date.
+
+To regenerate the tables, run::
+
+    $ python gengrammar.py [output_file]
+
+The output file is grammar_generated.py by default. It's replaced only once
+it has been completely written, because pygram imports it.
+"""
+
+import os
+import pprint
+import sys
+import tempfile
+
+from ayrton.parser.pyparser.pygram import build_python_grammar, GRAMMAR_FILE, \
+    GRAMMAR_ATTRIBUTES, grammar_digest
+
+def generate(f):
+    gram = build_python_grammar()
+    print("# THIS FILE IS AUTOMATICALLY GENERATED BY gengrammar.py", file=f)
+    print("# FROM data/%s" % (GRAMMAR_FILE, ), file=f)
+    print("# DO NOT EDIT", file=f)
+    print("# TO REGENERATE THE FILE, RUN:", file=f)
+    print("#     python gengrammar.py", file=f)
+    print(file=f)
+    print("grammar_digest = %r" % (grammar_digest(), ), file=f)
+    print(file=f)
+    for name in GRAMMAR_ATTRIBUTES:
+        print("%s = %s" % (name, pprint.pformat(getattr(gram, name))), file=f)
+        print(file=f)
+
+def main(argv):
+    if len(argv) > 1:
+        output = argv[1]
+    else:
+        output = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "grammar_generated.py")
+
+    fd, tmp = tempfile.mkstemp(suffix=".py", dir=os.path.dirname(os.path.abspath(output)))
+    try:
+        with os.fdopen(fd, "w") as f:
+            generate(f)
+        # mkstemp() makes it private
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, output)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+# ______________________________________________________________________
+
+if __name__ == "__main__":
+    main(sys.argv)
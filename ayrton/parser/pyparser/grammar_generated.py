@@ -0,0 +1,1556 @@
+# THIS FILE IS AUTOMATICALLY GENERATED BY gengrammar.py
+# FROM data/Grammar3.6
+# DO NOT EDIT
+# TO REGENERATE THE FILE, RUN:
+#     python gengrammar.py
+
+grammar_digest = 'ca02806768254537e467cffae51a532d720b1d91'
+
+symbol_ids = {'and_expr': 257,
+ 'and_test': 258,
+ 'arglist': 259,
+ 'argument': 260,
+ 'arith_expr': 261,
+ 'assert_stmt': 262,
+ 'async_funcdef': 263,
+ 'async_stmt': 264,
+ 'atom': 265,
+ 'atom_expr': 266,
+ 'augassign': 267,
+ 'break_stmt': 268,
+ 'classdef': 269,
+ 'comp_for': 270,
+ 'comp_if': 271,
+ 'comp_iter': 272,
+ 'comp_op': 273,
+ 'comparison': 274,
+ 'compound_stmt': 275,
+ 'continue_stmt': 276,
+ 'decorated': 277,
+ 'decorator': 278,
+ 'decorators': 279,
+ 'del_stmt': 280,
+ 'dictorsetmaker': 281,
+ 'dotted_as_name': 282,
+ 'dotted_as_names': 283,
+ 'dotted_name': 284,
+ 'encoding_decl': 285,
+ 'eval_input': 286,
+ 'except_clause': 287,
+ 'expr': 288,
+ 'expr_stmt': 289,
+ 'exprlist': 290,
+ 'factor': 291,
+ 'file_input': 292,
+ 'flow_stmt': 293,
+ 'for_stmt': 294,
+ 'funcdef': 295,
+ 'global_stmt': 296,
+ 'if_stmt': 297,
+ 'import_as_name': 298,
+ 'import_as_names': 299,
+ 'import_from': 300,
+ 'import_name': 301,
+ 'import_stmt': 302,
+ 'lambdef': 303,
+ 'lambdef_nocond': 304,
+ 'nonlocal_stmt': 305,
+ 'not_test': 306,
+ 'or_test': 307,
+ 'parameters': 308,
+ 'pass_stmt': 309,
+ 'power': 310,
+ 'raise_stmt': 311,
+ 'return_stmt': 312,
+ 'shift_expr': 313,
+ 'simple_stmt': 314,
+ 'single_input': 256,
+ 'sliceop': 315,
+ 'small_stmt': 316,
+ 'star_expr': 317,
+ 'stmt': 318,
+ 'subscript': 319,
+ 'subscriptlist': 320,
+ 'suite': 321,
+ 'term': 322,
+ 'test': 323,
+ 'test_nocond': 324,
+ 'testlist': 325,
+ 'testlist_comp': 326,
+ 'testlist_star_expr': 327,
+ 'tfpdef': 328,
+ 'trailer': 329,
+ 'try_stmt': 330,
+ 'typedargslist': 331,
+ 'varargslist': 332,
+ 'vfpdef': 333,
+ 'while_stmt': 334,
+ 'with_item': 335,
+ 'with_stmt': 336,
+ 'xor_expr': 337,
+ 'yield_arg': 338,
+ 'yield_expr': 339,
+ 'yield_stmt': 340}
+
+symbol_names = {256: 'single_input',
+ 257: 'and_expr',
+ 258: 'and_test',
+ 259: 'arglist',
+ 260: 'argument',
+ 261: 'arith_expr',
+ 262: 'assert_stmt',
+ 263: 'async_funcdef',
+ 264: 'async_stmt',
+ 265: 'atom',
+ 266: 'atom_expr',
+ 267: 'augassign',
+ 268: 'break_stmt',
+ 269: 'classdef',
+ 270: 'comp_for',
+ 271: 'comp_if',
+ 272: 'comp_iter',
+ 273: 'comp_op',
+ 274: 'comparison',
+ 275: 'compound_stmt',
+ 276: 'continue_stmt',
+ 277: 'decorated',
+ 278: 'decorator',
+ 279: 'decorators',
+ 280: 'del_stmt',
+ 281: 'dictorsetmaker',
+ 282: 'dotted_as_name',
+ 283: 'dotted_as_names',
+ 284: 'dotted_name',
+ 285: 'encoding_decl',
+ 286: 'eval_input',
+ 287: 'except_clause',
+ 288: 'expr',
+ 289: 'expr_stmt',
+ 290: 'exprlist',
+ 291: 'factor',
+ 292: 'file_input',
+ 293: 'flow_stmt',
+ 294: 'for_stmt',
+ 295: 'funcdef',
+ 296: 'global_stmt',
+ 297: 'if_stmt',
+ 298: 'import_as_name',
+ 299: 'import_as_names',
+ 300: 'import_from',
+ 301: 'import_name',
+ 302: 'import_stmt',
+ 303: 'lambdef',
+ 304: 'lambdef_nocond',
+ 305: 'nonlocal_stmt',
+ 306: 'not_test',
+ 307: 'or_test',
+ 308: 'parameters',
+ 309: 'pass_stmt',
+ 310: 'power',
+ 311: 'raise_stmt',
+ 312: 'return_stmt',
+ 313: 'shift_expr',
+ 314: 'simple_stmt',
+ 315: 'sliceop',
+ 316: 'small_stmt',
+ 317: 'star_expr',
+ 318: 'stmt',
+ 319: 'subscript',
+ 320: 'subscriptlist',
+ 321: 'suite',
+ 322: 'term',
+ 323: 'test',
+ 324: 'test_nocond',
+ 325: 'testlist',
+ 326: 'testlist_comp',
+ 327: 'testlist_star_expr',
+ 328: 'tfpdef',
+ 329: 'trailer',
+ 330: 'try_stmt',
+ 331: 'typedargslist',
+ 332: 'varargslist',
+ 333: 'vfpdef',
+ 334: 'while_stmt',
+ 335: 'with_item',
+ 336: 'with_stmt',
+ 337: 'xor_expr',
+ 338: 'yield_arg',
+ 339: 'yield_expr',
+ 340: 'yield_stmt'}
+
+symbol_to_label = {'and_expr': 167,
+ 'and_test': 135,
+ 'arglist': 78,
+ 'argument': 46,
+ 'arith_expr': 139,
+ 'assert_stmt': 144,
+ 'async_funcdef': 102,
+ 'async_stmt': 95,
+ 'atom': 62,
+ 'atom_expr': 138,
+ 'augassign': 115,
+ 'break_stmt': 119,
+ 'classdef': 96,
+ 'comp_for': 51,
+ 'comp_if': 85,
+ 'comp_iter': 83,
+ 'comp_op': 94,
+ 'comparison': 134,
+ 'compound_stmt': 2,
+ 'continue_stmt': 120,
+ 'decorated': 97,
+ 'decorator': 104,
+ 'decorators': 101,
+ 'del_stmt': 145,
+ 'dictorsetmaker': 61,
+ 'dotted_as_name': 107,
+ 'dotted_as_names': 130,
+ 'dotted_name': 103,
+ 'except_clause': 163,
+ 'expr': 93,
+ 'expr_stmt': 146,
+ 'exprlist': 80,
+ 'factor': 117,
+ 'flow_stmt': 147,
+ 'for_stmt': 54,
+ 'funcdef': 53,
+ 'global_stmt': 148,
+ 'if_stmt': 98,
+ 'import_as_name': 128,
+ 'import_as_names': 129,
+ 'import_from': 131,
+ 'import_name': 132,
+ 'import_stmt': 149,
+ 'lambdef': 159,
+ 'lambdef_nocond': 160,
+ 'nonlocal_stmt': 150,
+ 'not_test': 44,
+ 'or_test': 82,
+ 'parameters': 125,
+ 'pass_stmt': 151,
+ 'power': 116,
+ 'raise_stmt': 121,
+ 'return_stmt': 122,
+ 'shift_expr': 42,
+ 'simple_stmt': 3,
+ 'sliceop': 152,
+ 'small_stmt': 142,
+ 'star_expr': 105,
+ 'stmt': 118,
+ 'subscript': 153,
+ 'subscriptlist': 161,
+ 'suite': 79,
+ 'term': 52,
+ 'test': 49,
+ 'test_nocond': 84,
+ 'testlist': 109,
+ 'testlist_comp': 57,
+ 'testlist_star_expr': 114,
+ 'tfpdef': 164,
+ 'trailer': 63,
+ 'try_stmt': 99,
+ 'typedargslist': 137,
+ 'varargslist': 133,
+ 'vfpdef': 165,
+ 'while_stmt': 100,
+ 'with_item': 166,
+ 'with_stmt': 55,
+ 'xor_expr': 112,
+ 'yield_arg': 169,
+ 'yield_expr': 58,
+ 'yield_stmt': 123}
+
+keyword_ids = {'False': 10,
+ 'None': 11,
+ 'True': 12,
+ 'and': 45,
+ 'as': 106,
+ 'assert': 14,
+ 'break': 15,
+ 'class': 16,
+ 'continue': 17,
+ 'def': 18,
+ 'del': 19,
+ 'elif': 127,
+ 'else': 124,
+ 'except': 111,
+ 'finally': 162,
+ 'for': 20,
+ 'from': 21,
+ 'global': 22,
+ 'if': 23,
+ 'import': 24,
+ 'in': 81,
+ 'is': 92,
+ 'lambda': 25,
+ 'nonlocal': 26,
+ 'not': 27,
+ 'or': 136,
+ 'pass': 28,
+ 'raise': 29,
+ 'return': 30,
+ 'try': 31,
+ 'while': 32,
+ 'with': 33,
+ 'yield': 34}
+
+dfas = [([([(1, 1), (2, 2), (3, 1)], False), ([], True), ([(1, 1)], False)],
+  {1: None,
+   4: None,
+   5: None,
+   6: None,
+   7: None,
+   8: None,
+   9: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   14: None,
+   15: None,
+   16: None,
+   17: None,
+   18: None,
+   19: None,
+   20: None,
+   21: None,
+   22: None,
+   23: None,
+   24: None,
+   25: None,
+   26: None,
+   27: None,
+   28: None,
+   29: None,
+   30: None,
+   31: None,
+   32: None,
+   33: None,
+   34: None,
+   35: None,
+   36: None,
+   37: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(42, 1)], False), ([(43, 0)], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(44, 1)], False), ([(45, 0)], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(46, 1)], False), ([(47, 2)], True), ([(46, 1)], True)],
+  {4: None,
+   5: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   25: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None,
+   48: None}),
+ ([([(5, 1), (48, 1), (49, 2)], False),
+   ([(49, 3)], False),
+   ([(50, 1), (51, 3)], True),
+   ([], True)],
+  {4: None,
+   5: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   25: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None,
+   48: None}),
+ ([([(52, 1)], False), ([(6, 0), (7, 0)], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(14, 1)], False),
+   ([(49, 2)], False),
+   ([(47, 3)], True),
+   ([(49, 4)], False),
+   ([], True)],
+  {14: None}),
+ ([([(37, 1)], False), ([(53, 2)], False), ([], True)], {37: None}),
+ ([([(37, 1)], False), ([(54, 2), (53, 2), (55, 2)], False), ([], True)],
+  {37: None}),
+ ([([(4, 1),
+     (8, 2),
+     (10, 2),
+     (11, 2),
+     (12, 2),
+     (13, 3),
+     (35, 4),
+     (39, 2),
+     (40, 2),
+     (41, 5)],
+    False),
+   ([(56, 2), (57, 6), (58, 6)], False),
+   ([], True),
+   ([(59, 2), (57, 7)], False),
+   ([(60, 2), (61, 8)], False),
+   ([(41, 5)], True),
+   ([(56, 2)], False),
+   ([(59, 2)], False),
+   ([(60, 2)], False)],
+  {4: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   35: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(38, 1), (62, 2)], False), ([(62, 2)], False), ([(63, 2)], True)],
+  {4: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   35: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(64, 1),
+     (65, 1),
+     (66, 1),
+     (67, 1),
+     (68, 1),
+     (69, 1),
+     (70, 1),
+     (71, 1),
+     (72, 1),
+     (73, 1),
+     (74, 1),
+     (75, 1),
+     (76, 1)],
+    False),
+   ([], True)],
+  {64: None,
+   65: None,
+   66: None,
+   67: None,
+   68: None,
+   69: None,
+   70: None,
+   71: None,
+   72: None,
+   73: None,
+   74: None,
+   75: None,
+   76: None}),
+ ([([(15, 1)], False), ([], True)], {15: None}),
+ ([([(16, 1)], False),
+   ([(39, 2)], False),
+   ([(4, 3), (77, 4)], False),
+   ([(56, 5), (78, 6)], False),
+   ([(79, 7)], False),
+   ([(77, 4)], False),
+   ([(56, 5)], False),
+   ([], True)],
+  {16: None}),
+ ([([(20, 1)], False),
+   ([(80, 2)], False),
+   ([(81, 3)], False),
+   ([(82, 4)], False),
+   ([(83, 5)], True),
+   ([], True)],
+  {20: None}),
+ ([([(23, 1)], False), ([(84, 2)], False), ([(83, 3)], True), ([], True)],
+  {23: None}),
+ ([([(51, 1), (85, 1)], False), ([], True)], {20: None, 23: None}),
+ ([([(86, 1),
+     (87, 1),
+     (88, 1),
+     (86, 1),
+     (89, 1),
+     (90, 1),
+     (91, 1),
+     (81, 1),
+     (92, 2),
+     (27, 3)],
+    False),
+   ([], True),
+   ([(27, 1)], True),
+   ([(81, 1)], False)],
+  {27: None,
+   81: None,
+   86: None,
+   87: None,
+   88: None,
+   89: None,
+   90: None,
+   91: None,
+   92: None}),
+ ([([(93, 1)], False), ([(94, 0)], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(95, 1),
+     (96, 1),
+     (97, 1),
+     (54, 1),
+     (53, 1),
+     (98, 1),
+     (99, 1),
+     (100, 1),
+     (55, 1)],
+    False),
+   ([], True)],
+  {9: None,
+   16: None,
+   18: None,
+   20: None,
+   23: None,
+   31: None,
+   32: None,
+   33: None,
+   37: None}),
+ ([([(17, 1)], False), ([], True)], {17: None}),
+ ([([(101, 1)], False), ([(102, 2), (96, 2), (53, 2)], False), ([], True)],
+  {9: None}),
+ ([([(9, 1)], False),
+   ([(103, 2)], False),
+   ([(4, 3), (1, 4)], False),
+   ([(56, 5), (78, 6)], False),
+   ([], True),
+   ([(1, 4)], False),
+   ([(56, 5)], False)],
+  {9: None}),
+ ([([(104, 1)], False), ([(104, 1)], True)], {9: None}),
+ ([([(19, 1)], False), ([(80, 2)], False), ([], True)], {19: None}),
+ ([([(48, 1), (105, 2), (49, 3)], False),
+   ([(93, 4)], False),
+   ([(47, 5), (51, 6)], True),
+   ([(47, 5), (77, 7), (51, 6)], True),
+   ([(47, 8), (51, 6)], True),
+   ([(105, 9), (49, 9)], True),
+   ([], True),
+   ([(49, 4)], False),
+   ([(48, 10), (49, 11)], True),
+   ([(47, 5)], True),
+   ([(93, 12)], False),
+   ([(77, 13)], False),
+   ([(47, 8)], True),
+   ([(49, 12)], False)],
+  {4: None,
+   5: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   25: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None,
+   48: None}),
+ ([([(103, 1)], False), ([(106, 2)], True), ([(39, 3)], False), ([], True)],
+  {39: None}),
+ ([([(107, 1)], False), ([(47, 0)], True)], {39: None}),
+ ([([(39, 1)], False), ([(108, 0)], True)], {39: None}),
+ ([([(39, 1)], False), ([], True)], {39: None}),
+ ([([(109, 1)], False), ([(110, 2), (1, 1)], False), ([], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   25: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(111, 1)], False),
+   ([(49, 2)], True),
+   ([(106, 3)], True),
+   ([(39, 4)], False),
+   ([], True)],
+  {111: None}),
+ ([([(112, 1)], False), ([(113, 0)], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(114, 1)], False),
+   ([(50, 2), (115, 3)], True),
+   ([(114, 4), (58, 4)], False),
+   ([(109, 5), (58, 5)], False),
+   ([(50, 2)], True),
+   ([], True)],
+  {4: None,
+   5: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   25: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(93, 1), (105, 1)], False),
+   ([(47, 2)], True),
+   ([(93, 1), (105, 1)], True)],
+  {4: None,
+   5: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(6, 1), (7, 1), (36, 1), (116, 2)], False),
+   ([(117, 2)], False),
+   ([], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(110, 1), (1, 0), (118, 0)], False), ([], True)],
+  {1: None,
+   4: None,
+   5: None,
+   6: None,
+   7: None,
+   8: None,
+   9: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   14: None,
+   15: None,
+   16: None,
+   17: None,
+   18: None,
+   19: None,
+   20: None,
+   21: None,
+   22: None,
+   23: None,
+   24: None,
+   25: None,
+   26: None,
+   27: None,
+   28: None,
+   29: None,
+   30: None,
+   31: None,
+   32: None,
+   33: None,
+   34: None,
+   35: None,
+   36: None,
+   37: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None,
+   110: None}),
+ ([([(119, 1), (120, 1), (121, 1), (122, 1), (123, 1)], False), ([], True)],
+  {15: None, 17: None, 29: None, 30: None, 34: None}),
+ ([([(20, 1)], False),
+   ([(80, 2)], False),
+   ([(81, 3)], False),
+   ([(109, 4)], False),
+   ([(77, 5)], False),
+   ([(79, 6)], False),
+   ([(124, 7)], True),
+   ([(77, 8)], False),
+   ([(79, 9)], False),
+   ([], True)],
+  {20: None}),
+ ([([(18, 1)], False),
+   ([(39, 2)], False),
+   ([(125, 3)], False),
+   ([(126, 4), (77, 5)], False),
+   ([(49, 6)], False),
+   ([(79, 7)], False),
+   ([(77, 5)], False),
+   ([], True)],
+  {18: None}),
+ ([([(22, 1)], False), ([(39, 2)], False), ([(47, 1)], True)], {22: None}),
+ ([([(23, 1)], False),
+   ([(49, 2)], False),
+   ([(77, 3)], False),
+   ([(79, 4)], False),
+   ([(127, 1), (124, 5)], True),
+   ([(77, 6)], False),
+   ([(79, 7)], False),
+   ([], True)],
+  {23: None}),
+ ([([(39, 1)], False), ([(106, 2)], True), ([(39, 3)], False), ([], True)],
+  {39: None}),
+ ([([(128, 1)], False), ([(47, 2)], True), ([(128, 1)], True)], {39: None}),
+ ([([(21, 1)], False),
+   ([(108, 2), (8, 2), (103, 3)], False),
+   ([(108, 2), (8, 2), (24, 4), (103, 3)], False),
+   ([(24, 4)], False),
+   ([(4, 5), (5, 6), (129, 6)], False),
+   ([(129, 7)], False),
+   ([], True),
+   ([(56, 6)], False)],
+  {21: None}),
+ ([([(24, 1)], False), ([(130, 2)], False), ([], True)], {24: None}),
+ ([([(131, 1), (132, 1)], False), ([], True)], {21: None, 24: None}),
+ ([([(25, 1)], False),
+   ([(77, 2), (133, 3)], False),
+   ([(49, 4)], False),
+   ([(77, 2)], False),
+   ([], True)],
+  {25: None}),
+ ([([(25, 1)], False),
+   ([(77, 2), (133, 3)], False),
+   ([(84, 4)], False),
+   ([(77, 2)], False),
+   ([], True)],
+  {25: None}),
+ ([([(26, 1)], False), ([(39, 2)], False), ([(47, 1)], True)], {26: None}),
+ ([([(27, 1), (134, 2)], False), ([(44, 2)], False), ([], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(135, 1)], False), ([(136, 0)], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(4, 1)], False),
+   ([(56, 2), (137, 3)], False),
+   ([], True),
+   ([(56, 2)], False)],
+  {4: None}),
+ ([([(28, 1)], False), ([], True)], {28: None}),
+ ([([(138, 1)], False), ([(48, 2)], True), ([(117, 3)], False), ([], True)],
+  {4: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   35: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(29, 1)], False),
+   ([(49, 2)], True),
+   ([(21, 3)], True),
+   ([(49, 4)], False),
+   ([], True)],
+  {29: None}),
+ ([([(30, 1)], False), ([(109, 2)], True), ([], True)], {30: None}),
+ ([([(139, 1)], False), ([(140, 0), (141, 0)], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(142, 1)], False),
+   ([(143, 2), (1, 3)], False),
+   ([(1, 3), (142, 1)], False),
+   ([], True)],
+  {4: None,
+   5: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   14: None,
+   15: None,
+   17: None,
+   19: None,
+   21: None,
+   22: None,
+   24: None,
+   25: None,
+   26: None,
+   27: None,
+   28: None,
+   29: None,
+   30: None,
+   34: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(77, 1)], False), ([(49, 2)], True), ([], True)], {77: None}),
+ ([([(144, 1),
+     (145, 1),
+     (146, 1),
+     (147, 1),
+     (148, 1),
+     (149, 1),
+     (150, 1),
+     (151, 1)],
+    False),
+   ([], True)],
+  {4: None,
+   5: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   14: None,
+   15: None,
+   17: None,
+   19: None,
+   21: None,
+   22: None,
+   24: None,
+   25: None,
+   26: None,
+   27: None,
+   28: None,
+   29: None,
+   30: None,
+   34: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(5, 1)], False), ([(93, 2)], False), ([], True)], {5: None}),
+ ([([(2, 1), (3, 1)], False), ([], True)],
+  {4: None,
+   5: None,
+   6: None,
+   7: None,
+   8: None,
+   9: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   14: None,
+   15: None,
+   16: None,
+   17: None,
+   18: None,
+   19: None,
+   20: None,
+   21: None,
+   22: None,
+   23: None,
+   24: None,
+   25: None,
+   26: None,
+   27: None,
+   28: None,
+   29: None,
+   30: None,
+   31: None,
+   32: None,
+   33: None,
+   34: None,
+   35: None,
+   36: None,
+   37: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(77, 1), (49, 2)], False),
+   ([(152, 3), (49, 4)], True),
+   ([(77, 1)], True),
+   ([], True),
+   ([(152, 3)], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   25: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None,
+   77: None}),
+ ([([(153, 1)], False), ([(47, 2)], True), ([(153, 1)], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   25: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None,
+   77: None}),
+ ([([(1, 1), (3, 2)], False),
+   ([(154, 3)], False),
+   ([], True),
+   ([(118, 4)], False),
+   ([(155, 2), (118, 4)], False)],
+  {1: None,
+   4: None,
+   5: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   14: None,
+   15: None,
+   17: None,
+   19: None,
+   21: None,
+   22: None,
+   24: None,
+   25: None,
+   26: None,
+   27: None,
+   28: None,
+   29: None,
+   30: None,
+   34: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(117, 1)], False), ([(156, 0), (5, 0), (157, 0), (158, 0), (9, 0)], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(159, 1), (82, 2)], False),
+   ([], True),
+   ([(23, 3)], True),
+   ([(82, 4)], False),
+   ([(124, 5)], False),
+   ([(49, 1)], False)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   25: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(160, 1), (82, 1)], False), ([], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   25: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(49, 1)], False), ([(47, 2)], True), ([(49, 1)], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   25: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(105, 1), (49, 1)], False),
+   ([(47, 2), (51, 3)], True),
+   ([(105, 4), (49, 4)], True),
+   ([], True),
+   ([(47, 2)], True)],
+  {4: None,
+   5: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   25: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(105, 1), (49, 1)], False),
+   ([(47, 2)], True),
+   ([(105, 1), (49, 1)], True)],
+  {4: None,
+   5: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   25: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(39, 1)], False), ([(77, 2)], True), ([(49, 3)], False), ([], True)],
+  {39: None}),
+ ([([(4, 1), (108, 2), (13, 3)], False),
+   ([(56, 4), (78, 5)], False),
+   ([(39, 4)], False),
+   ([(161, 6)], False),
+   ([], True),
+   ([(56, 4)], False),
+   ([(59, 4)], False)],
+  {4: None, 13: None, 108: None}),
+ ([([(31, 1)], False),
+   ([(77, 2)], False),
+   ([(79, 3)], False),
+   ([(162, 4), (163, 5)], False),
+   ([(77, 6)], False),
+   ([(77, 7)], False),
+   ([(79, 8)], False),
+   ([(79, 9)], False),
+   ([], True),
+   ([(124, 10), (162, 4), (163, 5)], True),
+   ([(77, 11)], False),
+   ([(79, 12)], False),
+   ([(162, 4)], True)],
+  {31: None}),
+ ([([(5, 1), (48, 2), (164, 3)], False),
+   ([(47, 4), (164, 5)], True),
+   ([(164, 6)], False),
+   ([(47, 7), (50, 8)], True),
+   ([(48, 2), (164, 9)], False),
+   ([(47, 4)], True),
+   ([], True),
+   ([(5, 10), (48, 2), (164, 3)], True),
+   ([(49, 11)], False),
+   ([(47, 4), (50, 12)], True),
+   ([(47, 13), (164, 14)], True),
+   ([(47, 7)], True),
+   ([(49, 5)], False),
+   ([(48, 2), (164, 15)], False),
+   ([(47, 13)], True),
+   ([(47, 13), (50, 16)], True),
+   ([(49, 14)], False)],
+  {5: None, 39: None, 48: None}),
+ ([([(5, 1), (48, 2), (165, 3)], False),
+   ([(47, 4), (165, 5)], True),
+   ([(165, 6)], False),
+   ([(47, 7), (50, 8)], True),
+   ([(48, 2), (165, 9)], False),
+   ([(47, 4)], True),
+   ([], True),
+   ([(5, 10), (48, 2), (165, 3)], True),
+   ([(49, 11)], False),
+   ([(47, 4), (50, 12)], True),
+   ([(47, 13), (165, 14)], True),
+   ([(47, 7)], True),
+   ([(49, 5)], False),
+   ([(48, 2), (165, 15)], False),
+   ([(47, 13)], True),
+   ([(47, 13), (50, 16)], True),
+   ([(49, 14)], False)],
+  {5: None, 39: None, 48: None}),
+ ([([(39, 1)], False), ([], True)], {39: None}),
+ ([([(32, 1)], False),
+   ([(49, 2)], False),
+   ([(77, 3)], False),
+   ([(79, 4)], False),
+   ([(124, 5)], True),
+   ([(77, 6)], False),
+   ([(79, 7)], False),
+   ([], True)],
+  {32: None}),
+ ([([(49, 1)], False), ([(106, 2)], True), ([(93, 3)], False), ([], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   25: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(33, 1)], False),
+   ([(166, 2)], False),
+   ([(47, 1), (77, 3)], False),
+   ([(79, 4)], False),
+   ([], True)],
+  {33: None}),
+ ([([(167, 1)], False), ([(168, 0)], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(21, 1), (109, 2)], False), ([(49, 2)], False), ([], True)],
+  {4: None,
+   6: None,
+   7: None,
+   8: None,
+   10: None,
+   11: None,
+   12: None,
+   13: None,
+   21: None,
+   25: None,
+   27: None,
+   35: None,
+   36: None,
+   38: None,
+   39: None,
+   40: None,
+   41: None}),
+ ([([(34, 1)], False), ([(169, 2)], True), ([], True)], {34: None}),
+ ([([(58, 1)], False), ([], True)], {34: None})]
+
+labels = [0,
+ 4,
+ 275,
+ 314,
+ 7,
+ 16,
+ 14,
+ 15,
+ 53,
+ 50,
+ 1,
+ 1,
+ 1,
+ 9,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 1,
+ 26,
+ 32,
+ 55,
+ 56,
+ 1,
+ 2,
+ 3,
+ 313,
+ 19,
+ 306,
+ 1,
+ 260,
+ 12,
+ 36,
+ 323,
+ 22,
+ 270,
+ 322,
+ 295,
+ 294,
+ 336,
+ 8,
+ 326,
+ 339,
+ 10,
+ 27,
+ 281,
+ 265,
+ 329,
+ 41,
+ 42,
+ 47,
+ 39,
+ 37,
+ 38,
+ 49,
+ 40,
+ 45,
+ 46,
+ 51,
+ 44,
+ 43,
+ 11,
+ 259,
+ 321,
+ 290,
+ 1,
+ 307,
+ 272,
+ 324,
+ 271,
+ 29,
+ 20,
+ 30,
+ 28,
+ 21,
+ 31,
+ 1,
+ 288,
+ 273,
+ 264,
+ 269,
+ 277,
+ 297,
+ 330,
+ 334,
+ 279,
+ 263,
+ 284,
+ 278,
+ 317,
+ 1,
+ 282,
+ 23,
+ 325,
+ 0,
+ 1,
+ 337,
+ 18,
+ 327,
+ 267,
+ 310,
+ 291,
+ 318,
+ 268,
+ 276,
+ 311,
+ 312,
+ 340,
+ 1,
+ 308,
+ 52,
+ 1,
+ 298,
+ 299,
+ 283,
+ 300,
+ 301,
+ 332,
+ 274,
+ 258,
+ 1,
+ 331,
+ 266,
+ 261,
+ 34,
+ 35,
+ 316,
+ 13,
+ 262,
+ 280,
+ 289,
+ 293,
+ 296,
+ 302,
+ 305,
+ 309,
+ 315,
+ 319,
+ 5,
+ 6,
+ 24,
+ 17,
+ 48,
+ 303,
+ 304,
+ 320,
+ 1,
+ 287,
+ 328,
+ 333,
+ 335,
+ 257,
+ 33,
+ 338]
+
+token_ids = {0: 110,
+ 1: 39,
+ 2: 40,
+ 3: 41,
+ 4: 1,
+ 5: 154,
+ 6: 155,
+ 7: 4,
+ 8: 56,
+ 9: 13,
+ 10: 59,
+ 11: 77,
+ 12: 47,
+ 13: 143,
+ 14: 6,
+ 15: 7,
+ 16: 5,
+ 17: 157,
+ 18: 113,
+ 19: 43,
+ 20: 87,
+ 21: 90,
+ 22: 50,
+ 23: 108,
+ 24: 156,
+ 26: 35,
+ 27: 60,
+ 28: 89,
+ 29: 86,
+ 30: 88,
+ 31: 91,
+ 32: 36,
+ 33: 168,
+ 34: 140,
+ 35: 141,
+ 36: 48,
+ 37: 68,
+ 38: 69,
+ 39: 67,
+ 40: 71,
+ 41: 64,
+ 42: 65,
+ 43: 76,
+ 44: 75,
+ 45: 72,
+ 46: 73,
+ 47: 66,
+ 48: 158,
+ 49: 70,
+ 50: 9,
+ 51: 74,
+ 52: 126,
+ 53: 8,
+ 55: 37,
+ 56: 38}
+
+start = 256
+
@@ -89,7 +89,9 @@ def nfa_to_dfa(start, end):
             for label, sub_nfa in nfa.arcs:
                 if label is not None:
                     sub_nfa.find_unlabeled_states(arcs.setdefault(label, set()))
-        for label, nfa_set in arcs.items():
+        # sorted so the resulting tables do not depend on the hash seed;
+        # see gengrammar.py
+        for label, nfa_set in sorted(arcs.items()):
             for st in state_stack:
                 if st.nfas == nfa_set:
                     break
@@ -199,7 +201,7 @@ class ParserGenerator(object):
     def make_first(self, gram, name):
         original_firsts = self.first[name]
         firsts = dict()
-        for label in original_firsts:
+        for label in sorted(original_firsts):
             firsts[self.make_label(gram, label)] = None
         return firsts
 
@@ -43,15 +43,9 @@ class Grammar(object):
 
 
 class Node(object):
+    """A node of the concrete syntax tree; see Terminal and Nonterminal."""
 
-    __slots__ = "type value children lineno col_offset".split()
-
-    def __init__(self, type, value, children, lineno, column):
-        self.type = type
-        self.value = value
-        self.children = children
-        self.lineno = lineno
-        self.col_offset = column
+    __slots__ = ("type", "lineno", "col_offset")
 
     def __eq__(self, other):
         # For tests.
@@ -66,6 +60,45 @@ class Node(object):
             return "Node(type=%s, value=%r)" % (self.type, self.value)
 
 
+class Terminal(Node):
+    """A token. There's one per token, so it has to be small."""
+
+    __slots__ = ("value",)
+    children = None
+
+    def __init__(self, type, value, lineno, column):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.col_offset = column
+
+
+class Nonterminal(Node):
+    """The children are a list while they're being parsed and a tuple once
+    the node is complete, which takes less memory."""
+
+    __slots__ = ("children",)
+    value = None
+
+    def __init__(self, type, children, lineno, column):
+        self.type = type
+        self.children = children
+        self.lineno = lineno
+        self.col_offset = column
+
+
+class StackEntry(object):
+    """An entry of the parser's stack. It's modified in place for each
+    token."""
+
+    __slots__ = ("dfa", "state", "node")
+
+    def __init__(self, dfa, state, node):
+        self.dfa = dfa
+        self.state = state
+        self.node = node
+
+
 class ParseError(Exception):
 
     def __init__(self, msg, token_type, value, lineno, column, line,
@@ -97,19 +130,21 @@ class Parser(object):
         if start == -1:
             start = self.grammar.start
         self.root = None
-        current_node = Node(start, None, [], 0, 0)
+        current_node = Nonterminal(start, [], 0, 0)
         self.stack = []
-        self.stack.append((self.grammar.dfas[start - 256], 0, current_node))
+        self.stack.append(StackEntry(self.grammar.dfas[start - 256], 0,
+                                     current_node))
 
     def add_token(self, token_type, value, lineno, column, line):
         label_index = self.classify(token_type, value, lineno, column, line)
         sym_id = 0 # for the annotator
+        labels = self.grammar.labels
         while True:
-            dfa, state_index, node = self.stack[-1]
-            states, first = dfa
-            arcs, is_accepting = states[state_index]
+            entry = self.stack[-1]
+            states = entry.dfa[0]
+            arcs, is_accepting = states[entry.state]
             for i, next_state in arcs:
-                sym_id = self.grammar.labels[i]
+                sym_id = labels[i]
                 if label_index == i:
                     # We matched a non-terminal.
                     self.shift(next_state, token_type, value, lineno, column)
@@ -121,8 +156,8 @@ class Parser(object):
                         if not self.stack:
                             # Parsing is done.
                             return True
-                        dfa, state_index, node = self.stack[-1]
-                        state = dfa[0][state_index]
+                        entry = self.stack[-1]
+                        state = entry.dfa[0][entry.state]
                     return False
                 elif sym_id >= 256:
                     sub_node_dfa = self.grammar.dfas[sym_id - 256]
@@ -163,22 +198,22 @@ class Parser(object):
 
     def shift(self, next_state, token_type, value, lineno, column):
         """Shift a non-terminal and prepare for the next state."""
-        dfa, state, node = self.stack[-1]
-        new_node = Node(token_type, value, None, lineno, column)
-        node.children.append(new_node)
-        self.stack[-1] = (dfa, next_state, node)
+        entry = self.stack[-1]
+        entry.node.children.append(Terminal(token_type, value, lineno, column))
+        entry.state = next_state
 
     def push(self, next_dfa, next_state, node_type, lineno, column):
         """Push a terminal and adjust the current state."""
-        dfa, state, node = self.stack[-1]
-        new_node = Node(node_type, None, [], lineno, column)
-        self.stack[-1] = (dfa, next_state, node)
-        self.stack.append((next_dfa, 0, new_node))
+        self.stack[-1].state = next_state
+        new_node = Nonterminal(node_type, [], lineno, column)
+        self.stack.append(StackEntry(next_dfa, 0, new_node))
 
     def pop(self):
         """Pop an entry off the stack and make its node a child of the last."""
-        dfa, state, node = self.stack.pop()
+        node = self.stack.pop().node
+        # it's complete now
+        node.children = tuple(node.children)
         if self.stack:
-            self.stack[-1][2].children.append(node)
+            self.stack[-1].node.children.append(node)
         else:
             self.root = node
@@ -1,3 +1,4 @@
+import hashlib
 import os
 from ayrton.parser.pyparser import parser, pytoken, metaparser
 
@@ -7,9 +8,25 @@ class PythonGrammar(parser.Grammar):
     TOKENS = pytoken.python_tokens
     OPERATOR_MAP = pytoken.python_opmap
 
-def _get_python_grammar():
+GRAMMAR_FILE = "Grammar3.6"
+# the tables precomputed by gengrammar.py
+GRAMMAR_ATTRIBUTES = ("symbol_ids", "symbol_names", "symbol_to_label",
+                      "keyword_ids", "dfas", "labels", "token_ids", "start")
+
+def grammar_digest(grammar_file=GRAMMAR_FILE):
+    """Identifies the grammar file and the token numbers the tables are built
+    from, so stale generated tables are not used."""
+    here = os.path.dirname(__file__)
+    with open(os.path.join(here, "data", grammar_file), "rb") as fp:
+        digest = hashlib.sha1(fp.read())
+    digest.update(repr(sorted(pytoken.python_tokens.items())).encode())
+    return digest.hexdigest()
+
+def build_python_grammar(grammar_file=GRAMMAR_FILE):
+    """Builds the parser tables from the grammar file. This is slow, so it's
+    only done by gengrammar.py and the tests."""
     here = os.path.dirname(__file__)
-    fp = open(os.path.join(here, "data", "Grammar3.6"))
+    fp = open(os.path.join(here, "data", grammar_file))
     try:
         gram_source = fp.read()
     finally:
@@ -17,8 +34,25 @@ def _get_python_grammar():
     pgen = metaparser.ParserGenerator(gram_source)
     return pgen.build_grammar(PythonGrammar)
 
+def load_python_grammar():
+    """Loads the parser tables generated by gengrammar.py."""
+    try:
+        from ayrton.parser.pyparser import grammar_generated
+        digest = grammar_generated.grammar_digest
+        tables = [getattr(grammar_generated, name) for name in GRAMMAR_ATTRIBUTES]
+    except (ImportError, AttributeError):
+        # bootstrapping gengrammar.py itself, or a broken file
+        return build_python_grammar()
+    if digest != grammar_digest():
+        # generated from another grammar or other tokens
+        return build_python_grammar()
+    gram = PythonGrammar()
+    for name, table in zip(GRAMMAR_ATTRIBUTES, tables):
+        setattr(gram, name, table)
+    return gram
+
 
-python_grammar = _get_python_grammar()
+python_grammar = load_python_grammar()
 
 class _Tokens(object):
     pass
@@ -35,4 +69,4 @@ for sym_name, idx in python_grammar.symbol_ids.items():
 syms = _Symbols()
 syms._rev_lookup = rev_lookup # for debugging
 
-del _get_python_grammar, _Tokens, tok_name, sym_name, idx
+del _Tokens, tok_name, sym_name, idx
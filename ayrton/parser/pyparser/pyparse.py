@@ -1,3 +1,7 @@
+import gc
+import io
+import itertools
+
 from ayrton.parser.error import OperationError
 from ayrton.parser.pyparser import future, parser, pytokenizer, pygram, error
 from ayrton.parser.astcompiler import consts
@@ -94,6 +98,28 @@ class CompileInfo(object):
         self.hidden_applevel = hidden_applevel
 
 
+def _with_final_newline(lines):
+    """The tokenizer is very picky about how it wants its input: the last
+    line must end with a newline too."""
+    for line in lines:
+        if not line.endswith("\n"):
+            # it can only be the last one
+            line += "\n"
+        yield line
+
+
+def _decode_lines(lines, enc, filename):
+    for lineno, line in enumerate(lines, 1):
+        try:
+            yield line.decode(enc)
+        except UnicodeDecodeError as e:
+            raise error.SyntaxError("(unicode error) %s" % e, lineno,
+                                    filename=filename)
+        except LookupError:
+            raise error.SyntaxError("Unknown encoding: %s" % enc,
+                                    filename=filename)
+
+
 _targets = {
 'eval' : pygram.syms.eval_input,
 'single' : pygram.syms.single_input,
@@ -108,6 +134,24 @@ class PythonParser(parser.Parser):
         self.space = space
         self.future_flags = future_flags
 
+    def detect_encoding(self, bytessrc, compile_info):
+        """Returns the source without the UTF-8 BOM, if any, and its
+        encoding. Only its first two lines are needed."""
+        if bytessrc.startswith(b"\xEF\xBB\xBF"):
+            bytessrc = bytessrc[3:]
+            enc = 'utf-8'
+            # If an encoding is explicitly given check that it is utf-8.
+            decl_enc = _check_for_encoding(bytessrc)
+            if decl_enc and decl_enc != "utf-8":
+                raise error.SyntaxError("UTF-8 BOM with %s coding cookie" % decl_enc,
+                                        filename=compile_info.filename)
+        else:
+            enc = _normalize_encoding(_check_for_encoding(bytessrc))
+            if enc is None:
+                enc = 'utf-8'
+
+        return bytessrc, enc
+
     def parse_source(self, bytessrc, compile_info):
         """Main entry point for parsing Python source.
 
@@ -121,19 +165,8 @@ class PythonParser(parser.Parser):
 
         if compile_info.flags & consts.PyCF_IGNORE_COOKIE:
             textsrc = bytessrc
-        elif bytessrc.startswith(b"\xEF\xBB\xBF"):
-            bytessrc = bytessrc[3:]
-            enc = 'utf-8'
-            # If an encoding is explicitly given check that it is utf-8.
-            decl_enc = _check_for_encoding(bytessrc)
-            if decl_enc and decl_enc != "utf-8":
-                raise error.SyntaxError("UTF-8 BOM with %s coding cookie" % decl_enc,
-                                        filename=compile_info.filename)
-            textsrc = bytessrc.decode('utf-8')
         else:
-            enc = _normalize_encoding(_check_for_encoding(bytessrc))
-            if enc is None:
-                enc = 'utf-8'
+            bytessrc, enc = self.detect_encoding(bytessrc, compile_info)
             try:
                 # textsrc = recode_to_utf8(self.space, bytessrc, enc)
                 textsrc = bytessrc.decode(enc)
@@ -155,27 +188,57 @@ class PythonParser(parser.Parser):
         flags = compile_info.flags
 
         # The tokenizer is very picky about how it wants its input.
-        source_lines = textsrc.splitlines(True)
-        if source_lines and not source_lines[-1].endswith("\n"):
-            source_lines[-1] += '\n'
         if textsrc and textsrc[-1] == "\n":
             flags &= ~consts.PyCF_DONT_IMPLY_DEDENT
 
+        # the lines are split while they're tokenized
+        tree = self.parse_lines(io.StringIO(textsrc, newline=''), compile_info,
+                                flags)
+        if enc is not None:
+            compile_info.encoding = enc
+        return tree
+
+    def parse_file(self, f, compile_info):
+        """Like parse_source(), but reading the source from the file object
+        f, opened in binary mode, while it's parsed."""
+        head = f.readline()
+        head += f.readline()
+        head, enc = self.detect_encoding(head, compile_info)
+
+        lines = _decode_lines(itertools.chain(io.BytesIO(head), f), enc,
+                              compile_info.filename)
+        tree = self.parse_lines(lines, compile_info, compile_info.flags)
+        compile_info.encoding = enc
+        return tree
+
+    def tokenize(self, lines, flags):
+        """Returns the tokens of lines as they're read. It can be replaced to
+        wrap them."""
+        return pytokenizer.generate_tokens(lines, flags)
+
+    def parse_lines(self, lines, compile_info, flags):
+        """Parses the source from an iterable of lines, like a file."""
         self.prepare(_targets[compile_info.mode])
         tp = 0
+        # the tree has no cycles, but it's made of lots of small objects and
+        # the collector would go over it again and again while it grows
+        gc_enabled = gc.isenabled()
+        gc.disable()
         try:
             try:
                 # Note: we no longer pass the CO_FUTURE_* to the tokenizer,
                 # which is expected to work independently of them.  It's
                 # certainly the case for all futures in Python <= 2.7.
-                tokens = pytokenizer.generate_tokens(source_lines, flags)
+                tokens = self.tokenize(_with_final_newline(lines), flags)
 
+                it = future.TokenIterator(tokens)
                 newflags, last_future_import = (
-                    future.add_future_flags(self.future_flags, tokens))
+                    future.add_future_flags(self.future_flags, it))
                 compile_info.last_future_import = last_future_import
                 compile_info.flags |= newflags
                 self.grammar = pygram.python_grammar
-                tokens_stream = iter(tokens)
+                # the ones add_future_flags() already took, then the rest
+                tokens_stream = itertools.chain(it.seen, tokens)
 
                 for tp, value, lineno, column, line in tokens_stream:
                     if self.add_token(tp, value, lineno, column, line):
@@ -223,6 +286,6 @@ class PythonParser(parser.Parser):
         finally:
             # Avoid hanging onto the tree.
             self.root = None
-        if enc is not None:
-            compile_info.encoding = enc
+            if gc_enabled:
+                gc.enable()
         return tree
@@ -1,3 +1,5 @@
+import itertools
+
 from ayrton.parser.pyparser import automata
 from ayrton.parser.pyparser.pygram import tokens
 from ayrton.parser.pyparser.pytoken import python_opmap
@@ -69,6 +71,10 @@ def generate_tokens(lines, flags):
     """
     This is a rewrite of pypy.module.parser.pytokenize.generate_tokens since
     the original function is not RPYTHON (uses yield)
+    In ayrton it's a generator again: lines can be any iterable, like a file,
+    and the tokens of each line are produced once the next one is read, so
+    the whole source and its tokens don't have to be in memory. The tokens given
+    to the exceptions are only those of the current line.
     It was also slightly modified to generate Token instances instead
     of the original 5-tuples -- it's now a 4-tuple of
 
@@ -91,7 +97,9 @@ def generate_tokens(lines, flags):
         and the line on which the token was found. The line passed is the
         logical line; continuation lines are included.
     """
+    # the tokens of the current line
     token_list = []
+    last_token = None
     lnum = parenlev = continued = 0
     namechars = NAMECHARS
     numchars = NUMCHARS
@@ -107,9 +115,13 @@ def generate_tokens(lines, flags):
     # make the annotator happy
     line = ''
     pos = 0
-    lines.append("")
     strstart = (0, 0, "")
-    for line in lines:
+    for line in itertools.chain(lines, [""]):
+        if token_list:
+            last_token = token_list[-1]
+            yield from token_list
+            del token_list[:]
+
         lnum = lnum + 1
         pos, max = 0, len(line)
 
@@ -289,15 +301,18 @@ def generate_tokens(lines, flags):
                 last_comment = ''
                 pos = pos + 1
 
+    if token_list:
+        last_token = token_list[-1]
+        yield from token_list
+
     lnum -= 1
     if not (flags & consts.PyCF_DONT_IMPLY_DEDENT):
-        if token_list and token_list[-1][0] != tokens.NEWLINE:
+        if last_token is not None and last_token[0] != tokens.NEWLINE:
             tok = (tokens.NEWLINE, '', lnum, 0, '\n')
-            token_list.append(tok)
+            yield tok
         for indent in indents[1:]:                # pop remaining indent levels
-            token_list.append((tokens.DEDENT, '', lnum, pos, line))
+            yield (tokens.DEDENT, '', lnum, pos, line)
     tok = (tokens.NEWLINE, '', lnum, 0, '\n')
-    token_list.append(tok)
+    yield tok
 
-    token_list.append((tokens.ENDMARKER, '', lnum, pos, line))
-    return token_list
+    yield (tokens.ENDMARKER, '', lnum, pos, line)
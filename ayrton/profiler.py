@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+# bin/ayrton --profile: where the time goes while running a script. it
+# measures the phases the script goes through (reading, tokenizing, parsing,
+# building the AST, transforming it, compiling and executing it) and the
+# Commands it runs. the Commands are aggregated by executable.
+#
+# the Ayrton instance has a Profiler only while profiling, so the hooks in the
+# rest of the code cost just a check for None otherwise.
+
+from collections import OrderedDict
+import sys
+import time
+
+import logging
+logger= logging.getLogger ('ayrton.profiler')
+
+
+class CommandStats:
+    def __init__ (self):
+        self.count= 0
+        # from launch to being reaped
+        self.elapsed= 0.0
+        # user+system, from os.wait4()
+        self.cpu= 0.0
+        # the biggest one, in KiB
+        self.max_rss= 0
+        self.minor_faults= 0
+        self.major_faults= 0
+        # fork() or posix_spawn()
+        self.launch= 0.0
+
+
+    def as_dict (self):
+        return OrderedDict ([ ('count', self.count), ('elapsed', self.elapsed),
+                              ('cpu', self.cpu), ('max_rss', self.max_rss),
+                              ('minor_faults', self.minor_faults),
+                              ('major_faults', self.major_faults),
+                              ('launch', self.launch) ])
+
+
+class Phase:
+    def __init__ (self, profiler, name):
+        self.profiler= profiler
+        self.name= name
+
+
+    def __enter__ (self):
+        self.start= time.perf_counter ()
+        # time spent in phases inside this one
+        self.nested= 0.0
+        self.profiler.stack.append (self)
+
+
+    def __exit__ (self, *args):
+        elapsed= time.perf_counter ()-self.start
+        self.profiler.stack.pop ()
+        self.profiler.add (self.name, elapsed-self.nested)
+
+        if len (self.profiler.stack)>0:
+            self.profiler.stack[-1].nested+= elapsed
+
+
+class NoPhase:
+    """Used when not profiling."""
+    def __enter__ (self):
+        pass
+
+
+    def __exit__ (self, *args):
+        pass
+
+no_phase= NoPhase ()
+
+
+class Profiler:
+    def __init__ (self, output=True):
+        """output is True for a report in stderr, or the name of the file
+        where to save the stats; see dump()."""
+        self.output= output
+        # name: seconds, not counting the phases inside it
+        self.phases= OrderedDict ()
+        self.stack= []
+        # path: CommandStats
+        self.commands= OrderedDict ()
+        # pid: (path, launch time)
+        self.running= {}
+        self.profile= None
+
+
+    def start (self):
+        if self.output is not True and not self.output.endswith ('.json'):
+            # cProfile is loaded only if needed
+            import cProfile
+
+            self.profile= cProfile.Profile ()
+            self.profile.enable ()
+
+        self.started= time.perf_counter ()
+
+
+    def stop (self):
+        self.total= time.perf_counter ()-self.started
+
+        if self.profile is not None:
+            self.profile.disable ()
+
+
+    def phase (self, name):
+        """Returns a context manager that measures a phase. Phases can be
+        nested, and reentered; they're accumulated."""
+        return Phase (self, name)
+
+
+    def add (self, name, seconds):
+        self.phases[name]= self.phases.get (name, 0.0)+seconds
+
+
+    def timed (self, name, iterator):
+        """Wraps iterator so the time spent producing each item counts as the
+        phase name."""
+        iterator= iter (iterator)
+        phase= self.phase (name)
+
+        while True:
+            with phase:
+                try:
+                    item= next (iterator)
+                except StopIteration:
+                    return
+
+            yield item
+
+
+    def command_launched (self, command, start, launched):
+        """start is when the Command started launching, launched when the
+        child was forked or spawned."""
+        stats= self.commands.setdefault (command.path, CommandStats ())
+        stats.count+= 1
+        stats.launch+= launched-start
+
+        self.running[command.child_pid]= (command.path, start)
+
+
+    def command_reaped (self, pid, rusage):
+        """rusage is the child's, as returned by os.wait4()."""
+        now= time.perf_counter ()
+
+        try:
+            path, start= self.running.pop (pid)
+        except KeyError:
+            # not a Command, or launched before profiling
+            return
+
+        stats= self.commands[path]
+        stats.elapsed+= now-start
+        stats.cpu+= rusage.ru_utime+rusage.ru_stime
+        stats.max_rss= max (stats.max_rss, rusage.ru_maxrss)
+        stats.minor_faults+= rusage.ru_minflt
+        stats.major_faults+= rusage.ru_majflt
+
+
+    def as_dict (self):
+        return OrderedDict ([
+            ('total', self.total),
+            ('phases', self.phases),
+            ('commands', OrderedDict ([ (path, stats.as_dict ())
+                                        for path, stats in self.commands.items () ])),
+            ])
+
+
+    def report (self, f=None):
+        if f is None:
+            f= sys.stderr
+
+        print ('%-40s %10s' % ('phase', 'seconds'), file=f)
+        for name, seconds in self.phases.items ():
+            print ('%-40s %10.6f' % (name, seconds), file=f)
+        print ('%-40s %10.6f' % ('total', self.total), file=f)
+
+        if len (self.commands)>0:
+            print (file=f)
+            print ('%-40s %6s %10s %10s %10s %10s' %
+                   ('command', 'count', 'elapsed', 'cpu', 'max rss', 'launch'), file=f)
+            for path, stats in sorted (self.commands.items (),
+                                       key=lambda item: item[1].elapsed, reverse=True):
+                print ('%-40s %6d %10.6f %10.6f %10d %10.6f' %
+                       (path, stats.count, stats.elapsed, stats.cpu, stats.max_rss,
+                        stats.launch), file=f)
+
+
+    def dump (self):
+        """Writes the stats: a report in stderr; a JSON file if the output's
+        name ends in .json; otherwise, the report and cProfile's stats, which
+        can be read with pstats."""
+        if self.output is True:
+            self.report ()
+        elif self.output.endswith ('.json'):
+            import json
+
+            with open (self.output, 'w') as f:
+                json.dump (self.as_dict (), f, indent=4)
+        else:
+            self.report ()
+            self.profile.dump_stats (self.output)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+# the protocol spoken in remote()'s backchannel. each message is preceded by
+# a header with the compression method and its length. the first message
+# each side sends is the list of compression methods it supports, so each one
+# compresses with the best method the other one can decompress.
+# the remote's ayrton.worker uses it too, so it can't import paramiko either.
+
+import struct
+import zlib
+import socket
+try:
+    # optional, and much faster than zlib
+    import zstandard
+except ImportError:
+    zstandard= None
+
+import logging
+logger= logging.getLogger ('ayrton.protocol')
+
+# compression methods
+NONE= 0
+ZLIB= 1
+ZSTD= 2
+
+# compression method, length
+header= struct.Struct ('!BQ')
+chunk_size= 65536
+# smaller messages are not worth compressing
+min_compress_size= 4096
+
+
+def supported_methods ():
+    """In order of preference."""
+    if zstandard is not None:
+        return [ ZSTD, ZLIB ]
+    else:
+        return [ ZLIB ]
+
+
+def compress (method, data):
+    if method==ZSTD:
+        return zstandard.ZstdCompressor ().compress (data)
+    elif method==ZLIB:
+        # the backchannel is usually slower than this
+        return zlib.compress (data, 1)
+    else:
+        return data
+
+
+def decompress (method, data):
+    if method==ZSTD:
+        return zstandard.ZstdDecompressor ().decompress (data)
+    elif method==ZLIB:
+        return zlib.decompress (data)
+    elif method==NONE:
+        return data
+    else:
+        raise ValueError ('unknown compression method %d' % method)
+
+
+class Connection:
+    """Sends and receives whole messages over a socket or a paramiko Channel.
+    Both ends must call handshake() before anything else."""
+    def __init__ (self, sock, compression=True):
+        self.sock= sock
+        self.compression= compression
+        self.method= NONE
+        # paramiko's Channels don't have recv_into() and don't accept
+        # memoryviews
+        self.zero_copy= isinstance (sock, socket.socket)
+
+
+    def handshake (self):
+        if self.compression:
+            ours= supported_methods ()
+        else:
+            ours= []
+
+        self.send_frame (NONE, bytes (ours))
+        theirs= self.recv ()
+        if theirs is None:
+            raise ConnectionError ('connection closed during handshake')
+
+        for method in ours:
+            if method in theirs:
+                self.method= method
+                break
+
+        logger.debug ('compression method: %d', self.method)
+
+
+    def send (self, data):
+        method= NONE
+
+        if self.method!=NONE and len (data)>=min_compress_size:
+            compressed= compress (self.method, data)
+            if len (compressed)<len (data):
+                logger.debug ('compressed %d bytes to %d', len (data), len (compressed))
+                data= compressed
+                method= self.method
+
+        self.send_frame (method, data)
+
+
+    def send_frame (self, method, data):
+        self.sock.sendall (header.pack (method, len (data)))
+
+        view= memoryview (data)
+        for offset in range (0, len (view), chunk_size):
+            chunk= view[offset:offset+chunk_size]
+            if not self.zero_copy:
+                chunk= bytes (chunk)
+
+            self.sock.sendall (chunk)
+
+
+    def recv_exactly (self, size):
+        """Returns None if the connection was closed before reading anything."""
+        buffer= bytearray (size)
+        view= memoryview (buffer)
+        offset= 0
+
+        while offset<size:
+            length= min (size-offset, chunk_size)
+            if self.zero_copy:
+                read= self.sock.recv_into (view[offset:], length)
+            else:
+                data= self.sock.recv (length)
+                read= len (data)
+                view[offset:offset+read]= data
+
+            if read==0:
+                if offset==0:
+                    return None
+
+                raise ConnectionError ('connection closed in the middle of a message')
+
+            offset+= read
+
+        return buffer
+
+
+    def recv (self):
+        """Returns the next message, or None if the connection was closed."""
+        data= self.recv_exactly (header.size)
+        if data is None:
+            return None
+
+        method, size= header.unpack (data)
+        data= self.recv_exactly (size)
+        if data is None:
+            raise ConnectionError ('connection closed in the middle of a message')
+
+        return decompress (method, data)
@@ -23,11 +23,14 @@ import paramiko
 import pickle
 import types
 from socket import socket, SO_REUSEADDR, SOL_SOCKET
-from threading import Thread
+from threading import Thread, Lock, Event, Condition
+import queue
+import collections
 import sys
 import errno
 import ctypes
 import os
+import stat
 import traceback
 import io
 from termios import tcgetattr, tcsetattr, TCSADRAIN
@@ -35,9 +38,15 @@ from termios import IGNPAR, ISTRIP, INLCR, IGNCR, ICRNL, IXON, IXANY, IXOFF
 from termios import ISIG, ICANON, ECHO, ECHOE, ECHOK, ECHONL, IEXTEN, OPOST, VMIN, VTIME
 import shutil
 import itertools
+import time
+import atexit
 import paramiko.ssh_exception
 
-from ayrton.utils import copy_loop, close
+from selectors import DefaultSelector, EVENT_READ
+
+from ayrton.utils import copy_loop, close, write_all
+from ayrton.worker import end_of_block
+from ayrton.protocol import Connection
 
 import logging
 logger= logging.getLogger ('ayrton.remote')
@@ -138,7 +147,698 @@ class RemoteStub:
         self.interactive.join ()
 
 
-def clean_environment (d):
+def split_output (pending):
+    """Splits what a worker wrote so far in what can be written already and
+    what not, because it could be the beginning of end_of_block. Returns
+    (output, pending, finished)."""
+    index= pending.find (end_of_block)
+    if index>=0:
+        return pending[:index], b'', True
+
+    # keep what could be the beginning of the marker
+    keep= min (len (pending), len (end_of_block)-1)
+    while keep>0 and not pending.endswith (end_of_block[:keep]):
+        keep-= 1
+
+    return pending[:len (pending)-keep], pending[len (pending)-keep:], False
+
+
+class WorkerThread (InteractiveThread):
+    """Like InteractiveThread, but for a Worker's channel, which is not closed
+    when the block finishes. It finishes when the worker marks the end of the
+    block's output."""
+    def __init__ (self, channel):
+        super ().__init__ (( (os.dup (0), channel), (channel, os.dup (1)) ))
+
+
+    def run (self):
+        logger.debug ('%s thread run' % self)
+        stdin, channel= self.pairs[0]
+        stdout= self.pairs[1][1]
+
+        selector= DefaultSelector ()
+        selector.register (stdin, EVENT_READ)
+        selector.register (channel, EVENT_READ)
+        pending= b''
+        finished= False
+
+        while not finished:
+            for key, events in selector.select ():
+                if key.fileobj==stdin:
+                    data= os.read (stdin, 10240)
+                    if len (data)==0:
+                        # don't close the channel, the worker needs it
+                        selector.unregister (stdin)
+                    else:
+                        channel.sendall (data)
+                else:
+                    data= channel.recv (10240)
+                    if len (data)==0:
+                        logger.debug ('worker closed the channel')
+                        write_all (stdout, pending)
+                        finished= True
+                        break
+
+                    output, pending, finished= split_output (pending+data)
+                    write_all (stdout, output)
+                    if finished:
+                        break
+
+        selector.close ()
+        self.close ()
+        logger.debug ('%s thread shutdown', self)
+
+
+    def close (self):
+        stdin= self.pairs[0][0]
+        if os.isatty (stdin):
+            # reset term settings
+            tcsetattr (stdin, TCSADRAIN, self.orig_terminfo)
+
+        for f in (stdin, self.pairs[1][1]) + self.finished:
+            close (f)
+
+
+class IOMultiplexer (Thread):
+    """Copies the data of all the Sessions in only one thread, so many
+    remote()s can run at the same time without a thread for each of them.
+    There's only one; see io_multiplexer()."""
+    def __init__ (self):
+        super ().__init__ (daemon=True)
+        self.selector= DefaultSelector ()
+        # the Sessions are added from other threads
+        self.lock= Lock ()
+        self.new= []
+        self.wakeup= os.pipe ()
+        self.selector.register (self.wakeup[0], EVENT_READ)
+
+
+    def add (self, session):
+        with self.lock:
+            self.new.append (session)
+
+        os.write (self.wakeup[1], b'.')
+
+
+    def register (self):
+        os.read (self.wakeup[0], 1024)
+
+        with self.lock:
+            new, self.new= self.new, []
+
+        for session in new:
+            try:
+                for fileobj in session.fileobjs ():
+                    self.selector.register (fileobj, EVENT_READ, session)
+            except Exception as e:
+                # don't take the other Sessions down with it
+                logger.debug ('%s failed: %r', session, e)
+                logger.debug (traceback.format_exc ())
+                session.done= True
+                self.remove (session)
+
+
+    def remove (self, session):
+        for fileobj in session.fileobjs ():
+            try:
+                self.selector.unregister (fileobj)
+            except (KeyError, ValueError):
+                # already finished, or never registered
+                pass
+
+        session.finish ()
+
+
+    def run (self):
+        while True:
+            for key, events in self.selector.select ():
+                if key.fileobj==self.wakeup[0]:
+                    self.register ()
+                    continue
+
+                session= key.data
+                try:
+                    if session.ready (key.fileobj):
+                        self.selector.unregister (key.fileobj)
+                except Exception as e:
+                    logger.debug ('%s failed: %r', session, e)
+                    logger.debug (traceback.format_exc ())
+                    session.done= True
+
+                if session.done:
+                    self.remove (session)
+
+
+multiplexer= None
+multiplexer_lock= Lock ()
+
+def io_multiplexer ():
+    """The IOMultiplexer, started the first time it's needed."""
+    global multiplexer
+
+    with multiplexer_lock:
+        if multiplexer is None:
+            multiplexer= IOMultiplexer ()
+            multiplexer.start ()
+
+    return multiplexer
+
+
+class Session:
+    """The copying of data between a remote()'s channel and the local side,
+    done by the IOMultiplexer. Like the Threads that do the same, they're
+    start()'ed and join()'ed."""
+    buf_len= 65536
+
+    def __init__ (self):
+        self.done= False
+        self.finished= Event ()
+
+
+    def fileobjs (self):
+        raise NotImplementedError
+
+
+    def ready (self, fileobj):
+        """Called when fileobj has data to read. Returns True if it was closed.
+        When everything is finished, it must set done."""
+        raise NotImplementedError
+
+
+    def start (self):
+        io_multiplexer ().add (self)
+
+
+    def finish (self):
+        self.finished.set ()
+
+
+    def join (self):
+        self.finished.wait ()
+
+
+    def close (self):
+        self.join ()
+
+
+def channel_finished (channel):
+    return (     (channel.closed or channel.eof_received)
+             and not channel.recv_ready ()
+             and not channel.recv_stderr_ready () )
+
+
+def pollable (fd):
+    """Whether fd can be registered in a selector. epoll() does not accept
+    regular files or /dev/null, which is what stdin is when run from cron."""
+    mode= os.fstat (fd).st_mode
+
+    return stat.S_ISFIFO (mode) or stat.S_ISSOCK (mode) or os.isatty (fd)
+
+
+class StreamSession (Session):
+    """Copies the stdout and stderr of a channel without a pty to ours, and
+    our stdin to it, until the remote closes them."""
+    def __init__ (self, channel, stdin=None, stdout=1, stderr=2):
+        super ().__init__ ()
+        self.channel= channel
+        self.stdin= stdin
+        self.stdout= stdout
+        self.stderr= stderr
+
+
+    def start (self):
+        if self.stdin is not None and not pollable (self.stdin):
+            # reading from them never blocks, but sending to the channel
+            # might, so it's done in its own thread
+            stdin, self.stdin= self.stdin, None
+            Thread (target=self.copy_stdin, args=(stdin, ), daemon=True).start ()
+
+        super ().start ()
+
+
+    def copy_stdin (self, stdin):
+        try:
+            while True:
+                data= os.read (stdin, self.buf_len)
+                if len (data)==0:
+                    # so the remote gets the EOF too
+                    self.channel.shutdown_write ()
+                    break
+
+                self.channel.sendall (data)
+        except Exception as e:
+            logger.debug ('copying stdin failed: %r', e)
+        finally:
+            close (stdin)
+
+
+    def fileobjs (self):
+        if self.stdin is not None:
+            return [ self.channel, self.stdin ]
+        else:
+            return [ self.channel ]
+
+
+    def ready (self, fileobj):
+        if fileobj==self.stdin:
+            data= os.read (self.stdin, self.buf_len)
+            if len (data)==0:
+                # so the remote gets the EOF too
+                self.channel.shutdown_write ()
+                return True
+
+            self.channel.sendall (data)
+            return False
+
+        while self.channel.recv_ready ():
+            write_all (self.stdout, self.channel.recv (self.buf_len))
+
+        while self.channel.recv_stderr_ready ():
+            write_all (self.stderr, self.channel.recv_stderr (self.buf_len))
+
+        self.done= channel_finished (self.channel)
+        return self.done
+
+
+    def finish (self):
+        close (self.stdin)
+        super ().finish ()
+
+
+class BlockOutput:
+    """The stdout or stderr of a block run by a Worker, which ends with
+    end_of_block. If prefix is not None, it's written in front of each line."""
+    def __init__ (self, fd, prefix=None):
+        self.fd= fd
+        self.prefix= prefix
+        self.pending= b''
+        # the last line, while it's not complete
+        self.line= b''
+        self.finished= False
+
+
+    def feed (self, data):
+        """An empty data means the channel was closed."""
+        if len (data)==0:
+            output, self.pending, self.finished= self.pending, b'', True
+        else:
+            output, self.pending, self.finished= split_output (self.pending+data)
+
+        if self.prefix is None:
+            write_all (self.fd, output)
+            return
+
+        lines= (self.line+output).split (b'\n')
+        self.line= lines.pop ()
+        if self.finished and len (self.line)>0:
+            lines.append (self.line)
+            self.line= b''
+
+        if len (lines)>0:
+            write_all (self.fd, b''.join ([ self.prefix+line+b'\n'
+                                            for line in lines ]))
+
+
+class WorkerSession (Session):
+    """Copies the output of a block run by a Worker until its end, without
+    closing the channel. With a pty, stderr comes mixed with stdout."""
+    def __init__ (self, channel, hostname=None, separate_stderr=False,
+                  stdout=1, stderr=2):
+        super ().__init__ ()
+        self.channel= channel
+
+        if hostname is not None:
+            prefix= ('%s: ' % hostname).encode ()
+        else:
+            prefix= None
+
+        self.stdout= BlockOutput (stdout, prefix)
+        if separate_stderr:
+            self.stderr= BlockOutput (stderr, prefix)
+        else:
+            self.stderr= None
+
+
+    def fileobjs (self):
+        return [ self.channel ]
+
+
+    def outputs (self):
+        if self.stderr is not None:
+            return [ self.stdout, self.stderr ]
+        else:
+            return [ self.stdout ]
+
+
+    def ready (self, fileobj):
+        while self.channel.recv_ready ():
+            self.stdout.feed (self.channel.recv (self.buf_len))
+
+        while self.stderr is not None and self.channel.recv_stderr_ready ():
+            self.stderr.feed (self.channel.recv_stderr (self.buf_len))
+
+        if channel_finished (self.channel):
+            logger.debug ('worker closed the channel')
+            for output in self.outputs ():
+                if not output.finished:
+                    output.feed (b'')
+
+        self.done= all ([ output.finished for output in self.outputs () ])
+        return self.done
+
+
+class Worker:
+    """A remote ayrton that runs the bodies of the remote() blocks, one after
+    the other, so the remote interpreter is started and ayrton is imported
+    only once per connection. Without a pty, its stdout and stderr are
+    separated, and it does not read stdin. See ayrton.worker."""
+    # how often we check whether the worker died while waiting for it
+    accept_timeout= 0.5
+
+    def __init__ (self, client, backchannel_port, precommand, pty=True):
+        transport= client.get_transport ()
+        self.backchannel= None
+        self.pty= pty
+
+        # see remote.prepare_connections()
+        transport.request_port_forward ('localhost', backchannel_port)
+
+        try:
+            self.channel= transport.open_session ()
+            if self.pty:
+                try:
+                    term= shutil.get_terminal_size ()
+                    self.channel.get_pty (os.environ['TERM'], term.columns, term.lines)
+                except OSError:
+                    self.channel.get_pty (os.environ['TERM'], )
+
+            command= self.command (backchannel_port, precommand)
+            logger.debug ('code to execute remote: %s', command)
+            self.channel.exec_command (command)
+
+            logger.debug ('waiting for backchannel...')
+            # accept() is not woken up when the worker dies before connecting
+            # back (no python3.6, no ayrton, a failing precommand...), so
+            # check every now and then
+            while self.backchannel is None and self.is_active ():
+                self.backchannel= transport.accept (self.accept_timeout)
+        finally:
+            # we don't need it anymore, and others can use the port
+            transport.cancel_port_forward ('localhost', backchannel_port)
+
+        if self.backchannel is None:
+            error= self.failure ()
+            close (self.channel)
+            raise ConnectionError (error)
+
+        self.connection= Connection (self.backchannel)
+        self.connection.handshake ()
+
+
+    def command (self, backchannel_port, precommand):
+        # see remote.remote_command() for the quoting
+        return """exec python3.6 -c "#!
+import logging
+logger= logging.getLogger ('ayrton.remote.runner')
+logger.debug ('precommand: %%s', '''%s''')
+%s
+import ayrton.worker
+ayrton.worker.main (%d, %r)"
+""" % (precommand, precommand, backchannel_port, not self.pty)
+
+
+    def is_active (self):
+        return not (self.channel.closed or self.channel.exit_status_ready ())
+
+
+    def failure (self):
+        """Describes why the worker did not connect back, with its exit status
+        and what it wrote (with a pty, stderr comes in stdout)."""
+        if self.channel.exit_status_ready ():
+            status= self.channel.recv_exit_status ()
+        else:
+            status= None
+
+        output= b''
+        while self.channel.recv_stderr_ready ():
+            output+= self.channel.recv_stderr (4096)
+        while self.pty and self.channel.recv_ready ():
+            output+= self.channel.recv (4096)
+
+        return ('the remote worker did not connect back (exit status %r): %s' %
+                (status, output.decode (errors='replace').strip ()))
+
+
+    def close (self):
+        close (self.backchannel)
+        close (self.channel)
+
+
+    def send (self, ast, global_env, local_env, stub=None):
+        """Sends the block to the worker. Its output is copied to our stdout
+        by stub, by default a WorkerThread with a pty and a WorkerSession
+        without, until it finishes; see receive()."""
+        if stub is None:
+            if self.pty:
+                stub= WorkerThread (self.channel)
+            else:
+                stub= WorkerSession (self.channel, separate_stderr=True)
+
+        self.stub= stub
+        self.stub.start ()
+
+        for data in (ast, global_env, local_env):
+            self.connection.send (data)
+
+
+    def receive (self):
+        """Returns the pickled result of the block."""
+        try:
+            data= self.connection.recv ()
+        finally:
+            self.stub.join ()
+
+        if data is None:
+            raise ConnectionError ('the remote worker closed the connection')
+
+        return data
+
+
+def ssh_connect (hostname, args, kwargs):
+    client= paramiko.SSHClient ()
+    # TODO: TypeError: invalid file: ['/home/mdione/.ssh/known_hosts']
+    # client.load_host_keys (bash ('~/.ssh/known_hosts'))
+    # client.set_missing_host_key_policy (ShutUpPolicy ())
+    client.set_missing_host_key_policy (paramiko.WarningPolicy ())
+
+    logger.debug ('connecting...')
+    client.connect (hostname, *args, **kwargs)
+
+    return client
+
+
+class ConnectionPool:
+    """Keeps the SSH connections open after the remote() blocks that used them
+    finish, so the next one to the same host with the same connection
+    parameters (port, user, keys...) reuses it instead of doing the whole
+    handshake again. Connections idle for more than idle_timeout seconds are
+    closed, and there are never more than max_connections open: the one idle
+    for longest is closed before opening a new one, and if all of them are in
+    use, get() waits until one is released. It can be used from several
+    threads at the same time; see remote_many."""
+    def __init__ (self, idle_timeout=60, max_connections=8):
+        self.idle_timeout= idle_timeout
+        self.max_connections= max_connections
+        # only held while looking at the lists, not while connecting
+        self.lock= Lock ()
+        # notified when a connection is released or closed
+        self.released= Condition (self.lock)
+        # the ones being opened, which also count
+        self.connecting= 0
+        # key: [ (client, last_used), ... ]
+        self.idle= {}
+        # client: key
+        self.busy= {}
+        # client: Worker
+        self.workers= {}
+
+
+    def key (self, hostname, args, kwargs):
+        # args are SSHClient.connect()'s positionals
+        params= dict (zip (('port', 'username', 'password', 'pkey',
+                            'key_filename'), args))
+        params.update (kwargs)
+        params.setdefault ('port', paramiko.config.SSH_PORT)
+
+        # pkey's and such are not hashable
+        return (hostname, ) + tuple (sorted ( (k, repr (v))
+                                              for k, v in params.items () ))
+
+
+    def connect (self, hostname, args, kwargs):
+        return ssh_connect (hostname, args, kwargs)
+
+
+    def get (self, hostname, args, kwargs):
+        """Returns a connected SSHClient, reused if possible. Give it back
+        with release(), or with discard() if it can't be reused."""
+        key= self.key (hostname, args, kwargs)
+
+        with self.lock:
+            while True:
+                self.expire ()
+
+                clients= self.idle.get (key, [])
+                while len (clients)>0:
+                    client, last_used= clients.pop ()
+                    transport= client.get_transport ()
+
+                    if transport is not None and transport.is_active ():
+                        logger.debug ('reusing connection to %s', hostname)
+                        self.busy[client]= key
+                        return client
+
+                    logger.debug ('connection to %s was closed', hostname)
+                    self.close_client (client)
+
+                while self.count ()>=self.max_connections and self.evict ():
+                    pass
+
+                if self.count ()<self.max_connections:
+                    break
+
+                logger.debug ('all the connections are in use, waiting for one')
+                self.released.wait ()
+
+            self.connecting+= 1
+
+        client= None
+        try:
+            client= self.connect (hostname, args, kwargs)
+        finally:
+            with self.lock:
+                self.connecting-= 1
+                if client is not None:
+                    self.busy[client]= key
+                else:
+                    # it failed; its slot is free again
+                    self.released.notify_all ()
+
+        return client
+
+
+    def release (self, client):
+        with self.lock:
+            key= self.busy.pop (client)
+            self.idle.setdefault (key, []).append ( (client, time.monotonic ()) )
+            self.expire ()
+
+            # in case max_connections was lowered
+            while self.count ()>self.max_connections and self.evict ():
+                pass
+
+            self.released.notify_all ()
+
+
+    def discard (self, client):
+        with self.lock:
+            self.busy.pop (client, None)
+            self.close_client (client)
+            self.released.notify_all ()
+
+
+    def worker (self, client, backchannel_port, precommand, pty=True):
+        """Returns the client's Worker, starting it if needed."""
+        with self.lock:
+            worker= self.workers.get (client, None)
+
+        if worker is not None and worker.pty!=pty:
+            logger.debug ('worker has the wrong kind of terminal')
+            worker.close ()
+            worker= None
+
+        if worker is None or not worker.is_active ():
+            logger.debug ('starting worker...')
+            worker= Worker (client, backchannel_port, precommand, pty)
+            with self.lock:
+                self.workers[client]= worker
+
+        return worker
+
+
+    def close_client (self, client):
+        # this also finishes the worker
+        self.workers.pop (client, None)
+        close (client)
+
+
+    def count (self):
+        return (self.connecting+len (self.busy)+
+                sum ([ len (clients) for clients in self.idle.values () ]))
+
+
+    def expire (self):
+        now= time.monotonic ()
+
+        for key, clients in list (self.idle.items ()):
+            for client, last_used in list (clients):
+                if now-last_used>self.idle_timeout:
+                    logger.debug ('closing idle connection to %s', key[0])
+                    clients.remove ( (client, last_used) )
+                    self.close_client (client)
+
+            if len (clients)==0:
+                del self.idle[key]
+
+
+    def evict (self):
+        """Closes the connection idle for longest. Returns False if there
+        were none; the ones in use are never closed."""
+        oldest= None
+
+        for key, clients in self.idle.items ():
+            for client, last_used in clients:
+                if oldest is None or last_used<oldest[2]:
+                    oldest= (key, client, last_used)
+
+        if oldest is None:
+            return False
+
+        key, client, last_used= oldest
+        logger.debug ('too many connections, closing the one to %s', key[0])
+        self.idle[key].remove ( (client, last_used) )
+        if len (self.idle[key])==0:
+            del self.idle[key]
+        self.close_client (client)
+
+        return True
+
+
+    def close (self):
+        with self.lock:
+            for clients in self.idle.values ():
+                for client, last_used in clients:
+                    self.close_client (client)
+
+            self.idle= {}
+
+
+def connection_pool ():
+    """The runner's ConnectionPool."""
+    if ayrton.runner.connection_pool is None:
+        ayrton.runner.connection_pool= ConnectionPool ()
+        atexit.register (ayrton.runner.connection_pool.close)
+
+    return ayrton.runner.connection_pool
+
+
+def clean_environment (d, names=None):
+    """Removes what can't or doesn't need to be sent to the remote. If names
+    is not None, only those are kept; the rest, like the builtins and the
+    environment variables, are there already."""
+    if names is not None:
+        d= dict ([ (k, d[k]) for k in names if k in d ])
+
     return dict ([ (k, v) for k, v in d.items ()
                           if type (v)!=types.ModuleType
                              and k not in ('stdin', 'stdout', 'stderr',
@@ -157,6 +857,9 @@ class remote:
         self.param ('_debugserver', kwargs)  # see make debugserver
         self.param ('_test', kwargs)  # we're testing, so add pwd to the PYTHONPATH
         self.param ('_ncserver', kwargs)  # use nc instead of ssh
+        self.param ('_pool', kwargs, True)  # reuse connections, see ConnectionPool
+        self.param ('_free', kwargs, None)  # the names the body reads, see CrazyASTTransformer
+        self.param ('_pty', kwargs, True)  # without one, stdout and stderr are separated
         self.kwargs= kwargs
         # NOTE: uncomment to connect to the debugserver
         # self.kwargs['port']= 2244
@@ -165,6 +868,12 @@ class remote:
         self.result_listen= None
         # socket/transport where the result is going to come back
         self.result_channel= None
+        self.connection= None
+        # the ConnectionPool the client comes from, and the Worker running
+        # the body, if we're reusing connections
+        self.pool= None
+        self.client= None
+        self.worker= None
 
         self.remote= None
 
@@ -180,13 +889,19 @@ class remote:
         setattr (self, param, value)
 
 
-    def remote_command (self, backchannel_port, global_env, local_env):
+    def precommand (self):
         if not self._test:
             precommand= ''
         else:
             precommand= '''import os; os.chdir ('%s')''' % os.getcwd ()
         logger.debug ("precommand: %s", precommand)
 
+        return precommand
+
+
+    def remote_command (self, backchannel_port, global_env, local_env):
+        precommand= self.precommand ()
+
         # NOTE: be careful with the quoting here,
         # there are several levels at which they're interpreted:
         # 1) ayrton's local Python interpreter (the outer """)
@@ -219,37 +934,52 @@ logger.debug ('precommand: %%s', '''%s''')                                # 14
 %s                                                                        # 15
 import ayrton #  this means that ayrton has to be installed in the remote # 16
                                                                           # 17
-client= socket ()                                                         # 18
-client.connect (('127.0.0.1', %d))                                        # 19
-ast= pickle.loads (client.recv (%d))                                      # 20
-logger.debug ('code to run:\\n%%s', ayrton.ast_pprinter.pprint (ast))     # 21
-g= pickle.loads (client.recv (%d))                                        # 22
-logger.debug2 ('globals received: %%s', ayrton.utils.dump_dict (g))       # 23
-l= pickle.loads (client.recv (%d))                                        # 24
-logger.debug2 ('locals received: %%s', ayrton.utils.dump_dict (l))        # 25
-                                                                          # 26
-# set the global runner so functions and Commands work                    # 27
-ayrton.runner= ayrton.Ayrton (g, l)                                       # 28
-caught= None                                                              # 29
-result= None                                                              # 30
-                                                                          # 31
-try:                                                                      # 32
-    result= ayrton.runner.run_tree (ast, 'from_remote')                   # 33
-except Exception as e:                                                    # 34
-    logger.debug ('run raised: %%r', e)                                   # 35
-    logger.debug (traceback.format_exc())                                 # 36
-    caught= e                                                             # 37
-                                                                          # 38
-logger.debug2 ('runner.locals: %%s', ayrton.utils.dump_dict (ayrton.runner.locals)) # 39
-                                                                          # 40
-logger.debug ('about to send exit status')                                # 41
-data = pickle.dumps ( (ayrton.runner.locals, result, caught) )            # 42
-logger.debug ('sending %%d bytes', len (data))                            # 43
-client.sendall (data)                                                     # 44
-logger.debug ('exit status sent')                                         # 45
-client.close ()                                                           # 46"
-""" % (precommand, precommand, backchannel_port,
-       len (self.ast), len (global_env), len (local_env))
+from ayrton.protocol import Connection                                    # 18
+from ayrton.worker import assigned_locals                                 # 19
+client= socket ()                                                         # 20
+client.connect (('127.0.0.1', %d))                                        # 21
+connection= Connection (client)                                           # 22
+connection.handshake ()                                                   # 23
+ast= pickle.loads (connection.recv ())                                    # 24
+logger.debug ('code to run:\\n%%s', ayrton.ast_pprinter.pprint (ast))     # 25
+g= pickle.loads (connection.recv ())                                      # 26
+logger.debug2 ('globals received: %%s', ayrton.utils.dump_dict (g))       # 27
+l= pickle.loads (connection.recv ())                                      # 28
+logger.debug2 ('locals received: %%s', ayrton.utils.dump_dict (l))        # 29
+                                                                          # 30
+# set the global runner so functions and Commands work                    # 31
+ayrton.runner= ayrton.Ayrton (g, l)                                       # 32
+caught= None                                                              # 33
+result= None                                                              # 34
+                                                                          # 35
+try:                                                                      # 36
+    result= ayrton.runner.run_tree (ast, 'from_remote')                   # 37
+except Exception as e:                                                    # 38
+    logger.debug ('run raised: %%r', e)                                   # 39
+    logger.debug (traceback.format_exc())                                 # 40
+    caught= e                                                             # 41
+                                                                          # 42
+logger.debug2 ('runner.locals: %%s', ayrton.utils.dump_dict (ayrton.runner.locals)) # 43
+                                                                          # 44
+logger.debug ('about to send exit status')                                # 45
+l= assigned_locals (ast, ayrton.runner.locals)                            # 46
+data= pickle.dumps ( (l, result, caught) )                                # 47
+connection.send (data)                                                    # 48
+logger.debug ('exit status sent')                                         # 49
+client.close ()                                                           # 50"
+""" % (precommand, precommand, backchannel_port)
+
+
+    def start_worker (self, backchannel_port):
+        # this will be executed in remote.__enter__(); see prepare_connections()
+        if self._debugserver:  # run make debugserver
+            self.kwargs['port']= 2244
+
+        self.pool= connection_pool ()
+        self.client= self.pool.get (self.hostname, self.args, self.kwargs)
+
+        return self.pool.worker (self.client, backchannel_port, self.precommand (),
+                                 self._pty)
 
 
     def prepare_connections (self, backchannel_port, command):
@@ -257,24 +987,17 @@ client.close ()                                                           # 46"
         # any errors here are not handled by __exit__()
         # so if anything happens, we must cleanup here
         if not self._ncserver:
-            self.client= paramiko.SSHClient ()
-            # TODO: TypeError: invalid file: ['/home/mdione/.ssh/known_hosts']
-            # self.client.load_host_keys (bash ('~/.ssh/known_hosts'))
-            # self.client.set_missing_host_key_policy (ShutUpPolicy ())
-            self.client.set_missing_host_key_policy (paramiko.WarningPolicy ())
-
             if self._debugserver:  # run make debugserver
                 self.kwargs['port']= 2244
 
-            logger.debug ('connecting...')
-            self.client.connect (self.hostname, *self.args, **self.kwargs)
+            self.client= ssh_connect (self.hostname, self.args, self.kwargs)
 
             # create the backchannel
             # this channel will be used for sending/receiving runtime data
             # to/from the remote
-            # the remote code will connect to it (line #18)
-            # read the ast (#19), globals (#21) and locals (#23)
-            # and return the locals, result and exception (#43)
+            # the remote code will connect to it (line #21)
+            # read the ast (#24), globals (#26) and locals (#28)
+            # and return the locals, result and exception (#48)
             # the remote will see this channel as a localhost port
             # and it's seen on the local side as self.con defined below
             self.result_listen= self.client.get_transport ()
@@ -287,12 +1010,13 @@ client.close ()                                                           # 46"
             #19:44:54.953791 getsockopt(3, SOL_TCP, TCP_NODELAY, [0], [4]) = 0 <0.000016>
             #19:44:54.953852 setsockopt(3, SOL_TCP, TCP_NODELAY, [1], 4) = 0 <0.000014>
 
-            try:
-                # TODO signal handler for SIGWINCH
-                term= shutil.get_terminal_size ()
-                channel.get_pty (os.environ['TERM'], term.columns, term.lines)
-            except OSError:
-                channel.get_pty (os.environ['TERM'], )
+            if self._pty:
+                try:
+                    # TODO signal handler for SIGWINCH
+                    term= shutil.get_terminal_size ()
+                    channel.get_pty (os.environ['TERM'], term.columns, term.lines)
+                except OSError:
+                    channel.get_pty (os.environ['TERM'], )
 
             logger.debug ('exec!')
             channel.exec_command (command)
@@ -328,7 +1052,8 @@ client.close ()                                                           # 46"
         return i, o, e
 
 
-    def __enter__ (self):
+    def environment (self, inception_locals):
+        """Returns the pickled globals and locals for the remote."""
         # get the globals from the runtime
 
         # for solving the import problem:
@@ -337,70 +1062,108 @@ client.close ()                                                           # 46"
         # the imports and hold them in another ayrton.Environment attribute
         # or we just weed them out here. so far this is the simpler option
         # but forces the user to reimport what's going to be used in the remote
-        g= clean_environment (ayrton.runner.globals)
-
-        # get the locals from the runtime
-        # this is not so easy: for some reason, ayrton.runner.locals is not up to
-        # date in the middle of the execution (remember *this* code is executed
-        # via exec() in Ayrton.run_code())
-        # another option is to go through the frames
-        inception_locals= sys._getframe().f_back.f_locals
-        l= clean_environment (inception_locals)
+        g= clean_environment (ayrton.runner.globals, self._free)
+        l= clean_environment (inception_locals, self._free)
 
         # special treatment for argv
         g['argv']= ayrton.runner.globals['argv']
 
-        logger.debug3 ('globals passed to remote: %s', ayrton.utils.dump_dict (g))
+        # don't format them if they're not going to be logged
+        if logger.isEnabledFor (logging.DEBUG3):
+            logger.debug3 ('globals passed to remote: %s', ayrton.utils.dump_dict (g))
+            logger.debug3 ('locals passed to remote: %s', ayrton.utils.dump_dict (l))
+
         global_env= pickle.dumps (g)
-        logger.debug3 ('locals passed to remote: %s', ayrton.utils.dump_dict (l))
         local_env= pickle.dumps (l)
 
-        backchannel_port= 4227
+        return global_env, local_env
 
-        command= self.remote_command (backchannel_port, global_env, local_env)
-        logger.debug ('code to execute remote: %s', command)
 
-        try:
-            i, o, e= self.prepare_connections (backchannel_port, command)
+    def __enter__ (self):
+        # get the locals from the runtime
+        # this is not so easy: for some reason, ayrton.runner.locals is not up to
+        # date in the middle of the execution (remember *this* code is executed
+        # via exec() in Ayrton.run_code())
+        # another option is to go through the frames
+        inception_locals= sys._getframe().f_back.f_locals
+        global_env, local_env= self.environment (inception_locals)
 
-            logger.debug ('sending ast, globals, locals')
-            # TODO: compress?
-            self.result_channel.sendall (self.ast)
-            self.result_channel.sendall (global_env)
-            self.result_channel.sendall (local_env)
+        backchannel_port= 4227
 
-            # TODO: handle _in, _out, _err
-            self.remote= RemoteStub (( (os.dup (0), i), (o, os.dup (1)), (e, os.dup (2)) ))
+        try:
+            if self._pool and not self._ncserver:
+                # the connection and the remote ayrton are reused
+                self.worker= self.start_worker (backchannel_port)
+
+                logger.debug ('sending ast, globals, locals')
+                self.worker.send (self.ast, global_env, local_env)
+            else:
+                command= self.remote_command (backchannel_port, global_env, local_env)
+                logger.debug ('code to execute remote: %s', command)
+
+                i, o, e= self.prepare_connections (backchannel_port, command)
+
+                self.connection= Connection (self.result_channel)
+                self.connection.handshake ()
+
+                logger.debug ('sending ast, globals, locals')
+                for data in (self.ast, global_env, local_env):
+                    self.connection.send (data)
+
+                # TODO: handle _in, _out, _err
+                if self._pty or self._ncserver:
+                    self.remote= RemoteStub (( (os.dup (0), i), (o, os.dup (1)), (e, os.dup (2)) ))
+                else:
+                    # i, o and e are the same channel
+                    self.remote= StreamSession (i, os.dup (0))
+                    self.remote.start ()
         except (paramiko.ssh_exception.SSHException, ConnectionError, OSError) as e:
             # NOTE: this is the only time we do this
             # please make sure the list of fileobjs is correct
-            for fileobj in (self.result_channel, self.result_listen, self.client):
-                close (fileobj)
+            if self.pool is not None:
+                # don't reuse it
+                if self.client is not None:
+                    self.pool.discard (self.client)
+            else:
+                for fileobj in (self.result_channel, self.result_listen, self.client):
+                    close (fileobj)
 
             raise e
 
 
     def __exit__ (self, *args):
         logger.debug (args)
-        data= b''
-        partial= self.result_channel.recv (8196)
-        while len(partial)>0:
-            data+= partial
-            partial= self.result_channel.recv (8196)
+        if self.worker is not None:
+            try:
+                data= self.worker.receive ()
+            except (paramiko.ssh_exception.SSHException, ConnectionError, OSError):
+                self.pool.discard (self.client)
+                raise
+
+            # the connection is kept open for the next remote() to this host
+            logger.debug ('releasing client %s', self.client)
+            self.pool.release (self.client)
+        else:
+            data= self.connection.recv ()
+
+            logger.debug ('closing result_channel %s', self.result_channel)
+            close(self.result_channel)
+
+            logger.debug ('closing result_listen %s', self.result_listen)
+            close(self.result_listen)
+            logger.debug ('closing remote %s', self.remote)
+            close(self.remote)
+            logger.debug ('closing client %s', self.client)
+            close(self.client)
+
+            if data is None:
+                raise ConnectionError ('the remote closed the connection')
 
         logger.debug ('recieved %d bytes', len (data))
         (l, result, e)= pickle.loads (data)
         logger.debug ('result from remote: %r', result)
-        logger.debug3 ('locals returned from remote: %s', ayrton.utils.dump_dict (l))
-        logger.debug ('closing result_channel %s', self.result_channel)
-        close(self.result_channel)
-
-        logger.debug ('closing result_listen %s', self.result_listen)
-        close(self.result_listen)
-        logger.debug ('closing remote %s', self.remote)
-        close(self.remote)
-        logger.debug ('closing client %s', self.client)
-        close(self.client)
+        if logger.isEnabledFor (logging.DEBUG3):
+            logger.debug3 ('locals returned from remote: %s', ayrton.utils.dump_dict (l))
 
         # update locals
         callers_frame= sys._getframe().f_back
@@ -414,11 +1177,149 @@ client.close ()                                                           # 46"
 
         # TODO: (and globals?)
 
-        logger.debug3 ('globals after remote: %s', ayrton.utils.dump_dict (ayrton.runner.globals))
-        logger.debug3 ('locals after remote: %s', ayrton.utils.dump_dict (callers_frame.f_locals))
-        logger.debug3 ('co_varnames: %s', callers_frame.f_code.co_varnames)
+        if logger.isEnabledFor (logging.DEBUG3):
+            logger.debug3 ('globals after remote: %s', ayrton.utils.dump_dict (ayrton.runner.globals))
+            logger.debug3 ('locals after remote: %s', ayrton.utils.dump_dict (callers_frame.f_locals))
+            logger.debug3 ('co_varnames: %s', callers_frame.f_code.co_varnames)
 
         if e is not None:
             logger.debug ('raised from remote: %r', e)
             # TODO: this makes the exception be as if raised from here
             raise e
+
+
+class RemoteResult:
+    """What the body of a remote_many() did in one of the hosts."""
+    def __init__ (self, hostname, locals=None, result=None, exception=None):
+        self.hostname= hostname
+        self.locals= locals
+        self.result= result
+        self.exception= exception
+
+
+    def __bool__ (self):
+        return self.exception is None
+
+
+    def __repr__ (self):
+        return 'RemoteResult (%r, result=%r, exception=%r)' % (self.hostname,
+                                                               self.result,
+                                                               self.exception)
+
+
+class remote_many (remote):
+    """Runs the body in all the hosts, at most concurrency of them at the same
+    time::
+
+        with remote_many (hosts, concurrency=20) as r:
+            ...
+
+    The output of each host is copied to stdout with its name in front of
+    each line. The locals, result and exception of the body in each host are
+    in r.results[hostname], a RemoteResult; the caller's locals are not
+    modified and the exceptions are not raised. The rest of the arguments are
+    the same as remote()'s, and the connections are always reused, so it's
+    never run in more hosts at the same time than connections the pool keeps
+    open, which is also the default concurrency."""
+    def __init__ (self, ast, hostnames, *args, concurrency=None, **kwargs):
+        # there's nobody typing in the other side
+        kwargs.setdefault ('_pty', False)
+        super ().__init__ (ast, None, *args, **kwargs)
+
+        if concurrency is not None and concurrency<1:
+            raise ValueError ("remote_many() needs at least one slot, not %r" % concurrency)
+
+        # each one only once, in the same order
+        self.hostnames= list (collections.OrderedDict.fromkeys (hostnames))
+        self.concurrency= concurrency
+        # hostname: RemoteResult, in the order of hostnames
+        self.results= collections.OrderedDict ()
+
+        self.pending= queue.Queue ()
+        self.threads= []
+        self.finished= {}
+
+
+    def __enter__ (self):
+        # see remote.__enter__()
+        inception_locals= sys._getframe().f_back.f_locals
+        self.global_env, self.local_env= self.environment (inception_locals)
+
+        self.pool= connection_pool ()
+
+        for hostname in self.hostnames:
+            self.pending.put (hostname)
+
+        # more would only wait for a connection; see ConnectionPool.get()
+        concurrency= self.pool.max_connections
+        if self.concurrency is not None:
+            concurrency= min (self.concurrency, concurrency)
+
+        for i in range (min (concurrency, len (self.hostnames))):
+            thread= Thread (target=self.work)
+            thread.start ()
+            self.threads.append (thread)
+
+        return self
+
+
+    def work (self):
+        while True:
+            try:
+                hostname= self.pending.get_nowait ()
+            except queue.Empty:
+                return
+
+            try:
+                result= self.run (hostname)
+            except Exception as e:
+                # anything else, like a broken message from the worker; the
+                # rest of the hosts are run anyway
+                logger.debug ('%s failed: %r', hostname, e)
+                result= RemoteResult (hostname, exception=e)
+
+            self.finished[hostname]= result
+
+
+    def run (self, hostname):
+        try:
+            client= self.pool.get (hostname, self.args, self.kwargs)
+        except (paramiko.ssh_exception.SSHException, ConnectionError, OSError) as e:
+            logger.debug ('could not connect to %s: %r', hostname, e)
+            return RemoteResult (hostname, exception=e)
+
+        try:
+            # see remote.__enter__()
+            worker= self.pool.worker (client, 4227, self.precommand (), self._pty)
+            # all the output is written from the same thread, so the lines
+            # of the hosts don't get mixed
+            worker.send (self.ast, self.global_env, self.local_env,
+                         WorkerSession (worker.channel, hostname, not self._pty))
+            data= worker.receive ()
+        except Exception as e:
+            logger.debug ('%s failed: %r', hostname, e)
+            # whatever happened, the worker can't be trusted anymore
+            self.pool.discard (client)
+            return RemoteResult (hostname, exception=e)
+
+        self.pool.release (client)
+
+        (l, result, e)= pickle.loads (data)
+        logger.debug ('result from %s: %r', hostname, result)
+
+        return RemoteResult (hostname, l, result, e)
+
+
+    def __exit__ (self, *args):
+        for thread in self.threads:
+            thread.join ()
+
+        for hostname in self.hostnames:
+            self.results[hostname]= self.finished[hostname]
+
+
+    @property
+    def failed (self):
+        """The hosts where the body raised an exception or could not be run."""
+        return [ hostname for hostname, result in self.results.items ()
+                          if not result ]
@@ -0,0 +1,138 @@
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+import asyncio
+import os
+import tempfile
+import time
+
+from ayrton.execute import Capture, CommandFailed, CommandNotFound
+from ayrton.aio import AsyncCommand, AsyncPipeline
+import ayrton
+
+# create one of these
+ayrton.runner= ayrton.Ayrton ()
+
+echo= AsyncCommand ('echo')
+cat= AsyncCommand ('cat')
+seq= AsyncCommand ('seq')
+sleep= AsyncCommand ('sleep')
+false= AsyncCommand ('false')
+grep= AsyncCommand ('grep')
+wc= AsyncCommand ('wc')
+
+
+def run (coroutine):
+    return asyncio.get_event_loop ().run_until_complete (coroutine)
+
+
+class AsyncCommandTests (unittest.TestCase):
+    def testCapture (self):
+        async def f ():
+            return await echo ('foo', _out=Capture)
+
+        a= run (f ())
+        self.assertEqual (str (a), 'foo\n')
+        self.assertEqual (a.exit_code (), 0)
+
+    def testIter (self):
+        async def f ():
+            return [ line async for line in seq ('3', _out=Capture) ]
+
+        self.assertEqual (run (f ()), [ '1', '2', '3' ])
+
+    def testIn (self):
+        async def f ():
+            return await cat (_in=[ 'foo', 'bar' ], _out=Capture)
+
+        self.assertEqual (run (f ()).readlines (), [ 'foo\n', 'bar\n' ])
+
+    def testInAsyncProcess (self):
+        async def f ():
+            return await grep ('2', _in=seq ('100', _out=Capture), _out=Capture)
+
+        self.assertEqual (len (run (f ()).readlines ()), 19)
+
+    def testOutFile (self):
+        with tempfile.TemporaryDirectory () as d:
+            file_name= os.path.join (d, 'out')
+
+            async def f ():
+                await echo ('foo', _out=(file_name, os.O_CREAT))
+
+            run (f ())
+
+            with open (file_name) as f:
+                self.assertEqual (f.read (), 'foo\n')
+
+    def testConcurrent (self):
+        async def f ():
+            await asyncio.gather (*[ sleep ('0.5') for i in range (10) ])
+
+        start= time.monotonic ()
+        run (f ())
+        self.assertLess (time.monotonic ()-start, 2.5)
+
+    def testFails (self):
+        async def f ():
+            return await false (_fails=True)
+
+        self.assertEqual (run (f ()).exit_code (), 1)
+
+        async def g ():
+            await false ()
+
+        self.assertRaises (CommandFailed, run, g ())
+
+class AsyncPipelineTests (unittest.TestCase):
+    def testPipeline (self):
+        async def f ():
+            return await AsyncPipeline (seq ('100'), grep ('2'),
+                                        wc ('-l', _out=Capture))
+
+        p= run (f ())
+        self.assertEqual (str (p), '19\n')
+        self.assertEqual (p.exit_codes (), [ 0, 0, 0 ])
+
+    def testIter (self):
+        async def f ():
+            return [ line async for line in AsyncPipeline (seq ('3'),
+                                                           cat (_out=Capture)) ]
+
+        self.assertEqual (run (f ()), [ '1', '2', '3' ])
+
+    def testFails (self):
+        async def f ():
+            await AsyncPipeline (seq ('3'), grep ('foo'))
+
+        self.assertRaises (CommandFailed, run, f ())
+
+    def testCommandNotFound (self):
+        # what the shell returns when it can't find the command
+        p= AsyncPipeline (AsyncCommand ('sh') ('-c', 'exit 127'), seq ('3'),
+                          cat (_out=Capture))
+
+        async def f ():
+            await p
+
+        self.assertRaises (CommandNotFound, run, f ())
+
+        # all of them were reaped anyway
+        self.assertEqual (p.exit_codes (), [ 127, 0, 0 ])
+        self.assertEqual (p.exit_code (), 0)
+        self.assertEqual (str (p), '1\n2\n3\n')
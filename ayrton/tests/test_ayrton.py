@@ -20,7 +20,12 @@ import sys
 import io
 import os
 import tempfile
+import subprocess
 import os.path
+import json
+import pstats
+import contextlib
+import time
 
 from ayrton.expansion import bash, default
 import ayrton
@@ -301,6 +306,22 @@ class RedirectionPiping (TempFile):
         self.doTest ('testLongPipe.ay', '1\n')
 
 
+    def testPipeExitCodes (self):
+        self.doTest ('testPipeExitCodes.ay', (0, [ 1, 0 ]))
+
+
+    def testPipefail (self):
+        self.doTest ('testPipefail.ay', 1)
+
+
+    def testPipefailErrexit (self):
+        self.assertRaises (ayrton.CommandFailed, self.doTest, 'testPipefailErrexit.ay')
+
+
+    def testPipeIteration (self):
+        self.doTest ('testPipeIteration.ay', [ 'setup.py' ])
+
+
 class MiscTests (ScriptExecution):
 
     def testEnviron (self):
@@ -540,3 +561,215 @@ class ReturnValues (unittest.TestCase):
 
     def testException (self):
         self.assertRaises (SystemError, ayrton.main, '''raise SystemError''')
+
+
+class CodeCache (unittest.TestCase):
+
+    def setUp (self):
+        self.dir= tempfile.TemporaryDirectory ()
+        self.addCleanup (self.dir.cleanup)
+        self.file_name= os.path.join (self.dir.name, 'testCodeCache.ay')
+
+        # PYTHONDONTWRITEBYTECODE also disables ayrton's cache
+        self.addCleanup (setattr, sys, 'dont_write_bytecode', sys.dont_write_bytecode)
+        sys.dont_write_bytecode= False
+
+
+    def write (self, source):
+        with open (self.file_name, 'w') as f:
+            f.write (source)
+
+
+    def run_file (self, **kwargs):
+        runner= ayrton.Ayrton (**kwargs)
+        return runner, runner.run_file (self.file_name)
+
+
+    def parse_fails (self, *args):
+        self.fail ('the script was parsed again')
+
+
+    def testCached (self):
+        self.write ('exit (42)')
+        self.run_file ()
+
+        self.assertTrue (os.path.exists (ayrton.cache.cache_path (self.file_name)))
+
+        runner= ayrton.Ayrton ()
+        runner.parse= self.parse_fails
+        self.assertEqual (runner.run_file (self.file_name), 42)
+
+
+    def testModified (self):
+        self.write ('exit (42)')
+        self.run_file ()
+
+        self.write ('exit (43)')
+        runner, result= self.run_file ()
+        self.assertEqual (result, 43)
+
+
+    def testNotCached (self):
+        self.write ('exit (42)')
+        runner= ayrton.Ayrton ()
+        result= runner.run_file (self.file_name, params=ayrton.ExecParams (cache=False))
+        self.assertEqual (result, 42)
+        self.assertFalse (os.path.exists (ayrton.cache.cache_path (self.file_name)))
+
+
+    def testConsultedNames (self):
+        # testCodeCacheFunction is not defined, so it's considered an executable
+        self.write ('exit (testCodeCacheFunction ())')
+        self.assertRaises (CommandNotFound, self.run_file)
+
+        # now it is defined, so it must not be executed
+        runner, result= self.run_file (testCodeCacheFunction=lambda: 44)
+        self.assertEqual (result, 44)
+
+
+class Profiling (unittest.TestCase):
+    def setUp (self):
+        self.dir= tempfile.TemporaryDirectory ()
+        self.addCleanup (self.dir.cleanup)
+
+
+    def testJSON (self):
+        file_name= os.path.join (self.dir.name, 'profile.json')
+        params= ayrton.ExecParams (profile=file_name)
+        ayrton.main ('true ()\ntrue ()\nfalse (_fails=True)', params=params)
+
+        with open (file_name) as f:
+            stats= json.load (f)
+
+        for phase in ('transform', 'compile', 'execute'):
+            self.assertIn (phase, stats['phases'])
+
+        commands= dict ([ (os.path.basename (path), data)
+                          for path, data in stats['commands'].items () ])
+        self.assertEqual (commands['true']['count'], 2)
+        self.assertEqual (commands['false']['count'], 1)
+        self.assertGreater (commands['true']['elapsed'], 0)
+
+
+    def testPstats (self):
+        file_name= os.path.join (self.dir.name, 'profile.pstats')
+        params= ayrton.ExecParams (profile=file_name)
+
+        # Ayrton() needs sys.stderr.buffer
+        stderr= io.TextIOWrapper (io.BytesIO ())
+        with contextlib.redirect_stderr (stderr):
+            ayrton.main ('true ()', params=params)
+
+        stderr.seek (0)
+        self.assertIn ('execute', stderr.read ())
+        stats= pstats.Stats (file_name)
+        self.assertGreater (stats.total_calls, 0)
+
+
+    def testNestedPhases (self):
+        profiler= ayrton.profiler.Profiler ()
+        with profiler.phase ('outer'):
+            for i in profiler.timed ('inner', range (3)):
+                time.sleep (0.01)
+
+        self.assertLess (profiler.phases['inner'], 0.01)
+        self.assertGreaterEqual (profiler.phases['outer'], 0.03)
+
+
+class Tracing (unittest.TestCase):
+    def trace (self, script, **kwargs):
+        params= ayrton.ExecParams (trace=True, **kwargs)
+
+        # Ayrton() needs sys.stderr.buffer
+        stderr= io.TextIOWrapper (io.BytesIO ())
+        with contextlib.redirect_stderr (stderr):
+            ayrton.main (script, params=params)
+
+        stderr.seek (0)
+        return stderr.read ()
+
+
+    def testTrace (self):
+        self.assertEqual (self.trace ('for i in range (2):\n    a= i\ntrue ()'),
+                          '+ for i in range (2):\n+     a= i\n+     a= i\n+ true ()\n')
+
+
+    def testInterleaved (self):
+        # what the script prints comes after the trace of its statement, even
+        # if the trace is buffered
+        output= io.TextIOWrapper (io.BytesIO ())
+        with contextlib.redirect_stdout (output), contextlib.redirect_stderr (output):
+            ayrton.main ('print (1)\na= 1\nprint (2)',
+                         params=ayrton.ExecParams (trace=True))
+
+        output.seek (0)
+        self.assertEqual (output.read (),
+                          '+ print (1)\n1\n+ a= 1\n+ print (2)\n2\n')
+        self.assertNotIsInstance (sys.stdout, ayrton.tracer.TracedStream)
+
+
+    def testLinenos (self):
+        self.assertEqual (self.trace ('a= 1\n\nb= 2', linenos=True),
+                          '+ [     1] a= 1\n+ [     3] b= 2\n')
+
+
+    def testBuffered (self):
+        tracer= ayrton.tracer.Tracer ([ 'a= 1\n' ], output=io.StringIO (),
+                                      buffer_size=3)
+        tracer (1)
+        tracer (1)
+        self.assertEqual (tracer.output.getvalue (), '')
+
+        tracer (1)
+        self.assertEqual (tracer.output.getvalue (), '+ a= 1\n'*3)
+
+
+    def testCachedSeparately (self):
+        with tempfile.TemporaryDirectory () as dir_name:
+            file_name= os.path.join (dir_name, 'testTracing.ay')
+            with open (file_name, 'w') as f:
+                f.write ('a= 1')
+
+            self.addCleanup (setattr, sys, 'dont_write_bytecode', sys.dont_write_bytecode)
+            sys.dont_write_bytecode= False
+
+            # cached without the calls to the Tracer...
+            ayrton.Ayrton ().run_file (file_name)
+
+            # ... but it must not be used when tracing
+            stderr= io.TextIOWrapper (io.BytesIO ())
+            with contextlib.redirect_stderr (stderr):
+                ayrton.Ayrton ().run_file (file_name, params=ayrton.ExecParams (trace=True))
+
+            stderr.seek (0)
+            self.assertEqual (stderr.read (), '+ a= 1\n')
+
+
+class LazyImports (unittest.TestCase):
+    def testParamiko (self):
+        # paramiko takes a long time to import; only remote() should load it
+        code= """import sys
+import ayrton
+ayrton.Ayrton ()
+print ('paramiko' in sys.modules)"""
+        output= subprocess.check_output ([ sys.executable, '-c', code ])
+
+        self.assertEqual (output, b'False\n')
+
+
+class Logging (unittest.TestCase):
+    def testLevelCache (self):
+        # the levels are cached, but changing them must be noticed
+        logger= logging.getLogger ('ayrton.tests.ayrton.cache')
+        self.addCleanup (logging.root.setLevel, logging.root.level)
+
+        logging.root.setLevel (logging.WARNING)
+        self.assertFalse (logger.isEnabledFor (logging.DEBUG2))
+
+        logging.root.setLevel (logging.DEBUG2)
+        self.assertTrue (logger.isEnabledFor (logging.DEBUG2))
+        self.assertFalse (logger.isEnabledFor (logging.DEBUG3))
+
+        logger.setLevel (logging.INFO)
+        self.assertFalse (logger.isEnabledFor (logging.DEBUG2))
+        logger.setLevel (logging.NOTSET)
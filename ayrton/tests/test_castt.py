@@ -23,7 +23,7 @@ from ast import Del, Pass, Import, ImportFrom, Global, Assert
 
 from ayrton import castt
 from ayrton.execute import o
-from ayrton.functions import cd, define
+from ayrton.functions import cd, define, remote
 import ayrton
 
 flow_stmt= [ Break, Continue, Return, Raise, Yield, ]
@@ -114,6 +114,23 @@ class TestVisits (unittest.TestCase):
         self.assertEqual (len (node.keywords), 0, ast.dump (node))
         self.check_attrs (node)
 
+    def testPipe (self):
+        c= castt.CrazyASTTransformer ({})
+        t= ast.parse ("""a () | b () | c (_out=Capture)""")
+
+        node= c.visit_BinOp (t.body[0].value)
+
+        # Pipeline (Command ('a').setup (), Command ('b').setup (),
+        #           Command ('c').setup (_out=Capture)) ()
+        self.assertTrue (castt.is_pipeline (node), ast.dump (node))
+        commands= node.func.args
+        self.assertEqual (len (commands), 3, ast.dump (node))
+        for command, name in zip (commands, 'abc'):
+            self.assertEqual (command.func.attr, 'setup', ast.dump (command))
+            self.assertEqual (command.func.value.args[0].s, name, ast.dump (command))
+        self.assertEqual (commands[2].keywords[0].arg, '_out', ast.dump (node))
+        self.check_attrs (node)
+
     def testDoubleKeywordCommand (self):
         c= castt.CrazyASTTransformer ({ 'o': o})
         t= ayrton.parse ("""foo (p= True, p=False)""")
@@ -224,6 +241,85 @@ class TestHelperFunctions (unittest.TestCase):
         self.assertEqual (single, None)
         self.assertEqual (combined, None)
 
+    def testFreeNames (self):
+        t= ast.parse ("""a= b+c
+d+= 1
+del e
+f= "$g and ${h}"
+def i (j):
+    return k""")
+
+        self.assertEqual (castt.free_names (t),
+                          set ('bcdeghk'))
+
+    def testAssignedNames (self):
+        t= ast.parse ("""a, b= 1, 2
+c+= 1
+for d in e: pass
+import f.g
+from h import i as j
+def k (): l= 4
+class m: pass
+try:
+    pass
+except Exception as n:
+    pass""")
+
+        self.assertEqual (castt.assigned_names (t),
+                          set ('abcdfjklmn'))
+
+    def testRemoteFreeNames (self):
+        c= castt.CrazyASTTransformer ({ 'remote': remote })
+        t= ayrton.parse ("""with remote ('localhost'):
+    a= b""")
+
+        node= c.visit_With (t.body[0])
+        keywords= node.items[0].context_expr.keywords
+
+        self.assertEqual ([ kw.arg for kw in keywords ], [ '_free' ])
+        self.assertEqual ([ s.s for s in keywords[0].value.elts ], [ 'b' ])
+
+class TestTrace (unittest.TestCase):
+
+    def traced_lines (self, body):
+        return [ stmt.value.args[0].n for stmt in body
+                 if type (stmt)==ast.Expr and type (stmt.value)==ast.Call and
+                    getattr (stmt.value.func, 'id', None)=='ayrton_trace' ]
+
+    def testStatements (self):
+        c= castt.CrazyASTTransformer ({}, trace=True)
+        t= c.modify (ayrton.parse ("""a= 1
+if a:
+    b= 2
+else:
+    b= 3"""))
+
+        self.assertEqual (self.traced_lines (t.body), [ 1, 2 ])
+        self.assertEqual (self.traced_lines (t.body[3].body), [ 3 ])
+        self.assertEqual (self.traced_lines (t.body[3].orelse), [ 5 ])
+        # it still compiles
+        compile (t, 'test', 'exec')
+
+    def testDocstringAndGlobal (self):
+        c= castt.CrazyASTTransformer ({}, trace=True)
+        t= c.modify (ayrton.parse ("""def f ():
+    'doc'
+    global a
+    a= 1"""))
+
+        body= t.body[1].body
+        self.assertIsInstance (body[0].value, Str)
+        self.assertEqual (self.traced_lines (body), [ 4 ])
+
+    def testRemote (self):
+        # the body is run in the remote, which does not trace
+        c= castt.CrazyASTTransformer ({ 'remote': remote }, trace=True)
+        t= c.modify (ayrton.parse ("""with remote ('localhost'):
+    a= b"""))
+
+        self.assertEqual (self.traced_lines (t.body), [ 1 ])
+        self.assertEqual (self.traced_lines (t.body[1].body), [])
+
 class TestWeirdErrors (unittest.TestCase):
     check_attrs= check_attrs
 
@@ -17,10 +17,18 @@
 
 import unittest
 import os
+import os.path
 import random
+import signal
+import subprocess
+import tempfile
+import time
+from unittest.mock import patch
 
 from ayrton.execute import Command, Capture, o
 import ayrton
+import ayrton.execute
+from ayrton.functions import parallel, rehash
 
 # create one of these
 ayrton.runner= ayrton.Ayrton ()
@@ -33,6 +41,10 @@ mcedit= Command ('mcedit')
 true= Command ('true')
 false= Command ('false')
 grep= Command ('grep')
+head= Command ('head')
+bash= Command ('bash')
+printf= Command ('printf')
+seq= Command ('seq')
 stderr= Command ('./ayrton/tests/scripts/stderr.sh')
 
 def setUpMockStdOut (self):
@@ -226,6 +238,53 @@ class Redirected (unittest.TestCase):
         self.assertEqual (l[0], 'Makefile')
         self.assertEqual (l[1], '_err=Capture')
 
+    def testOutStreamed (self):
+        r, w= os.pipe ()
+        # the second line depends on what we write after reading the first one
+        a= bash ('-c', 'echo first; read -t 5 line; echo "$line"', _in=r,
+                 _out=Capture, _bg=True)
+        os.close (r)
+
+        lines= iter (a)
+        self.assertEqual (next (lines), 'first')
+        os.write (w, b'second\n')
+        os.close (w)
+        self.assertEqual (list (lines), [ 'second' ])
+
+    def testOutChunks (self):
+        a= printf ('\\x00\\xff', _out=Capture, _bg=True)
+        self.assertEqual (b''.join (a.chunks ()), b'\x00\xff')
+
+    def testOutChunksSize (self):
+        a= printf ('abcde', _out=Capture)
+        self.assertEqual (list (a.chunks (2)), [ b'ab', b'cd', b'e' ])
+
+    def testOutChunksAfterLines (self):
+        a= seq ('3', _out=Capture, _bg=True)
+        self.addCleanup (a.close)
+
+        self.assertEqual (next (iter (a)), '1')
+        self.assertRaises (ValueError, list, a.chunks ())
+
+    def testInLarge (self):
+        # more than what fits in the pipes; this used to block the child
+        # writing stdout while we were writing its stdin
+        lines= [ 'x'*99 ]*20000
+        a= cat (_in=lines, _out=Capture)
+        self.assertEqual (a.readlines (), [ line+'\n' for line in lines ])
+
+    def testInCapturedCommand (self):
+        a= Command ('seq') ('10000', _out=Capture, _bg=True)
+        b= cat (_in=a, _out=Capture)
+        self.assertEqual (list (b), [ str (i) for i in range (1, 10001) ])
+        self.assertEqual (a.exit_code (), 0)
+
+    def testInNotRead (self):
+        # head closes its stdin before we finish writing
+        a= head ('-n', '1', _in=(str (i) for i in range (100000)), _out=Capture)
+        self.assertEqual (a.readline (), '0')
+        self.assertEqual (a.exit_code (), 0)
+
     def testPipe (self):
         r, w= os.pipe ()
         echo ('pipe!', _out=w)
@@ -271,6 +330,26 @@ class CommandExecution (unittest.TestCase):
             raise ValueError ("too many lines")
         b.close ()
 
+    def testPipelineCommandNotFound (self):
+        # found, but it can't be executed
+        fd, script= tempfile.mkstemp (suffix='.sh')
+        self.addCleanup (os.unlink, script)
+        os.write (fd, b'#! /does/not/exist\n')
+        os.close (fd)
+        os.chmod (script, 0o755)
+
+        p= ayrton.execute.Pipeline (Command (script).setup (),
+                                    Command ('seq').setup ('3'),
+                                    Command ('cat').setup (_out=Capture))
+        with self.assertRaises (ayrton.execute.CommandNotFound):
+            p ()
+
+        # all of them were reaped anyway
+        self.assertEqual ([ command._exit_code for command in p.commands ],
+                          [ 127, 0, 0 ])
+        self.assertEqual (p.exit_code (), 0)
+        self.assertEqual (len (p.usages ()), 3)
+
     def foo (self):
         # ssh always opens the tty for reading the passphrase, so I'm not sure
         # we can trick it to read it from us
@@ -297,6 +376,309 @@ exit (lines_read)''')
 
         self.assertEqual (ans, 1)
 
+def fake_posix_spawn (calls, fail=False):
+    """os.posix_spawn() only exists since python 3.8; this one does what it
+    does with fork() and exec(), so Command.spawn() can be tested anyway."""
+    def posix_spawn (path, argv, env, file_actions=(), setsigdef=()):
+        calls.append ((path, list (argv), list (file_actions), tuple (setsigdef)))
+        if fail:
+            raise OSError ('posix_spawn() failed')
+
+        pid= os.fork ()
+        if pid==0:
+            try:
+                for action, fd, new_fd in file_actions:
+                    os.dup2 (fd, new_fd)
+                for sig in setsigdef:
+                    signal.signal (sig, signal.SIG_DFL)
+                os.execve (path, argv, env)
+            finally:
+                os._exit (127)
+
+        return pid
+
+    return posix_spawn
+
+class Launch (unittest.TestCase):
+    def tearDown (self):
+        ayrton.execute.use_posix_spawn= hasattr (os, 'posix_spawn')
+
+    def spawn (self, fail=False):
+        calls= []
+        patches= [ patch.object (ayrton.execute, 'use_posix_spawn', True),
+                   patch.object (os, 'posix_spawn', fake_posix_spawn (calls, fail),
+                                 create=True),
+                   patch.object (os, 'POSIX_SPAWN_DUP2', 2, create=True) ]
+        for p in patches:
+            p.start ()
+            self.addCleanup (p.stop)
+
+        return calls
+
+    def testSpawn (self):
+        calls= self.spawn ()
+        a= echo ('spawned', _out=Capture)
+
+        self.assertEqual (str (a), 'spawned\n')
+        self.assertEqual (len (calls), 1)
+        path, argv, file_actions, setsigdef= calls[0]
+        # posix_spawn() does not search the PATH
+        self.assertTrue (os.path.isabs (path))
+        self.assertEqual (argv[1:], [ 'spawned' ])
+        # only stdout is redirected
+        self.assertEqual ([ fd for action, target, fd in file_actions ], [ 1 ])
+        self.assertEqual (setsigdef, (signal.SIGPIPE, signal.SIGINT))
+
+    def testSpawnRedirections (self):
+        calls= self.spawn ()
+        a= cat (_in='ayrton/tests/data/string_stdin.txt', _out=Capture, _err=Capture)
+
+        self.assertEqual (str (a), 'stdin_from_file!\n')
+        path, argv, file_actions, setsigdef= calls[0]
+        self.assertEqual ([ fd for action, target, fd in file_actions ], [ 0, 1, 2 ])
+        # stderr goes where stdout goes
+        self.assertEqual (file_actions[2][1], 1)
+
+    def testSpawnFails (self):
+        calls= self.spawn (fail=True)
+        a= echo ('forked', _out=Capture)
+
+        # it was tried, but the Command was launched with fork()
+        self.assertEqual (len (calls), 1)
+        self.assertEqual (str (a), 'forked\n')
+
+    def testFork (self):
+        ayrton.execute.use_posix_spawn= False
+        a= echo ('forked', _out=Capture)
+        self.assertEqual (str (a), 'forked\n')
+
+    def testFileNotFound (self):
+        # the child fails to open the file, whichever way it's launched
+        a= cat (_in='ayrton/tests/data/does_not_exist.txt', _fails=True)
+        self.assertEqual (a.exit_code (), 1)
+
+class CommandHash (unittest.TestCase):
+    def setUp (self):
+        self.old_path= os.environ['PATH']
+        self.addCleanup (os.environ.__setitem__, 'PATH', self.old_path)
+
+        self.dirs= []
+        for i in range (2):
+            d= tempfile.TemporaryDirectory ()
+            self.addCleanup (d.cleanup)
+
+            exe= os.path.join (d.name, 'command_hash_test')
+            with open (exe, 'w') as f:
+                f.write ('#! /bin/sh\n')
+            os.chmod (exe, 0o755)
+
+            self.dirs.append (d.name)
+
+    def testHash (self):
+        os.environ['PATH']= self.dirs[0]
+        exe= os.path.join (self.dirs[0], 'command_hash_test')
+        self.assertEqual (Command ('command_hash_test').exe, exe)
+
+        # it's not searched again
+        os.unlink (exe)
+        self.assertEqual (Command ('command_hash_test').exe, exe)
+
+        rehash ()
+        self.assertEqual (Command ('command_hash_test').exe, None)
+
+    def testPathChanged (self):
+        for d in self.dirs:
+            os.environ['PATH']= d
+            self.assertEqual (Command ('command_hash_test').exe,
+                              os.path.join (d, 'command_hash_test'))
+
+class Parallel (unittest.TestCase):
+    # Command () returns the same Command, so we need new ones for each job
+
+    def testExitCodes (self):
+        with parallel (2) as p:
+            Command ('true') ()
+            Command ('false') (_fails=True)
+            Command ('true') ()
+
+        self.assertEqual (p.exit_codes, [ 0, 1, 0 ])
+
+    def testConcurrent (self):
+        start= time.monotonic ()
+        with parallel (4):
+            for i in range (4):
+                Command ('sleep') ('0.5')
+
+        # in sequence it would take 2s
+        self.assertLess (time.monotonic ()-start, 1.5)
+
+    def testLimit (self):
+        start= time.monotonic ()
+        with parallel (1):
+            for i in range (3):
+                Command ('sleep') ('0.2')
+
+        self.assertGreaterEqual (time.monotonic ()-start, 0.6)
+
+    def testCapture (self):
+        # more than what fits in the pipe
+        with parallel (2):
+            a= Command ('seq') ('100000', _out=Capture)
+            b= Command ('seq') ('10', _out=Capture)
+
+        self.assertEqual (len (a.readlines ()), 100000)
+        self.assertEqual (b.readlines ()[-1], '10\n')
+
+    def testCaptureInBody (self):
+        with parallel (2):
+            a= Command ('seq') ('100000', _out=Capture)
+            # waits for it while it's being read
+            lines= a.readlines ()
+            self.assertEqual (len (lines), 100000)
+            self.assertEqual (str (a), ''.join (lines))
+
+    def testCommandNotFound (self):
+        # found, but it can't be executed
+        fd, script= tempfile.mkstemp (suffix='.sh')
+        self.addCleanup (os.unlink, script)
+        os.write (fd, b'#! /does/not/exist\n')
+        os.close (fd)
+        os.chmod (script, 0o755)
+
+        with self.assertRaises (ayrton.execute.CommandNotFound):
+            with parallel (4) as p:
+                Command (script) ()
+                Command ('sleep') ('0.2')
+
+        # the rest are waited for anyway
+        self.assertEqual (p.exit_codes, [ 127, 0 ])
+
+    def testPipeline (self):
+        with parallel (2) as p:
+            a= ayrton.execute.Pipeline (Command ('seq').setup ('100000'),
+                                        Command ('wc').setup ('-l'))(_out=Capture)
+
+        self.assertEqual (str (a), '100000\n')
+        self.assertEqual (p.exit_codes, [ 0 ])
+
+    def testErrexit (self):
+        with self.assertRaises (ayrton.execute.CommandFailed):
+            with parallel (2) as p:
+                Command ('false') ()
+                Command ('true') ()
+
+        # all of them are waited for
+        self.assertEqual (p.exit_codes, [ 1, 0 ])
+        self.assertIsNone (ayrton.runner.parallel)
+
+    def testScript (self):
+        ans= ayrton.main ('''with parallel (2) as p:
+    true ()
+    false (_fails=True)
+
+exit (p.exit_codes)''')
+
+        self.assertEqual (ans, [ 0, 1 ])
+
+class Reaper (unittest.TestCase):
+    def testWaitAny (self):
+        slow= Command ('sleep') ('1', _bg=True)
+        fast= Command ('true') (_bg=True)
+        self.addCleanup (slow.wait)
+
+        start= time.monotonic ()
+        self.assertEqual (ayrton.execute.reaper.wait_any ([ slow, fast ]), [ fast ])
+        self.assertLess (time.monotonic ()-start, 0.9)
+        self.assertEqual (fast.exit_code (), 0)
+
+    def testWaitAnyOtherChildFinished (self):
+        other= Command ('true') (_bg=True)
+        # let it become a zombie
+        time.sleep (0.1)
+
+        slow= Command ('sleep') ('1', _bg=True)
+        fast= Command ('sleep') ('0.1', _bg=True)
+        self.addCleanup (slow.wait)
+
+        start= time.monotonic ()
+        self.assertEqual (ayrton.execute.reaper.wait_any ([ slow, fast ]), [ fast ])
+        self.assertLess (time.monotonic ()-start, 0.9)
+        self.assertEqual (other.exit_code (), 0)
+
+    def testWaitAnyForeignChildFinished (self):
+        other= subprocess.Popen ([ 'false' ])
+        # let it become a zombie
+        time.sleep (0.1)
+
+        slow= Command ('sleep') ('1', _bg=True)
+        fast= Command ('sleep') ('0.1', _bg=True)
+        self.addCleanup (slow.wait)
+
+        start= time.monotonic ()
+        self.assertEqual (ayrton.execute.reaper.wait_any ([ slow, fast ]), [ fast ])
+        self.assertLess (time.monotonic ()-start, 0.9)
+        self.assertEqual (other.wait (), 1)
+        self.assertNotIn (other.pid, ayrton.execute.reaper.statuses)
+
+    def testParallelForeignChildFinished (self):
+        other= subprocess.Popen ([ 'false' ])
+        time.sleep (0.1)
+
+        with parallel (1):
+            Command ('sleep') ('0.2')
+            Command ('sleep') ('0.2')
+
+        self.assertEqual (other.wait (), 1)
+
+    def testWaitAll (self):
+        slow= Command ('sleep') ('0.3', _bg=True)
+        failed= Command ('false') (_bg=True, _fails=True)
+        pipeline= ayrton.execute.Pipeline (Command ('sleep').setup ('0.1'),
+                                           Command ('true').setup ())(_bg=True)
+
+        jobs= list (ayrton.execute.reaper.wait_all ([ slow, failed, pipeline ]))
+        self.assertEqual (jobs, [ failed, pipeline, slow ])
+        self.assertEqual (failed.exit_code (), 1)
+        self.assertEqual (pipeline.exit_codes (), [ 0, 0 ])
+
+class ResourceUsage (unittest.TestCase):
+    def testCommand (self):
+        # burn some CPU in the child
+        c= bash ('-c', 'for i in $(seq 20000); do :; done')
+        usage= c.usage ()
+
+        self.assertGreater (usage.user+usage.system, 0)
+        self.assertGreater (usage.max_rss, 0)
+        self.assertGreater (usage.minor_faults, 0)
+        self.assertGreaterEqual (usage.elapsed, usage.user)
+
+    def testPipeline (self):
+        p= ayrton.execute.Pipeline (Command ('sleep').setup ('0.2'),
+                                    Command ('sleep').setup ('0.2'))()
+        usages= p.usages ()
+        usage= p.usage ()
+
+        self.assertEqual (len (usages), 2)
+        self.assertEqual (usage.user, usages[0].user+usages[1].user)
+        self.assertEqual (usage.max_rss, max (usages[0].max_rss, usages[1].max_rss))
+        # they run at the same time
+        self.assertGreaterEqual (usage.elapsed, 0.2)
+        self.assertLess (usage.elapsed, 0.4)
+
+    def testBackground (self):
+        c= Command ('sleep') ('0.1', _bg=True)
+        time.sleep (0.3)
+
+        # until it's reaped, not until it finished
+        self.assertGreaterEqual (c.usage ().elapsed, 0.3)
+
+    def testScript (self):
+        before= ayrton.runner.usage.minor_faults
+        c= true ()
+
+        self.assertEqual (ayrton.runner.usage.minor_faults,
+                          before+c.usage ().minor_faults)
+
 class HelperFunctions (unittest.TestCase):
     def setUp (self):
         self.c= Command ('/bin/true')
@@ -18,7 +18,14 @@
 import unittest
 from ayrton.parser.pyparser.pyparse import PythonParser, CompileInfo
 from ayrton.parser.astcompiler.astbuilder import ast_from_node
+from ayrton.parser.pyparser import pygram, pytokenizer, error, gengrammar
+import ayrton.parser.pyparser
 import ast
+import io
+import os
+import tempfile
+import types
+import unittest.mock
 from functools import reduce
 import operator
 
@@ -93,3 +100,77 @@ elif False:
     pass
 else:
     pass''')
+
+    def test_file (self):
+        source= b'''if True:
+    x= a.b (c)
+else:
+    pass'''
+        t= self.parser.parse_file (io.BytesIO (source), self.info)
+        ast1= ast_from_node (None, t, self.info)
+        ast2= ast.parse (source)
+        self.assertTrue (self.equal (ast1, ast2),
+                         "\n%s != \n%s" % (ast.dump (ast1), ast.dump (ast2)))
+        self.assertEqual (self.info.encoding, 'utf-8')
+
+    def test_file_error (self):
+        source= io.BytesIO (b'x= 1\n'*1000+b'x= = 1\n')
+        with self.assertRaises (error.SyntaxError) as cm:
+            self.parser.parse_file (source, self.info)
+
+        self.assertEqual (cm.exception.lineno, 1001)
+
+    def test_tree (self):
+        t= self.parser.parse_source (b'x= a.b (c)\n', self.info)
+        # complete nodes have their children in a tuple
+        self.assertIsInstance (t.children, tuple)
+
+        while t.children is not None:
+            t= t.children[0]
+
+        self.assertEqual ((t.type, t.value, t.lineno, t.col_offset),
+                          (pygram.tokens.NAME, 'x', 1, 0))
+
+    def test_lazy_tokens (self):
+        def lines ():
+            yield 'x= 1\n'
+            yield 'y= 2\n'
+            raise AssertionError ('read too much')
+
+        tokens= pytokenizer.generate_tokens (lines (), 0)
+        self.assertEqual (next (tokens)[:2], (pygram.tokens.NAME, 'x'))
+
+
+class Grammar(unittest.TestCase):
+    def testGeneratedTables (self):
+        # if this fails, regenerate grammar_generated.py; see gengrammar.py
+        built= pygram.build_python_grammar ()
+        loaded= pygram.load_python_grammar ()
+
+        for name in pygram.GRAMMAR_ATTRIBUTES:
+            self.assertEqual (getattr (loaded, name), getattr (built, name), name)
+
+    def testBrokenTables (self):
+        # an empty file, or one generated from another grammar, is not used
+        built= pygram.build_python_grammar ()
+        stale= types.ModuleType ('grammar_generated')
+        stale.grammar_digest= 'stale'
+        for name in pygram.GRAMMAR_ATTRIBUTES:
+            setattr (stale, name, None)
+
+        for module in (types.ModuleType ('grammar_generated'), stale):
+            with unittest.mock.patch.object (ayrton.parser.pyparser,
+                                             'grammar_generated', module):
+                loaded= pygram.load_python_grammar ()
+
+            self.assertEqual (loaded.dfas, built.dfas)
+
+    def testGenerate (self):
+        with tempfile.TemporaryDirectory () as dir_name:
+            file_name= os.path.join (dir_name, 'grammar_generated.py')
+            gengrammar.main ([ 'gengrammar.py', file_name ])
+
+            with open (file_name) as f:
+                self.assertIn ('grammar_digest = %r' % pygram.grammar_digest (),
+                               f.read ())
+            self.assertEqual (os.listdir (dir_name), [ 'grammar_generated.py' ])
@@ -17,6 +17,8 @@
 
 import unittest
 import unittest.case
+from unittest.mock import patch
+import importlib
 import sys
 import io
 import os
@@ -24,21 +26,46 @@ import tempfile
 import os.path
 import time
 import signal
-from socket import socket, AF_INET, SOCK_STREAM, SO_REUSEADDR, SOL_SOCKET
+from socket import socket, socketpair, AF_INET, SOCK_STREAM, SO_REUSEADDR, SOL_SOCKET
 from tempfile import mkstemp
+from threading import Thread, Lock
 import traceback
+import errno
+import ast
+import pickle
 import paramiko.ssh_exception
 
 from ayrton.expansion import bash
 import ayrton
 from ayrton.execute import CommandNotFound
-from ayrton.utils import copy_loop, close
+from ayrton.utils import copy_loop, copy_fd, close, writer, write_all
+from ayrton.remote import ConnectionPool, RemoteResult, Worker, remote_many
+from ayrton.remote import Session, StreamSession, WorkerSession
+from ayrton.remote import clean_environment
+from ayrton.worker import run_block, end_of_block
+from ayrton.protocol import Connection, supported_methods, NONE
 
 import logging
 
 logger= logging.getLogger ('ayrton.tests.remote')
 
 
+def fake_splice (calls, error=None):
+    """os.splice() only exists since python 3.10; this one copies through
+    userspace, so the code that uses it can be tested anyway."""
+    def splice (src, dst, count):
+        calls.append ( (src, dst) )
+        if error is not None:
+            raise OSError (error, os.strerror (error))
+
+        data= os.read (src, count)
+        write_all (dst, data)
+
+        return len (data)
+
+    return splice
+
+
 class OtherFunctions (unittest.TestCase):
 
     def test_copy_loop_pipe (self):
@@ -61,6 +88,665 @@ class OtherFunctions (unittest.TestCase):
             self.assertEqual (r.read (), data)
 
 
+    def test_copy_loop_sockets (self):
+        data= b'yabadabadoo'*100000
+        src_w, src_r= socketpair ()
+        dst_w, dst_r= socketpair ()
+        for s in (src_r, dst_w, dst_r):
+            self.addCleanup (close, s)
+
+        def send ():
+            src_w.sendall (data)
+            src_w.close ()
+
+        received= []
+        def recv ():
+            with dst_r.makefile ('rb') as f:
+                received.append (f.read ())
+
+        threads= [ Thread (target=send), Thread (target=recv) ]
+        for t in threads:
+            t.start ()
+
+        copy_loop ({ src_r: dst_w })
+        dst_w.close ()
+        for t in threads:
+            t.join ()
+
+        self.assertEqual (received[0], data)
+
+
+    def test_writer_partial (self):
+        class Partial (io.RawIOBase):
+            def __init__ (self):
+                self.data= b''
+
+            def write (self, data):
+                # at most 3 bytes at a time
+                self.data+= bytes (data[:3])
+                return len (data[:3])
+
+        f= Partial ()
+        writer (f) (memoryview (b'yabadabadoo'))
+
+        self.assertEqual (f.data, b'yabadabadoo')
+
+
+    def test_copy_fd (self):
+        data= b'yabadabadoo'*10000
+
+        w, src= mkstemp (suffix='.ayrtmp', dir='.')
+        self.addCleanup (os.unlink, src)
+        os.write (w, data)
+        os.close (w)
+
+        r, w= os.pipe ()
+        self.addCleanup (close, r)
+
+        w2, dst= mkstemp (suffix='.ayrtmp', dir='.')
+        self.addCleanup (os.unlink, dst)
+
+        # file -> pipe, in a thread because the pipe is smaller than data
+        src_fd= os.open (src, os.O_RDONLY)
+        self.addCleanup (close, src_fd)
+        t= Thread (target=lambda: (copy_fd (src_fd, w), os.close (w)))
+        t.start ()
+
+        # pipe -> file
+        self.assertEqual (copy_fd (r, w2), len (data))
+        t.join ()
+        os.close (w2)
+
+        with open (dst, 'rb') as f:
+            self.assertEqual (f.read (), data)
+
+
+    def splice (self, error=None):
+        calls= []
+        p= patch.object (os, 'splice', fake_splice (calls, error), create=True)
+        p.start ()
+        self.addCleanup (p.stop)
+
+        return calls
+
+
+    def test_copy_loop_splice (self):
+        calls= self.splice ()
+        self.test_copy_loop_pipe ()
+        self.assertGreater (len (calls), 0)
+
+        # through a pipe
+        del calls[:]
+        self.test_copy_loop_sockets ()
+        self.assertGreater (len (calls), 0)
+
+
+    def test_copy_loop_splice_fails (self):
+        calls= self.splice (errno.EINVAL)
+        self.test_copy_loop_pipe ()
+        # tried once, and then copied by hand
+        self.assertEqual (len (calls), 1)
+
+
+    def test_copy_fd_splice (self):
+        calls= self.splice ()
+        self.test_copy_fd ()
+        self.assertGreater (len (calls), 0)
+
+
+    def test_copy_fd_splice_fails (self):
+        for error in (errno.EINVAL, errno.ENOSYS):
+            calls= self.splice (error)
+            self.test_copy_fd ()
+            # once per copy_fd()
+            self.assertEqual (len (calls), 2)
+
+
+    def testCleanEnvironment (self):
+        env= dict (foo=1, bar=2, os=os, stdout=None)
+
+        self.assertEqual (clean_environment (env), dict (foo=1, bar=2))
+        self.assertEqual (clean_environment (env, ('foo', 'os', 'baz')), dict (foo=1))
+
+
+class FakeWorkerChannel:
+    """The session of a remote worker that dies before connecting back."""
+    def __init__ (self):
+        self.closed= False
+        self.accepts= 0
+        self.stderr= b'sh: 1: exec: python3.6: not found\n'
+
+    def exec_command (self, command):
+        pass
+
+    def exit_status_ready (self):
+        # it dies while we wait for it
+        return self.accepts>0
+
+    def recv_exit_status (self):
+        return 127
+
+    def recv_stderr_ready (self):
+        return len (self.stderr)>0
+
+    def recv_stderr (self, size):
+        data, self.stderr= self.stderr[:size], self.stderr[size:]
+        return data
+
+    def recv_ready (self):
+        return False
+
+    def close (self):
+        self.closed= True
+
+
+class FakeTransport:
+    def __init__ (self):
+        self.active= True
+        self.channel= None
+
+    def is_active (self):
+        return self.active
+
+    def request_port_forward (self, address, port):
+        pass
+
+    def cancel_port_forward (self, address, port):
+        pass
+
+    def open_session (self):
+        self.channel= FakeWorkerChannel ()
+        return self.channel
+
+    def accept (self, timeout=None):
+        # like paramiko's, nothing wakes it up when the worker dies
+        if timeout is None:
+            raise AssertionError ('accept() would block forever')
+
+        self.channel.accepts+= 1
+        time.sleep (timeout)
+        return None
+
+
+class FakeClient:
+    def __init__ (self, hostname):
+        self.hostname= hostname
+        self.transport= FakeTransport ()
+
+    def get_transport (self):
+        return self.transport
+
+    def close (self):
+        self.transport.active= False
+
+
+class FakeConnectionPool (ConnectionPool):
+    def connect (self, hostname, args, kwargs):
+        return FakeClient (hostname)
+
+
+class ConnectionPoolTests (unittest.TestCase):
+
+    def setUp (self):
+        self.pool= FakeConnectionPool ()
+
+    def testReuse (self):
+        client= self.pool.get ('foo', (), {})
+        self.pool.release (client)
+
+        self.assertIs (self.pool.get ('foo', (), {}), client)
+
+    def testKey (self):
+        client= self.pool.get ('foo', (), {})
+        self.pool.release (client)
+
+        self.assertIsNot (self.pool.get ('foo', (), dict (username='bar')), client)
+        self.assertIsNot (self.pool.get ('foo', (2222, ), {}), client)
+        # the default port, in any of its forms
+        self.assertIs (self.pool.get ('foo', (22, ), {}), client)
+
+    def testBusy (self):
+        client= self.pool.get ('foo', (), {})
+        # not released yet
+        self.assertIsNot (self.pool.get ('foo', (), {}), client)
+
+    def testClosed (self):
+        client= self.pool.get ('foo', (), {})
+        self.pool.release (client)
+        client.close ()
+
+        self.assertIsNot (self.pool.get ('foo', (), {}), client)
+
+    def testIdleTimeout (self):
+        self.pool.idle_timeout= 0.1
+        client= self.pool.get ('foo', (), {})
+        self.pool.release (client)
+
+        time.sleep (0.2)
+        self.assertIsNot (self.pool.get ('foo', (), {}), client)
+        self.assertFalse (client.get_transport ().is_active ())
+
+    def testMaxConnections (self):
+        self.pool.max_connections= 2
+        clients= [ self.pool.get (hostname, (), {})
+                   for hostname in ('foo', 'bar') ]
+        for client in clients:
+            self.pool.release (client)
+
+        self.pool.get ('baz', (), {})
+        self.assertEqual (self.pool.count (), 2)
+        # the one idle for longest is closed
+        self.assertFalse (clients[0].get_transport ().is_active ())
+        self.assertIs (self.pool.get ('bar', (), {}), clients[1])
+
+
+    def testAllBusy (self):
+        self.pool.max_connections= 2
+        clients= [ self.pool.get (hostname, (), {})
+                   for hostname in ('foo', 'bar') ]
+        got= []
+
+        thread= Thread (target=lambda: got.append (self.pool.get ('baz', (), {})))
+        thread.start ()
+
+        # it waits for one of them to be released
+        thread.join (0.1)
+        self.assertTrue (thread.is_alive ())
+        self.assertEqual (self.pool.count (), 2)
+
+        self.pool.release (clients[0])
+        thread.join (1)
+        self.assertFalse (thread.is_alive ())
+        self.assertEqual (got[0].hostname, 'baz')
+        self.assertEqual (self.pool.count (), 2)
+        self.assertFalse (clients[0].get_transport ().is_active ())
+
+    def testConnectFails (self):
+        self.pool.max_connections= 1
+        with patch.object (self.pool, 'connect', side_effect=OSError ()):
+            self.assertRaises (OSError, self.pool.get, 'foo', (), {})
+
+        # the slot is free again
+        self.assertEqual (self.pool.count (), 0)
+        self.pool.get ('foo', (), {})
+
+
+class WorkerTests (unittest.TestCase):
+
+    def connect (self, compression=True):
+        a, b= socketpair ()
+        self.addCleanup (close, b)
+
+        sender= Connection (a, compression)
+        receiver= Connection (b)
+
+        # both ends send their methods before receiving the other's
+        handshake= Thread (target=sender.handshake)
+        handshake.start ()
+        receiver.handshake ()
+        handshake.join ()
+
+        return sender, receiver
+
+    def testMessages (self):
+        data= b'yabadabadoo'*100000
+        sender, receiver= self.connect ()
+        self.assertEqual (sender.method, supported_methods ()[0])
+
+        def send ():
+            sender.send (data)
+            sender.send (b'')
+            sender.sock.close ()
+
+        thread= Thread (target=send)
+        thread.start ()
+
+        self.assertEqual (receiver.recv (), data)
+        self.assertEqual (receiver.recv (), b'')
+        # closed
+        self.assertEqual (receiver.recv (), None)
+        thread.join ()
+
+    def testNoCompression (self):
+        data= b'yabadabadoo'*100000
+        sender, receiver= self.connect (compression=False)
+        self.assertEqual (sender.method, NONE)
+        self.assertEqual (receiver.method, NONE)
+
+        thread= Thread (target=sender.send, args=(data, ))
+        thread.start ()
+
+        self.assertEqual (receiver.recv (), data)
+        thread.join ()
+        sender.sock.close ()
+
+    def testClosedInTheMiddle (self):
+        sender, receiver= self.connect ()
+
+        # a header promising more than what's sent
+        sender.sock.sendall (b'\x00'+(100).to_bytes (8, 'big')+b'foo')
+        sender.sock.close ()
+
+        self.assertRaises (ConnectionError, receiver.recv)
+
+    def testNoParamiko (self):
+        # they're imported in the remote, which might not have it installed
+        with patch.dict (sys.modules, paramiko=None), \
+             patch.object (ayrton, 'protocol', ayrton.protocol), \
+             patch.object (ayrton, 'worker', ayrton.worker):
+            for name in ('ayrton.protocol', 'ayrton.worker'):
+                del sys.modules[name]
+                # importing paramiko raises ImportError now
+                importlib.import_module (name)
+
+    def testNeverConnectsBack (self):
+        client= FakeClient ('foo')
+
+        with patch.object (Worker, 'accept_timeout', 0.01), \
+             self.assertRaises (ConnectionError) as cm:
+            Worker (client, 4227, '', pty=False)
+
+        self.assertIn ('exit status 127', str (cm.exception))
+        self.assertIn ('python3.6: not found', str (cm.exception))
+        self.assertTrue (client.get_transport ().channel.closed)
+
+    def testRunBlock (self):
+        tree= ast.parse ('y= x+1')
+        data= run_block (pickle.dumps (tree), pickle.dumps ({}),
+                         pickle.dumps (dict (x=41)))
+
+        l, result, e= pickle.loads (data)
+        self.assertEqual (l['y'], 42)
+        self.assertEqual (e, None)
+        # only what the block assigned is sent back
+        self.assertNotIn ('x', l)
+
+
+class FakeRemoteMany (remote_many):
+    def __init__ (self, *args, **kwargs):
+        super ().__init__ (*args, **kwargs)
+        self.running= 0
+        self.max_running= 0
+
+    def run (self, hostname):
+        self.running+= 1
+        self.max_running= max (self.running, self.max_running)
+        time.sleep (0.1)
+        self.running-= 1
+
+        if hostname=='bad':
+            return RemoteResult (hostname, exception=ValueError ())
+        elif hostname=='broken':
+            # like a truncated message from the worker
+            raise EOFError ()
+        else:
+            return RemoteResult (hostname, dict (host=hostname), hostname.upper ())
+
+
+def run_many (*args, **kwargs):
+    # the caller's locals are sent to the remotes, and the TestCase's are not
+    # picklable
+    with FakeRemoteMany (*args, **kwargs) as r:
+        pass
+
+    return r
+
+
+class FakeWorker:
+    def __init__ (self, client):
+        self.hostname= client.hostname
+        self.channel= None
+
+    def send (self, ast, global_env, local_env, stub=None):
+        pass
+
+    def receive (self):
+        return pickle.dumps ( (dict (host=self.hostname), self.hostname.upper (),
+                               None) )
+
+
+class FakeWorkerPool (FakeConnectionPool):
+    def worker (self, client, backchannel_port, precommand, pty=True):
+        if client.hostname=='dead':
+            # a real one, which never connects back
+            return super ().worker (client, backchannel_port, precommand, pty)
+        else:
+            return FakeWorker (client)
+
+
+def run_many_workers (*args, **kwargs):
+    # like run_many(), with remote_many's own run()
+    with remote_many (*args, **kwargs) as r:
+        pass
+
+    return r
+
+
+class RemoteManyTests (unittest.TestCase):
+
+    def setUp (self):
+        ayrton.runner= ayrton.Ayrton ()
+        # normally set when running a script
+        ayrton.runner.globals['argv']= [ 'test' ]
+        self.ast= pickle.dumps (ast.parse ('pass'))
+
+    def testConcurrency (self):
+        hosts= [ 'foo%d' % i for i in range (6) ]
+
+        r= run_many (self.ast, hosts+[ 'foo0' ], concurrency=2)
+
+        self.assertEqual (r.max_running, 2)
+        # each one once, in order
+        self.assertEqual (list (r.results.keys ()), hosts)
+        self.assertEqual (r.results['foo3'].result, 'FOO3')
+        self.assertEqual (r.results['foo3'].locals, dict (host='foo3'))
+        self.assertEqual (r.failed, [])
+
+    def testDefaultConcurrency (self):
+        hosts= [ 'foo%d' % i for i in range (10) ]
+
+        r= run_many (self.ast, hosts)
+
+        # the connections the pool keeps open
+        self.assertEqual (r.max_running, 8)
+
+        r= run_many (self.ast, hosts, concurrency=20)
+        self.assertEqual (r.max_running, 8)
+
+    def testFailed (self):
+        r= run_many (self.ast, [ 'foo', 'bad', 'bar' ])
+
+        self.assertEqual (r.failed, [ 'bad' ])
+        self.assertIsInstance (r.results['bad'].exception, ValueError)
+        self.assertEqual (r.results['bar'].result, 'BAR')
+
+    def testRunRaises (self):
+        # the only thread goes on with the rest of the hosts
+        r= run_many (self.ast, [ 'broken', 'foo', 'bar' ], concurrency=1)
+
+        self.assertEqual (r.failed, [ 'broken' ])
+        self.assertIsInstance (r.results['broken'].exception, EOFError)
+        self.assertEqual (r.results['bar'].result, 'BAR')
+
+    def testNeverConnectsBack (self):
+        pool= FakeWorkerPool ()
+        with patch.object (ayrton.remote, 'connection_pool', lambda: pool), \
+             patch.object (Worker, 'accept_timeout', 0.01):
+            r= run_many_workers (self.ast, [ 'foo', 'dead', 'bar' ])
+
+        self.assertEqual (r.failed, [ 'dead' ])
+        self.assertIsInstance (r.results['dead'].exception, ConnectionError)
+        self.assertEqual (r.results['foo'].result, 'FOO')
+        self.assertEqual (r.results['bar'].locals, dict (host='bar'))
+
+    def testNoSlots (self):
+        self.assertRaises (ValueError, remote_many, self.ast, [ 'foo' ], concurrency=0)
+
+
+class FakeChannel:
+    """Like paramiko's Channel, its fileno() is readable while there's
+    something to read from stdout or stderr, or after the EOF."""
+    def __init__ (self):
+        self.out= b''
+        self.err= b''
+        self.lock= Lock ()
+        self.r, self.w= os.pipe ()
+        os.set_blocking (self.r, False)
+        self.closed= False
+        self.eof_received= False
+        self.sent= b''
+        self.write_shut= False
+
+    def fileno (self):
+        return self.r
+
+    def feed (self, out=b'', err=b'', eof=False):
+        with self.lock:
+            self.out+= out
+            self.err+= err
+            self.eof_received= self.eof_received or eof
+
+        os.write (self.w, b'.')
+
+    def drain (self):
+        if len (self.out)==0 and len (self.err)==0 and not self.eof_received:
+            try:
+                os.read (self.r, 1024)
+            except BlockingIOError:
+                pass
+
+    def recv_ready (self):
+        return len (self.out)>0
+
+    def recv_stderr_ready (self):
+        return len (self.err)>0
+
+    def recv (self, size):
+        with self.lock:
+            data, self.out= self.out[:size], self.out[size:]
+            self.drain ()
+
+        return data
+
+    def recv_stderr (self, size):
+        with self.lock:
+            data, self.err= self.err[:size], self.err[size:]
+            self.drain ()
+
+        return data
+
+    def sendall (self, data):
+        self.sent+= data
+
+    def shutdown_write (self):
+        self.write_shut= True
+
+    def close (self):
+        for fd in (self.r, self.w):
+            close (fd)
+
+
+class SessionTests (unittest.TestCase):
+
+    def setUp (self):
+        self.channel= FakeChannel ()
+        self.addCleanup (self.channel.close)
+
+        self.outputs= []
+        for i in range (2):
+            r, w= os.pipe ()
+            self.addCleanup (close, r)
+            self.addCleanup (close, w)
+            self.outputs.append ( (r, w) )
+
+    def read (self, i):
+        return os.read (self.outputs[i][0], 1024)
+
+    def testStreamSession (self):
+        r, w= os.pipe ()
+        os.write (w, b'baz')
+        os.close (w)
+
+        session= StreamSession (self.channel, r, self.outputs[0][1],
+                                self.outputs[1][1])
+        session.start ()
+        self.channel.feed (out=b'foo', err=b'bar')
+
+        # all the input was sent
+        while not self.channel.write_shut:
+            time.sleep (0.01)
+
+        self.channel.feed (eof=True)
+        session.join ()
+
+        self.assertEqual (self.channel.sent, b'baz')
+        self.assertEqual (self.read (0), b'foo')
+        self.assertEqual (self.read (1), b'bar')
+
+    def testStreamSessionFile (self):
+        for data, file_name in ((b'baz', None), (b'', os.devnull)):
+            if file_name is None:
+                # a regular file
+                fd, file_name= mkstemp ()
+                self.addCleanup (os.unlink, file_name)
+                os.write (fd, data)
+                os.close (fd)
+
+            channel= FakeChannel ()
+            self.addCleanup (channel.close)
+
+            session= StreamSession (channel, os.open (file_name, os.O_RDONLY),
+                                    self.outputs[0][1], self.outputs[1][1])
+            session.start ()
+
+            for i in range (500):
+                if channel.write_shut:
+                    break
+                time.sleep (0.01)
+
+            channel.feed (eof=True)
+            self.assertTrue (session.finished.wait (5))
+            self.assertEqual (channel.sent, data)
+
+    def testSessionFails (self):
+        class BrokenSession (Session):
+            def fileobjs (self):
+                # the selector does not accept it
+                return [ -1 ]
+
+        session= BrokenSession ()
+        session.start ()
+        self.assertTrue (session.finished.wait (5))
+
+        # the other Sessions still work
+        self.testStreamSession ()
+
+    def testWorkerSession (self):
+        session= WorkerSession (self.channel, 'foo', True, self.outputs[0][1],
+                                self.outputs[1][1])
+        session.start ()
+
+        # lines and the marker split between writes
+        for out in (b'bar\nba', b'z\nqu', b'ux'+end_of_block[:5]):
+            self.channel.feed (out=out)
+            time.sleep (0.05)
+
+        self.channel.feed (out=end_of_block[5:], err=b'error\n'+end_of_block)
+        session.join ()
+
+        self.assertEqual (self.read (0), b'foo: bar\nfoo: baz\nfoo: quux\n')
+        self.assertEqual (self.read (1), b'foo: error\n')
+
+    def testWorkerSessionClosed (self):
+        session= WorkerSession (self.channel, stdout=self.outputs[0][1])
+        session.start ()
+
+        self.channel.feed (out=b'foo', eof=True)
+        session.join ()
+
+        self.assertEqual (self.read (0), b'foo')
+
+
 class RemoteTests (unittest.TestCase):
 
     def setUp (self):
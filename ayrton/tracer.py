@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+# bin/ayrton -x: prints the script's statements as they're executed, like
+# bash's set -x. instead of sys.settrace(), which slows down every line of
+# every function called, even the ones in other modules, CrazyASTTransformer
+# puts a call to ayrton_trace (lineno) before each of the script's statements,
+# see ayrton.castt.add_trace_calls(), and the Ayrton instance makes it call a
+# Tracer.
+#
+# the line numbers are only kept until the buffer is full, the script finishes,
+# a Command is launched or the script writes to sys.stdout or sys.stderr (see
+# TracedStream), so the trace still comes before the output.
+
+import sys
+
+
+class Tracer:
+    def __init__ (self, lines, linenos=False, output=None, buffer_size=256):
+        """lines are the script's source lines. output is sys.stderr by
+        default."""
+        self.lines= lines
+        self.linenos= linenos
+        self.output= output
+        self.buffer_size= buffer_size
+        self.buffer= []
+        # lineno: its line in the trace
+        self.formatted= {}
+
+
+    def __call__ (self, lineno):
+        self.buffer.append (lineno)
+        if len (self.buffer)>=self.buffer_size:
+            self.flush ()
+
+
+    def format (self, lineno):
+        try:
+            # line numbers start at 1
+            line= self.lines[lineno-1].rstrip ()
+        except IndexError:
+            line= ''
+
+        if self.linenos:
+            text= '+ [%6d] %s\n' % (lineno, line)
+        else:
+            text= '+ %s\n' % line
+
+        # loops trace the same lines over and over
+        self.formatted[lineno]= text
+
+        return text
+
+
+    def flush (self):
+        if len (self.buffer)==0:
+            return
+
+        formatted= self.formatted
+        text= ''.join ([ formatted[lineno] if lineno in formatted else self.format (lineno)
+                         for lineno in self.buffer ])
+        self.buffer= []
+
+        output= self.output
+        if output is None:
+            output= sys.stderr
+
+        # what the script wrote before comes first
+        if sys.stdout is not None and sys.stdout is not output:
+            sys.stdout.flush ()
+
+        output.write (text)
+        output.flush ()
+
+
+class TracedStream:
+    """Replaces sys.stdout and sys.stderr while tracing, so the trace is
+    written before what the script writes with them."""
+    def __init__ (self, stream, tracer):
+        self.stream= stream
+        self.tracer= tracer
+
+
+    def write (self, text):
+        self.tracer.flush ()
+        return self.stream.write (text)
+
+
+    def writelines (self, lines):
+        self.tracer.flush ()
+        return self.stream.writelines (lines)
+
+
+    def __getattr__ (self, name):
+        return getattr (self.stream, name)
@@ -20,51 +20,20 @@
 import functools
 from selectors import DefaultSelector, EVENT_READ
 import os
-from socket import socket
+import io
+import socket
 import itertools
 import errno
-import paramiko.channel
+import stat
 import traceback
 
 import logging
 # I hope this is not toot late...
+# it also adds debug2() and debug3()
 import ayrton.logger
 logger= logging.getLogger ('ayrton.utils')
 
 
-# TODO: there's probably a better way to do this
-# TODO: move to logger
-def debug2 (self, msg, *args, **kwargs):  # pragma: no cover
-    if self.manager.disable>=logging.DEBUG2:
-        return
-
-    if logging.DEBUG2>=self.getEffectiveLevel ():
-        self._log (logging.DEBUG2, msg, args, **kwargs)
-
-
-def debug3 (self, msg, *args, **kwargs):  # pragma: no cover
-    if self.manager.disable>=logging.DEBUG3:
-        return
-
-    if logging.DEBUG3>=self.getEffectiveLevel ():
-        self._log (logging.DEBUG3, msg, args, **kwargs)
-
-
-def patch_logging ():
-    # based on https://mail.python.org/pipermail/tutor/2007-August/056243.html
-    logging.DEBUG2= 9
-    logging.DEBUG3= 8
-
-    logging.addLevelName (logging.DEBUG2, 'DEBUG2')
-    logging.addLevelName (logging.DEBUG3, 'DEBUG3')
-
-    logging.Logger.debug2= debug2
-    logging.Logger.debug3= debug3
-
-
-patch_logging ()
-
-
 def any_comparator (a, b):  # pragma: no cover
     try:
         if a==b:
@@ -99,25 +68,158 @@ def dump_dict (d, level=1):  # pragma: no cover
         return 'None'
 
 
-def read (src, buf_len):
+# sockets and paramiko's Channels are recognized by their recv()/send() methods
+# so paramiko does not have to be imported unless remote() is used
+
+def reader (src):
+    """Returns a function that reads from src into the memoryview it's given
+    and returns the part of it that was filled, which is empty at EOF. That
+    way the type of src is checked only once."""
     if isinstance (src, int):
-        return os.read (src, buf_len)
-    elif isinstance (src, (socket, paramiko.channel.Channel)):
-        return src.recv (buf_len)
+        def read (view):
+            return view[:os.readv (src, [ view ])]
+    elif hasattr (src, 'recv_into'):
+        def read (view):
+            return view[:src.recv_into (view)]
+    elif hasattr (src, 'recv'):
+        # paramiko's Channels don't have recv_into()
+        def read (view):
+            return memoryview (src.recv (len (view)))
+    elif hasattr (src, 'readinto'):
+        def read (view):
+            # None if it would block, but select() said it wouldn't
+            return view[:src.readinto (view) or 0]
     else:
-        return src.read (buf_len)
+        def read (view):
+            return memoryview (src.read (len (view)))
+
+    return read
 
 
-def write (dst, data):
+def writer (dst):
+    """Returns a function that writes all the data it's given in dst, even if
+    dst does it partially."""
     if isinstance (dst, int):
-        return os.write (dst, data)
-    elif isinstance (dst, (socket, paramiko.channel.Channel)):
-        return dst.send (data)
+        return functools.partial (write_all, dst)
+    elif isinstance (dst, socket.socket):
+        return dst.sendall
+    elif hasattr (dst, 'sendall'):
+        # paramiko's Channels don't accept memoryviews
+        def write (data):
+            dst.sendall (bytes (data))
     else:
-        ans= dst.write (data)
-        dst.flush ()
+        # unbuffered files don't need it
+        flush= not isinstance (dst, io.RawIOBase)
+
+        def write (data):
+            while len (data)>0:
+                written= dst.write (data)
+                data= data[written:]
+
+            if flush:
+                dst.flush ()
+
+    return write
+
+
+def real_fd (f):
+    """Returns the fd of f if reading or writing it directly is the same as
+    using f, or None."""
+    if isinstance (f, int):
+        return f
+    elif isinstance (f, (socket.socket, io.FileIO)):
+        # paramiko's Channels' fileno() is not where the data goes
+        return f.fileno ()
+    else:
+        return None
+
+
+def splicer (src, dst, buf_len, pipes):
+    """Returns a function that copies what's available from src to dst with
+    os.splice(), or None if it can't be used. It needs one of them to be a
+    pipe; if both are sockets, the data goes through a pipe that's appended
+    to pipes, so it can be closed later."""
+    if not hasattr (os, 'splice'):
+        return None
+
+    src_fd= real_fd (src)
+    dst_fd= real_fd (dst)
+    if src_fd is None or dst_fd is None:
+        return None
+
+    src_mode= os.fstat (src_fd).st_mode
+    dst_mode= os.fstat (dst_fd).st_mode
+
+    if stat.S_ISFIFO (src_mode) or stat.S_ISFIFO (dst_mode):
+        def splice ():
+            return os.splice (src_fd, dst_fd, buf_len)
+    elif stat.S_ISSOCK (src_mode) and stat.S_ISSOCK (dst_mode):
+        r, w= os.pipe ()
+        pipes.extend ( (r, w) )
+
+        def splice ():
+            copied= os.splice (src_fd, w, buf_len)
+            left= copied
+            while left>0:
+                left-= os.splice (r, dst_fd, left)
+
+            return copied
+    else:
+        return None
+
+    return splice
 
-        return ans
+
+def write_all (dst, data):
+    """Writes all of data in the fd dst, even if os.write() does it partially."""
+    data= memoryview (data)
+    while len (data)>0:
+        written= os.write (dst, data)
+        data= data[written:]
+
+
+def copy_fd (src, dst, buf_len=65536):
+    """Copies everything from the fd src to the fd dst until EOF. It uses
+    os.splice() if one of them is a pipe, os.sendfile() if src is a regular
+    file, so the data does not go through userspace, or readv()/write()
+    otherwise. Returns the amount of bytes copied."""
+    total= 0
+    src_mode= os.fstat (src).st_mode
+    dst_mode= os.fstat (dst).st_mode
+
+    if hasattr (os, 'splice') and (stat.S_ISFIFO (src_mode) or stat.S_ISFIFO (dst_mode)):
+        try:
+            while True:
+                copied= os.splice (src, dst, buf_len)
+                if copied==0:
+                    return total
+                total+= copied
+        except OSError as e:
+            # not all kinds of files support it, like ttys; copy by other means
+            if e.errno not in (errno.EINVAL, errno.ENOSYS) or total>0:
+                raise
+
+    if stat.S_ISREG (src_mode):
+        try:
+            while True:
+                copied= os.sendfile (dst, src, None, buf_len)
+                if copied==0:
+                    return total
+                total+= copied
+        except OSError as e:
+            # not supported for this kind of dst; copy the rest by hand
+            if e.errno not in (errno.EINVAL, errno.ENOSYS) or total>0:
+                raise
+
+    buf= bytearray (buf_len)
+    view= memoryview (buf)
+    while True:
+        copied= os.readv (src, [ buf ])
+        if copied==0:
+            return total
+
+        write_all (dst, view[:copied])
+        total+= copied
 
 
 def close (f):
@@ -134,21 +236,55 @@ def close (f):
             raise
 
 
-def copy_loop (copy_to, finished=None, buf_len=10240):
+def copy_loop (copy_to, finished=None, buf_len=65536):
     """copy_to is a dict(in: out). When any in is ready to read, data is read
     from it and writen in its out. When any in is closed, it's removed from
     copy_to. finished is a pipe; when data comes from the read end, or when
-    no more ins are present, the loop finishes."""
+    no more ins are present, the loop finishes.
+
+    The data is copied with os.splice() when possible (see splicer());
+    otherwise it's read into the same buffer every time."""
     if finished is not None:
         copy_to[finished]= None
 
-    # NOTE:
-    # os.sendfile (self.dst, self.src, None, 0)
-    # OSError: [Errno 22] Invalid argument
-    # and splice() is not available
-    # so, copy by hand
+    buf= bytearray (buf_len)
+    view= memoryview (buf)
+    # the pipes used for splicing sockets
+    pipes= []
+
+    def copier (src, dst):
+        read= reader (src)
+        write= writer (dst)
+
+        def copy ():
+            data= read (view)
+            if len (data)>0:
+                write (data)
+
+            return len (data)
+
+        splice= splicer (src, dst, buf_len, pipes)
+        if splice is None:
+            return copy
+
+        def spliced ():
+            try:
+                return splice ()
+            except OSError as e:
+                # not all kinds of files support it, like ttys
+                if e.errno not in (errno.EINVAL, errno.ENOSYS):
+                    raise
+
+                logger.debug ('cannot splice %s -> %s', src, dst)
+                copiers[src]= copy
+                return copy ()
+
+        logger.debug ('splicing %s -> %s', src, dst)
+        return spliced
+
     selector = DefaultSelector ()
-    for src in copy_to.keys ():
+    copiers= {}
+    for src, dst in copy_to.items ():
         if (     not isinstance (src, int)
                 and (   getattr (src, 'fileno', None) is None
                     or not isinstance (src.fileno(), int)) ):
@@ -161,34 +297,45 @@ def copy_loop (copy_to, finished=None, buf_len=10240):
             except KeyError:
                 pass
 
+            if src!=finished:
+                copiers[src]= copier (src, dst)
+
     def close_file (f):
         if f in copy_to:
             del copy_to[f]
 
         try:
-            selector.unregister (i)
+            selector.unregister (f)
         except KeyError:
             pass
 
         close (f)
 
+    # checked once and not for each chunk
+    debug= logger.isEnabledFor (logging.DEBUG)
+
     while len (copy_to)>0:
-        logger.debug (copy_to)
+        if debug:
+            logger.debug (copy_to)
 
         events= selector.select ()
         for key, _ in events:
-            logger.debug ("%s is ready to read", key)
+            if debug:
+                logger.debug ("%s is ready to read", key)
             i= key.fileobj
 
-            # for error in e:
-            #     logger.debug ('%s error')
-                # TODO: what?
+            if finished is not None and i==finished:
+                logger.debug ('finishing')
+                close_file (i)
+                # quite a hack :)
+                copy_to= {}
 
-            o= copy_to[i]
+                break
 
             try:
-                data= read (i, buf_len)
-                logger.debug2 ('%s -> %s: %s', i, o, data)
+                copied= copiers[i] ()
+                if debug:
+                    logger.debug2 ('%s -> %s: %d bytes', i, copy_to[i], copied)
 
             # ValueError: read of closed file
             except (OSError, ValueError) as e:
@@ -197,18 +344,12 @@ def copy_loop (copy_to, finished=None, buf_len=10240):
                 close_file (i)
                 break
             else:
-                if len (data)==0:
+                if copied==0:
                     logger.debug ('stopping copying for %s, no more data', i)
                     close_file (i)
 
-                    if finished is not None and i==finished:
-                        logger.debug ('finishing')
-                        # quite a hack :)
-                        copy_to= {}
-
-                        break
-                else:
-                    write (o, data)
+    for fd in pipes:
+        close (fd)
 
     selector.close ()
     logger.debug ('over and out')
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+# the remote side of remote() blocks executed with a persistent worker; see
+# ayrton.remote.Worker. it runs the blocks one after the other in the same
+# interpreter, so ayrton is imported only once per connection.
+# this module must not import paramiko; the remote does not need it.
+
+import os
+import sys
+import pickle
+import traceback
+import types
+from socket import socket
+
+import ayrton
+import ayrton.castt
+from ayrton.protocol import Connection
+
+import logging
+logger= logging.getLogger ('ayrton.remote.worker')
+
+# written in stdout after the output of each block, so the local side knows
+# where it ends; see ayrton.remote.WorkerThread
+end_of_block= b'\x00ayrton: end of remote block\x00'
+
+
+def assigned_locals (tree, l):
+    """Only the variables the block could have changed are sent back."""
+    names= ayrton.castt.assigned_names (tree)
+
+    return dict ([ (k, v) for k, v in l.items ()
+                          if k in names and type (v)!=types.ModuleType ])
+
+
+def run_block (ast, g, l):
+    """Runs the pickled ast with the pickled globals and locals and returns
+    the pickled (locals, result, exception)."""
+    ast= pickle.loads (ast)
+    g= pickle.loads (g)
+    l= pickle.loads (l)
+    # don't format them if they're not going to be logged
+    if logger.isEnabledFor (logging.DEBUG):
+        logger.debug ('code to run:\n%s', ayrton.ast_pprinter.pprint (ast))
+    if logger.isEnabledFor (logging.DEBUG2):
+        logger.debug2 ('globals received: %s', ayrton.utils.dump_dict (g))
+        logger.debug2 ('locals received: %s', ayrton.utils.dump_dict (l))
+
+    # set the global runner so functions and Commands work
+    ayrton.runner= ayrton.Ayrton (g, l)
+    caught= None
+    result= None
+
+    try:
+        result= ayrton.runner.run_tree (ast, 'from_remote')
+    except Exception as e:
+        logger.debug ('run raised: %r', e)
+        logger.debug (traceback.format_exc())
+        caught= e
+
+    if logger.isEnabledFor (logging.DEBUG2):
+        logger.debug2 ('runner.locals: %s', ayrton.utils.dump_dict (ayrton.runner.locals))
+    l= assigned_locals (ast, ayrton.runner.locals)
+
+    return pickle.dumps ( (l, result, caught) )
+
+
+def main (backchannel_port, separate_stderr=False):
+    client= socket ()
+    client.connect (('127.0.0.1', backchannel_port))
+    connection= Connection (client)
+    connection.handshake ()
+
+    while True:
+        # ast, globals, locals
+        messages= [ connection.recv () for i in range (3) ]
+        if None in messages:
+            # the connection was closed
+            break
+
+        data= run_block (*messages)
+
+        # the output of the Commands is already there, but not ours
+        sys.stdout.flush ()
+        sys.stderr.flush ()
+        os.write (1, end_of_block)
+        if separate_stderr:
+            # otherwise it's the same pty
+            os.write (2, end_of_block)
+
+        logger.debug ('sending %d bytes', len (data))
+        connection.send (data)
+
+    client.close ()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+# helpers shared by the benchmarks. each benchmark is a script that can be run
+# by itself from the top of the source tree:
+#
+#   $ python3.6 benchmarks/startup.py
+
+import os
+import os.path
+import sys
+import time
+import statistics
+
+top_dir= os.path.dirname (os.path.dirname (os.path.abspath (__file__)))
+ayrton_bin= os.path.join (top_dir, 'bin', 'ayrton')
+
+# benchmark this ayrton, not an installed one
+sys.path.insert (0, top_dir)
+
+
+def environ ():
+    """Returns a copy of os.environ where child processes also find this
+    ayrton first."""
+    env= dict (os.environ)
+    python_path= env.get ('PYTHONPATH')
+    if python_path:
+        env['PYTHONPATH']= top_dir+os.pathsep+python_path
+    else:
+        env['PYTHONPATH']= top_dir
+
+    return env
+
+
+def measure (function, repeat=10):
+    """Runs function() repeat times and returns the wall times, in seconds."""
+    times= []
+    for i in range (repeat):
+        start= time.perf_counter ()
+        function ()
+        times.append (time.perf_counter ()-start)
+
+    return times
+
+
+def report (name, times):
+    print ('%-32s min %8.2fms  median %8.2fms  max %8.2fms' %
+           (name, min (times)*1000, statistics.median (times)*1000,
+            max (times)*1000))
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+# throughput of ayrton.utils.copy_loop() between pipes and socketpairs. the
+# default is 256MiB per run, but the amount of MiB can be given as first
+# argument:
+#
+#   $ python3 benchmarks/copy_loop.py 64
+
+import os
+import sys
+import socket
+from threading import Thread
+
+from common import measure, report
+
+from ayrton.utils import copy_loop, close
+
+
+def pipe ():
+    return os.pipe ()
+
+
+def socketpair ():
+    # (read end, write end), like os.pipe()
+    r, w= socket.socketpair ()
+    return r, w
+
+
+def writer (fd, size, chunk=b'x'*65536):
+    if isinstance (fd, socket.socket):
+        fd= fd.fileno ()
+
+    for i in range (size//len (chunk)):
+        os.write (fd, chunk)
+
+
+def drain (fd):
+    if isinstance (fd, socket.socket):
+        fd= fd.fileno ()
+
+    while len (os.read (fd, 65536))>0:
+        pass
+
+
+def copy (make_src, make_dst, size):
+    src_r, src_w= make_src ()
+    dst_r, dst_w= make_dst ()
+
+    # src_w -> [ copy_loop ] -> dst_r
+    def write ():
+        writer (src_w, size)
+        close (src_w)
+
+    threads= [ Thread (target=write), Thread (target=drain, args=(dst_r, )) ]
+    for thread in threads:
+        thread.start ()
+
+    # closes src_r when it's done
+    copy_loop ({ src_r: dst_w })
+    close (dst_w)
+
+    for thread in threads:
+        thread.join ()
+
+    close (dst_r)
+
+
+def main (mib=256):
+    size= mib*1024*1024
+    if not hasattr (os, 'splice'):
+        print ('os.splice() is not available in this python, using read()/write()')
+
+    for src_name, make_src in (('pipe', pipe), ('socket', socketpair)):
+        for dst_name, make_dst in (('pipe', pipe), ('socket', socketpair)):
+            times= measure (lambda: copy (make_src, make_dst, size), 5)
+            report ('%s -> %s, %dMiB' % (src_name, dst_name, mib), times)
+            print ('%32s %8.2fMiB/s' % ('', mib/min (times)))
+
+
+if __name__=='__main__':
+    main (*[ int (arg) for arg in sys.argv[1:2] ])
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+# what the debug logging costs when it's disabled, which is the normal case:
+# the processing of a Command's arguments and options, the transformation of
+# a script with lots of Commands, and the disabled log calls themselves. the
+# default is 10000 of each, but the amount can be given as first argument:
+#
+#   $ python3 benchmarks/logging_overhead.py 1000
+
+import ast
+import logging
+import sys
+
+from common import measure, report
+
+import ayrton
+from ayrton.execute import Command
+from ayrton.castt import CrazyASTTransformer
+
+logger= logging.getLogger ('ayrton.benchmarks')
+
+
+def log_calls (count):
+    for i in range (count):
+        logger.debug ('%s', i)
+        logger.debug2 ('%s', i)
+
+
+def main (count=10000):
+    ayrton.runner= ayrton.Ayrton ()
+
+    ls= Command ('ls')
+    args= [ '-l', '--color', 'foo', 'bar', [ 'baz', 'quux' ] ]
+    options= dict (sort='time', width=80, _out=None, _err=None)
+
+    def setup ():
+        for i in range (count):
+            ls.setup (*args, **options)
+
+    report ('%d x Command.setup()' % count, measure (setup, 10))
+
+    # one line per Command
+    source= '\n'.join ([ "ls ('-l', foo.bar, color=True)\ngit.commit (m='foo')" ]*(count//10))
+
+    def transform ():
+        # the tree is modified in place
+        CrazyASTTransformer (ayrton.runner.globals).modify (ast.parse (source))
+
+    report ('%d lines transformed' % (count//5), measure (transform, 10))
+
+    report ('%d x debug() and debug2()' % count, measure (lambda: log_calls (count), 10))
+
+
+if __name__=='__main__':
+    main (*[ int (arg) for arg in sys.argv[1:2] ])
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+# time and memory needed by the parser to build the concrete syntax tree of
+# big scripts. by default the corpus is ayrton's own source and test scripts,
+# but the files can be given as arguments:
+#
+#   $ python3 benchmarks/parser.py script1.ay script2.ay
+
+import glob
+import os.path
+import sys
+import tracemalloc
+
+from common import measure, report, top_dir
+
+from ayrton.parser.pyparser.pyparse import PythonParser, CompileInfo
+from ayrton.parser.pyparser.error import SyntaxError
+
+
+def corpus ():
+    return ( glob.glob (os.path.join (top_dir, 'ayrton', '**', '*.py'), recursive=True)+
+             glob.glob (os.path.join (top_dir, 'ayrton', 'tests', 'scripts', '*.ay')) )
+
+
+def parse (sources):
+    parser= PythonParser (None)
+    trees= []
+    for file_name, source in sources:
+        info= CompileInfo (file_name, 'exec')
+        trees.append (parser.parse_source (source, info))
+
+    return trees
+
+
+def main (file_names):
+    sources= []
+    for file_name in file_names:
+        with open (file_name, 'rb') as f:
+            source= f.read ()
+
+        try:
+            parse ([ (file_name, source) ])
+        except SyntaxError:
+            # the parser does not support all the syntax of the python
+            # running it
+            print ('skipping %s' % file_name)
+        else:
+            sources.append ((file_name, source))
+
+    size= sum ([ len (source) for file_name, source in sources ])
+    name= '%d files, %dKiB' % (len (sources), size//1024)
+
+    times= measure (lambda: parse (sources), 10)
+    report (name, times)
+
+    # the trees are kept alive, so this is the memory they use plus the
+    # parser's peak
+    tracemalloc.start ()
+    trees= parse (sources)
+    current, peak= tracemalloc.get_traced_memory ()
+    tracemalloc.stop ()
+    print ('%32s trees %8.2fMiB  peak %8.2fMiB' % ('', current/2**20, peak/2**20))
+
+
+if __name__=='__main__':
+    main (sys.argv[1:] or corpus ())
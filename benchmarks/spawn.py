@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+# how long does it take to launch short commands with posix_spawn() and with
+# fork(). the default is 10000 true's, but the amount can be given as first
+# argument:
+#
+#   $ python3 benchmarks/spawn.py 1000
+
+import os
+import sys
+
+from common import measure, report
+
+import ayrton
+import ayrton.execute
+from ayrton.execute import Command
+
+
+def main (count=10000):
+    ayrton.runner= ayrton.Ayrton ()
+
+    launchers= [ ('fork', False) ]
+    if hasattr (os, 'posix_spawn'):
+        launchers.append ( ('posix_spawn', True) )
+    else:
+        print ('posix_spawn() is not available in this python')
+
+    true= Command ('true')
+    for name, use_posix_spawn in launchers:
+        ayrton.execute.use_posix_spawn= use_posix_spawn
+        report ('%d x true, %s' % (count, name), measure (true, count))
+
+
+if __name__=='__main__':
+    main (*[ int (arg) for arg in sys.argv[1:2] ])
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+# how long does it take to run an empty script, and what does ayrton load
+# to do it. modules in heavy_modules should only be loaded by the scripts that
+# actually use them; if any of them is, this benchmark exits with 1
+
+import sys
+import subprocess
+
+from common import ayrton_bin, environ, measure, report
+
+heavy_modules= ('paramiko', 'cryptography', 'ayrton.remote', 'pdb')
+
+# runs bin/ayrton -c 'pass' and lists the heavy modules it loaded
+probe= '''import sys
+import runpy
+sys.argv= [ %r, '-c', 'pass' ]
+try:
+    runpy.run_path (sys.argv[0], run_name='__main__')
+except SystemExit:
+    pass
+print (' '.join ([ m for m in %r if m in sys.modules ]))''' % (ayrton_bin,
+                                                               heavy_modules)
+
+
+def run (*args):
+    return subprocess.check_output ((sys.executable, )+args, env=environ ())
+
+
+def main ():
+    report ('python -c pass', measure (lambda: run ('-c', 'pass')))
+    report ('python -c "import paramiko"',
+            measure (lambda: run ('-c', 'import paramiko')))
+    report ('ayrton -c pass', measure (lambda: run (ayrton_bin, '-c', 'pass')))
+
+    loaded= run ('-c', probe).decode ().split ()
+    if len (loaded)>0:
+        print ('ayrton -c pass loaded: %s' % ', '.join (loaded))
+        return 1
+
+    return 0
+
+
+if __name__=='__main__':
+    sys.exit (main ())
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+# the hot paths, measured all together and compared with a baseline, so
+# regressions are noticed. the other benchmarks go deeper into each one.
+#
+#   $ python3 benchmarks/suite.py                   # compare with baseline.json
+#   $ python3 benchmarks/suite.py --save            # make these the baseline
+#   $ python3 benchmarks/suite.py spawn capture     # only some of them
+#
+# a benchmark regressed if its median is more than --threshold percent (10 by
+# default) slower than the baseline's; then the exit code is 1. the times
+# depend on the machine and the python version, so the baseline should be
+# saved in the same one; the comparison warns if they're not the same.
+#
+# the remote() one uses a local bash instead of ssh (see ncserver()) but, like
+# its tests, it needs a terminal.
+
+import argparse
+from collections import OrderedDict
+import json
+import os
+import os.path
+import platform
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import top_dir, ayrton_bin, environ, measure, report
+
+import ayrton
+from ayrton.execute import Command, Pipeline, Capture
+from ayrton.castt import CrazyASTTransformer
+from ayrton.expansion import bash
+import ayrton.file_test
+
+baseline_file= os.path.join (top_dir, 'benchmarks', 'baseline.json')
+
+# one line per Command, no strings; see script()
+script_block= '''for i in range (10):
+    ls (-l=True, color=auto, path, i)
+    x= foo.bar (x, y=i)
+    if x>3:
+        grep (-c=True, pattern, _in=x, _out=Capture)
+'''
+
+
+def script (lines):
+    return script_block*(lines//len (script_block.splitlines ()))
+
+
+def startup ():
+    def run ():
+        subprocess.check_call ([ sys.executable, ayrton_bin, '-c', 'pass' ],
+                               env=environ ())
+
+    return measure (run, 10)
+
+
+def parse (lines):
+    source= script (lines)
+
+    def run ():
+        tree= ayrton.parse (source)
+        CrazyASTTransformer (ayrton.runner.globals).modify (tree)
+
+    return measure (run, 10)
+
+
+def spawn ():
+    true= Command ('true')
+
+    return measure (lambda: [ true () for i in range (100) ], 10)
+
+
+def pipeline (data_file):
+    def run ():
+        # -c, so grep reads everything; with its output in /dev/null it stops
+        # at the first match, and cat with it
+        Pipeline (Command ('cat').setup (data_file),
+                  Command ('grep').setup ('-c', '9', _out=Capture)) ()
+
+    return measure (run, 10)
+
+
+def capture ():
+    seq= Command ('seq')
+
+    return measure (lambda: seq ('1000000', _out=Capture), 10)
+
+
+def expansion ():
+    pattern= '/tmp/{a,b,c,d,e,f,g,h}{1,2,3,4,5,6,7,8}{x,y,z,w}'
+
+    return measure (lambda: bash (pattern), 10)
+
+
+def file_test ():
+    def run ():
+        for i in range (1000):
+            ayrton.file_test.f (top_dir)
+            ayrton.file_test.d (top_dir)
+            ayrton.file_test.x (ayrton_bin)
+            ayrton.file_test.s (ayrton_bin)
+
+    return measure (run, 10)
+
+
+def ncserver ():
+    """A stand in for sshd: like remote()'s tests, it accepts one connection
+    in port 2233 and runs bash with it as stdin and stdout. Returns its
+    pid."""
+    server= socket.socket ()
+    server.setsockopt (socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind (('127.0.0.1', 2233))
+    server.listen (1)
+
+    pid= os.fork ()
+    if pid==0:
+        try:
+            client, address= server.accept ()
+            os.dup2 (client.fileno (), 0)
+            os.dup2 (client.fileno (), 1)
+            os.execlp ('bash', 'bash')
+        finally:
+            os._exit (1)
+
+    server.close ()
+
+    return pid
+
+
+def remote ():
+    code= '''with remote (hostname, _test=True, _ncserver=True):
+    x= 42'''
+    times= []
+
+    for i in range (5):
+        # bash exits at the end of the block
+        pid= ncserver ()
+        try:
+            start= time.perf_counter ()
+            ayrton.Ayrton (hostname='127.0.0.1').run_script (code, 'remote.ay')
+            times.append (time.perf_counter ()-start)
+        finally:
+            try:
+                os.kill (pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            os.waitpid (pid, 0)
+
+    return times
+
+
+def benchmarks (data_file):
+    """name: (description, function), in the order they're run."""
+    return OrderedDict ([
+        ('startup', ('ayrton -c pass', startup)),
+        ('parse-small', ('parse and transform 10 lines', lambda: parse (10))),
+        ('parse-large', ('parse and transform 2000 lines', lambda: parse (2000))),
+        ('spawn', ('100 x true ()', spawn)),
+        ('pipeline', ('cat 64MiB | grep -c', lambda: pipeline (data_file))),
+        ('capture', ('capture seq 1000000', capture)),
+        ('expansion', ('bash () of 256 words', expansion)),
+        ('file-test', ('1000 x -f, -d, -x and -s', file_test)),
+        ('remote', ('remote () round trip', remote)),
+        ])
+
+
+def compare (results, baseline, threshold):
+    """Returns the names of the benchmarks that regressed."""
+    for key in ('python', 'machine'):
+        if baseline[key]!=results[key]:
+            print ('WARNING: the baseline was measured with %s %s, not %s' %
+                   (key, baseline[key], results[key]))
+
+    regressed= []
+    print ('%-16s %12s %12s %9s' % ('benchmark', 'median', 'baseline', 'change'))
+    for name, data in results['benchmarks'].items ():
+        if name not in baseline['benchmarks']:
+            print ('%-16s %10.2fms %12s' % (name, data['median']*1000, '-'))
+            continue
+
+        old= baseline['benchmarks'][name]['median']
+        change= (data['median']-old)/old*100
+        if change>threshold:
+            regressed.append (name)
+            mark= ' REGRESSION'
+        else:
+            mark= ''
+
+        print ('%-16s %10.2fms %10.2fms %+8.1f%%%s' %
+               (name, data['median']*1000, old*1000, change, mark))
+
+    return regressed
+
+
+def main ():
+    parser= argparse.ArgumentParser (description='Run the benchmark suite.')
+    parser.add_argument ('names', nargs='*', metavar='benchmark',
+                         help='the benchmarks to run; all by default')
+    parser.add_argument ('--baseline', default=baseline_file,
+                         help='the baseline file (default: %(default)s)')
+    parser.add_argument ('--save', action='store_true',
+                         help='save the results as the baseline instead of comparing')
+    parser.add_argument ('--threshold', type=float, default=10.0,
+                         help='how many percent slower is a regression (default: %(default)s)')
+    args= parser.parse_args ()
+
+    ayrton.runner= ayrton.Ayrton ()
+
+    with tempfile.NamedTemporaryFile (mode='w') as data_file:
+        for i in range (64):
+            # 1MiB of 7 digit numbers
+            data_file.write (''.join ([ '%d\n' % n
+                                        for n in range (1000000+i*131072,
+                                                        1000000+(i+1)*131072) ]))
+        data_file.flush ()
+
+        suite= benchmarks (data_file.name)
+        names= args.names or list (suite.keys ())
+        unknown= [ name for name in names if name not in suite ]
+        if len (unknown)>0:
+            parser.error ('unknown benchmarks: %s; try with %s' %
+                          (', '.join (unknown), ', '.join (suite.keys ())))
+
+        results= dict (python=platform.python_version (), machine=platform.machine (),
+                       benchmarks=OrderedDict ())
+        for name in names:
+            description, function= suite[name]
+            times= function ()
+            report ('%s: %s' % (name, description), times)
+
+            results['benchmarks'][name]= dict (min=min (times), max=max (times),
+                                               median=statistics.median (times))
+
+    if args.save:
+        if os.path.exists (args.baseline):
+            with open (args.baseline) as f:
+                baseline= json.load (f)
+
+            # keep the ones that were not run
+            if baseline['python']==results['python']:
+                for name, data in baseline['benchmarks'].items ():
+                    results['benchmarks'].setdefault (name, data)
+
+        with open (args.baseline, 'w') as f:
+            json.dump (results, f, indent=4, sort_keys=True)
+
+        return 0
+
+    if not os.path.exists (args.baseline):
+        print ('no baseline in %s, run with --save to make one' % args.baseline)
+        return 0
+
+    with open (args.baseline) as f:
+        baseline= json.load (f)
+
+    print ()
+    regressed= compare (results, baseline, args.threshold)
+    if len (regressed)>0:
+        print ('regressions: %s' % ', '.join (regressed))
+        return 1
+
+    return 0
+
+
+if __name__=='__main__':
+    sys.exit (main ())
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2020 Marcos Dione <mdione@grulic.org.ar>
+
+# This file is part of ayrton.
+#
+# ayrton is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ayrton is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ayrton.  If not, see <http://www.gnu.org/licenses/>.
+
+# what tracing a script costs: a loop that calls a function of its own and
+# one from another module, run without tracing, with -x (the calls inserted
+# in the script's code) and with -xxx (sys.settrace()). the trace goes to
+# /dev/null. the default is 10000 iterations, but the amount can be given as
+# first argument:
+#
+#   $ python3 benchmarks/tracing.py 1000
+
+import contextlib
+import os
+import sys
+
+from common import measure, report
+
+import ayrton
+
+script= '''import os
+
+def f (x):
+    y= x*2
+    return y+1
+
+total= 0
+for i in range (%d):
+    total+= f (i)
+    path= os.path.join (pwd (), argv[0])
+'''
+
+
+def main (count=10000):
+    source= script % count
+
+    def run (**kwargs):
+        params= ayrton.ExecParams (cache=False, **kwargs)
+        ayrton.main (source, params=params)
+
+    with open (os.devnull, 'w') as devnull, contextlib.redirect_stderr (devnull):
+        times= [ ('no trace', measure (run, 5)),
+                 ('-x', measure (lambda: run (trace=True), 5)),
+                 ('-xxx', measure (lambda: run (trace=True, linenos=True,
+                                                trace_all=True), 5)) ]
+
+    for name, results in times:
+        report ('%d iterations, %s' % (count, name), results)
+
+
+if __name__=='__main__':
+    main (*[ int (arg) for arg in sys.argv[1:2] ])
@@ -17,7 +17,7 @@ setup (
     packages= [ 'ayrton', 'ayrton.parser', 'ayrton.parser.pyparser',
                'ayrton.parser.astcompiler' ],
     package_data= {
-        'ayrton.parser.pyparser': [ 'data/Grammar3.3' ],
+        'ayrton.parser.pyparser': [ 'data/Grammar3.6' ],
         },
     scripts= [ 'bin/ayrton' ],
     license= 'GPLv3',